@@ -0,0 +1,337 @@
+import base64
+import hashlib
+import math
+import os
+import queue
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import tkinter as tk
+from tkinter import ttk
+from build_log import get_logger
+from dbpf_writer_lib import RESOURCE_NAME_PATTERN, read_package_index, read_package_resource
+
+# --------------------------------- #
+# Built asset browser
+# Lists every image (IMAG resource) in the packages of a built UI, with the Base UI
+# file it was made from. The list is virtualised: only the rows in view are drawn and
+# only their thumbnails are made, so it stays smooth with thousands of images.
+# Images are read from the packages on background threads and scaled down with
+# PhotoImage.subsample on the Tk thread, a few per tick. Thumbnails and previews are kept
+# in a size-bounded memory cache backed by a size-bounded disk cache (Cache/Thumbnails),
+# so scrolling back or reopening the browser doesn't decode the images again.
+# --------------------------------- #
+
+log = get_logger("asset_browser")
+
+IMAG_TYPE = 0x2F7D0004
+THUMB_SIZE = 64
+PREVIEW_SIZE = 360
+ROW_HEIGHT = THUMB_SIZE + 8
+LIST_WIDTH = 460
+MEMORY_CACHE_BYTES = 64 * 1024 * 1024 # decoded images take 4 bytes a pixel
+DISK_CACHE_BYTES = 256 * 1024 * 1024
+LOAD_WORKERS = 2
+DECODE_BUDGET = 0.025 # seconds per tick spent making thumbnails, so scrolling never waits on them
+POLL_MS = 30
+
+# One image in a built package
+# name is the Base UI file name without its TGI, source the Base UI svg or png it came from (or None),
+# key identifies this resource in this build of the package for the thumbnail cache
+BuiltAsset = namedtuple("BuiltAsset", ["name", "package", "entry", "source", "key"])
+
+def _key(*parts):
+    return hashlib.sha1("|".join(map(str, parts)).encode("utf-8")).hexdigest()
+
+# Every image in the packages under ui_folder, sorted by name
+def built_assets(ui_folder, manifest):
+    sources = {}
+    for entry in manifest.entries:
+        match = RESOURCE_NAME_PATTERN.search(entry.rel.name) if entry.resource_type in ("svg", "png") else None
+        if match:
+            sources.setdefault(tuple(int(part, 16) for part in match.groups()), manifest.root / entry.rel)
+    assets = []
+    for package in sorted(Path(ui_folder).rglob("*.package")):
+        try:
+            index = read_package_index(package)
+            mtime = package.stat().st_mtime_ns
+        except (OSError, ValueError) as e:
+            log.warning(f"- Skipping {package.name}: {e}")
+            continue
+        for entry in index:
+            if entry.type_id != IMAG_TYPE:
+                continue
+            source = sources.get((entry.type_id, entry.group_id, entry.instance_id))
+            if source is not None:
+                name = RESOURCE_NAME_PATTERN.sub("", source.stem).split("%%")[0].strip("_") or source.stem
+            else:
+                name = f"S3_{entry.type_id:08X}_{entry.group_id:08X}_{entry.instance_id:016X}"
+            assets.append(BuiltAsset(name, package, entry, source, _key(package, mtime, entry.offset, entry.disk_size)))
+    assets.sort(key=lambda asset: (asset.name.lower(), str(asset.package)))
+    return assets
+
+class ThumbnailCache:
+    """
+    Scaled-down images by key. PhotoImages are kept in memory, least recently used dropped
+    first once they take more than memory_bytes. Each one is also written to folder as a png,
+    and the least recently used files are deleted once the folder holds more than disk_bytes.
+    """
+    def __init__(self, master, folder, memory_bytes=MEMORY_CACHE_BYTES, disk_bytes=DISK_CACHE_BYTES):
+        self.master = master
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.images = OrderedDict() # key -> PhotoImage, least recently used first
+        self.memory_used = 0
+        self.disk_used = sum(path.stat().st_size for path in self.folder.glob("*.png"))
+
+    def _remember(self, key, image):
+        self.images[key] = image
+        self.memory_used += image.width() * image.height() * 4
+        while self.memory_used > self.memory_bytes and len(self.images) > 1:
+            _, old = self.images.popitem(last=False)
+            self.memory_used -= old.width() * old.height() * 4
+
+    # The image for key from memory or disk, or None if it hasn't been made yet
+    def get(self, key):
+        image = self.images.get(key)
+        if image is not None:
+            self.images.move_to_end(key)
+            return image
+        path = self.folder / f"{key}.png"
+        if not path.is_file():
+            return None
+        try:
+            image = tk.PhotoImage(master=self.master, file=str(path))
+            os.utime(path) # the modified time is the last use, for pruning
+        except (tk.TclError, OSError):
+            return None
+        self._remember(key, image)
+        return image
+
+    # Scale png_data down to fit in size x size, cache it and return it
+    # Raises tk.TclError if Tk can't read the png
+    def put(self, key, png_data, size):
+        image = tk.PhotoImage(master=self.master, data=base64.b64encode(png_data))
+        factor = math.ceil(max(image.width(), image.height()) / size)
+        if factor > 1:
+            image = image.subsample(factor)
+        path = self.folder / f"{key}.png"
+        try:
+            image.write(str(path), format="png")
+            self.disk_used += path.stat().st_size
+        except (tk.TclError, OSError) as e:
+            log.debug(f"Thumbnail not saved to disk: {e}")
+        if self.disk_used > self.disk_bytes:
+            self._prune_disk()
+        self._remember(key, image)
+        return image
+
+    # Delete the least recently used files until the folder is back under 80% of its budget
+    def _prune_disk(self):
+        files = []
+        for path in self.folder.glob("*.png"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime_ns, st.st_size, path))
+        self.disk_used = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if self.disk_used <= self.disk_bytes * 0.8:
+                break
+            path.unlink(missing_ok=True)
+            self.disk_used -= size
+
+class AssetBrowser:
+    def __init__(self, parent, assets, cache, inkscape_path):
+        self.assets = assets
+        self.cache = cache
+        self.inkscape_path = inkscape_path
+        self.selected = None
+        self.shown = [] # images on the canvas, so evicting them from the cache doesn't blank them
+        self.requested = set() # keys being loaded
+        self.failed = set() # keys that have no image
+        self.wanted = frozenset() # keys still in view - loads for anything else are skipped
+        self.results = queue.Queue()
+        self.pool = ThreadPoolExecutor(max_workers=LOAD_WORKERS)
+        self._source_keys = {}
+
+        self.window = tk.Toplevel(parent)
+        self.window.title(f"Built assets - {len(assets)} image(s)")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self.window.grid_rowconfigure(0, weight=1)
+        self.window.grid_columnconfigure(2, weight=1)
+
+        # Left: the list, drawn on a canvas a screenful of rows at a time
+        self.canvas = tk.Canvas(self.window, width=LIST_WIDTH, height=600, highlightthickness=0,
+                                yscrollincrement=ROW_HEIGHT, scrollregion=(0, 0, LIST_WIDTH, len(assets) * ROW_HEIGHT))
+        scrollbar = ttk.Scrollbar(self.window, orient="vertical", command=self._scroll)
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+        self.canvas.grid(row=0, column=0, sticky="ns")
+        scrollbar.grid(row=0, column=1, sticky="ns")
+        self.canvas.bind("<Configure>", self._redraw)
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<MouseWheel>", lambda e: self._scroll("scroll", -1 if e.delta > 0 else 1, "units"))
+        self.canvas.bind("<Button-4>", lambda e: self._scroll("scroll", -1, "units"))
+        self.canvas.bind("<Button-5>", lambda e: self._scroll("scroll", 1, "units"))
+
+        # Right: the selected image from Base UI and from the build, side by side
+        preview = ttk.Frame(self.window)
+        preview.grid(row=0, column=2, sticky="nsew", padx=10, pady=10)
+        self.preview_labels = {}
+        self.blank = tk.PhotoImage(master=self.window, width=PREVIEW_SIZE, height=PREVIEW_SIZE) # keeps the previews a fixed size in pixels
+        for column, (side, caption) in enumerate((("base", "Base UI"), ("built", "Built"))):
+            ttk.Label(preview, text=caption).grid(row=0, column=column, pady=(0, 5))
+            label = tk.Label(preview, image=self.blank, compound="center", background="lightgray",
+                             text="Select an image" if side == "built" else "")
+            label.grid(row=1, column=column, padx=5)
+            self.preview_labels[side] = label
+        self.details = ttk.Label(preview, text="", wraplength=2 * PREVIEW_SIZE)
+        self.details.grid(row=2, column=0, columnspan=2, sticky="w", pady=5)
+
+        self.after_id = self.window.after(POLL_MS, self._poll)
+
+    def close(self):
+        self.window.after_cancel(self.after_id)
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.window.destroy()
+
+    def _scroll(self, *args):
+        self.canvas.yview(*args)
+        self._redraw()
+
+    def _on_click(self, event):
+        index = int(self.canvas.canvasy(event.y)) // ROW_HEIGHT
+        if 0 <= index < len(self.assets):
+            self.selected = index
+            self._redraw()
+
+    # Cache keys for an asset's thumbnail and previews
+    def _built_key(self, asset, size):
+        return f"{asset.key}-{size}"
+
+    def _base_key(self, asset, size):
+        if asset.source is None:
+            return None
+        source_key = self._source_keys.get(asset.source)
+        if source_key is None:
+            try:
+                mtime = asset.source.stat().st_mtime_ns
+            except OSError:
+                return None
+            source_key = self._source_keys[asset.source] = _key(asset.source, mtime)
+        return f"{source_key}-{size}"
+
+    # Loaders - run on the pool threads and return png bytes or None
+    @staticmethod
+    def _load_built(asset):
+        return read_package_resource(asset.package, asset.entry)
+
+    def _load_base(self, asset):
+        if asset.source.suffix.lower() == ".png":
+            return asset.source.read_bytes()
+        from utils import render_png
+        return render_png(self.inkscape_path, asset.source.read_text(encoding="utf-8"), asset.source.name)
+
+    def _load(self, key, loader, asset, size):
+        if key not in self.wanted: # scrolled out of view while waiting
+            self.results.put((key, None, size, False))
+            return
+        try:
+            png_data = loader(asset)
+        except (OSError, ValueError) as e:
+            log.warning(f"- Can't read {asset.name} from {asset.package.name}: {e}")
+            png_data = None
+        self.results.put((key, png_data, size, True))
+
+    # The image for key if it's ready, otherwise queue it to load
+    def _image(self, key, loader, asset, size):
+        image = self.cache.get(key)
+        if image is None and key not in self.failed and key not in self.requested:
+            self.requested.add(key)
+            self.pool.submit(self._load, key, loader, asset, size)
+        return image
+
+    # Make the images that have loaded, for at most DECODE_BUDGET, then check again after POLL_MS
+    def _poll(self):
+        deadline = time.perf_counter() + DECODE_BUDGET
+        changed = False
+        while time.perf_counter() < deadline:
+            try:
+                key, png_data, size, attempted = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.requested.discard(key)
+            if not attempted:
+                continue
+            changed = True
+            if png_data is None:
+                self.failed.add(key)
+                continue
+            try:
+                self.cache.put(key, png_data, size)
+            except tk.TclError as e:
+                log.warning(f"- Can't show image: {e}")
+                self.failed.add(key)
+        if changed:
+            self._redraw()
+        self.after_id = self.window.after(POLL_MS, self._poll)
+
+    # Draw only the rows in view, then the preview of the selected row
+    def _redraw(self, event=None):
+        top = int(self.canvas.canvasy(0))
+        first = max(0, top // ROW_HEIGHT)
+        last = min(len(self.assets), (top + self.canvas.winfo_height()) // ROW_HEIGHT + 1)
+        wanted = {self._built_key(asset, THUMB_SIZE) for asset in self.assets[first:last]}
+        if self.selected is not None:
+            asset = self.assets[self.selected]
+            wanted |= {self._built_key(asset, PREVIEW_SIZE), self._base_key(asset, PREVIEW_SIZE)}
+        self.wanted = frozenset(wanted)
+
+        self.canvas.delete("row")
+        self.shown = []
+        for index in range(first, last):
+            asset = self.assets[index]
+            y = index * ROW_HEIGHT
+            if index == self.selected:
+                self.canvas.create_rectangle(0, y, LIST_WIDTH, y + ROW_HEIGHT, fill="#dbb6ff", outline="", tags="row")
+            key = self._built_key(asset, THUMB_SIZE)
+            image = self._image(key, self._load_built, asset, THUMB_SIZE)
+            centre = (4 + THUMB_SIZE // 2, y + ROW_HEIGHT // 2)
+            if image is not None:
+                self.shown.append(image)
+                self.canvas.create_image(*centre, image=image, tags="row")
+            else:
+                self.canvas.create_text(*centre, text="?" if key in self.failed else "…", fill="gray", tags="row")
+            self.canvas.create_text(THUMB_SIZE + 16, y + ROW_HEIGHT // 2, anchor="w", tags="row", width=LIST_WIDTH - THUMB_SIZE - 24,
+                                    text=f"{asset.name}\n{asset.package.name}")
+        self._show_selected()
+
+    def _show_selected(self):
+        if self.selected is None:
+            return
+        asset = self.assets[self.selected]
+        details = f"{asset.name}\n{asset.package.name}, {asset.entry.mem_size / 1024:.0f} KB"
+        if asset.source is not None:
+            details += f"\nFrom {asset.source.relative_to(asset.source.parents[1]).as_posix()}"
+        self.details.configure(text=details)
+        for side, key, loader in (("base", self._base_key(asset, PREVIEW_SIZE), self._load_base),
+                                  ("built", self._built_key(asset, PREVIEW_SIZE), self._load_built)):
+            label = self.preview_labels[side]
+            image = None if key is None else self._image(key, loader, asset, PREVIEW_SIZE)
+            if image is not None:
+                label.configure(image=image, text="")
+            elif key is None:
+                label.configure(image=self.blank, text="No Base UI source")
+            else:
+                label.configure(image=self.blank, text="No preview" if key in self.failed else "Loading…")
+            label.image = image # keep a reference while it's shown
+
+# Open the browser for the packages in ui_folder
+def open_asset_browser(parent, ui_folder, manifest, cache_folder, inkscape_path):
+    assets = built_assets(ui_folder, manifest)
+    log.info(f"- Browsing {len(assets)} built image(s) in {ui_folder}")
+    return AssetBrowser(parent, assets, ThumbnailCache(parent, cache_folder), inkscape_path)
@@ -0,0 +1,286 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import subprocess
+import tempfile
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from png_utils import PNG_SIGNATURE, read_png, write_png, paste_pixels
+import tool_runner
+import tracing
+from build_log import get_logger
+
+# --------------------------------- #
+# Partial re-rendering of ATLAS sprite sheets
+# Only the sprites that use replaced colours are re-rendered (export-area actions),
+# then pasted onto a cached render of the original (un-recoloured) sheet
+# --------------------------------- #
+
+PARTIAL_MIN_SIZE = 256 * 1024 # smaller sheets render quickly enough in full
+MAX_PARTIAL_COVERAGE = 0.6 # fall back to a full render if more of the sheet than this changed
+REGION_MARGIN = 2 # extra pixels around each bounding box to catch antialiasing
+MAX_REGIONS = 64 # past this many separate regions, decoding and pasting costs more than a full render
+
+# Elements that only define paint servers/effects - changes here affect whatever references them
+RESOURCE_TAGS = {"linearGradient", "radialGradient", "pattern", "filter", "clipPath", "mask", "marker", "symbol"}
+
+log = get_logger("atlas_regions")
+
+_REFERENCE = re.compile(r"url\(#([^)]+)\)|^#(.+)$")
+
+# Check if an SVG should be considered for partial rendering
+def is_partial_candidate(svg_path, size):
+    return "ATLAS_" in svg_path.name and size >= PARTIAL_MIN_SIZE
+
+# Drop replacements that map a colour to itself, they do not change any pixels
+def _effective_patterns(colour_replacements):
+    patterns = []
+    for old, new in colour_replacements.items():
+        if re.sub(r"\\(.)", r"\1", old).lower() == new.lower():
+            continue
+        patterns.append(re.compile(old, re.IGNORECASE))
+    return patterns
+
+def _local_tag(element):
+    return element.tag.rsplit("}", 1)[-1]
+
+def _references(element):
+    refs = set()
+    for value in element.attrib.values():
+        if value.startswith("data:"):
+            continue
+        for match in _REFERENCE.finditer(value):
+            refs.add(match.group(1) or match.group(2))
+    return refs
+
+# Find the ids of the visible elements whose colours are changed by the replacements
+# Returns None when this can't be worked out safely, e.g. colours set in a <style> block
+def find_changed_ids(svg_text, colour_replacements):
+    patterns = _effective_patterns(colour_replacements)
+    if not patterns:
+        return set()
+    try:
+        root = ET.fromstring(svg_text.encode("utf-8"))
+    except ET.ParseError:
+        return None
+
+    # Walk the tree once, remembering each element's nearest ancestor with an id
+    # and whether it sits inside a resource (gradient, filter, clip path etc.)
+    changed_resources = set()
+    changed_visible = set()
+    nodes = []
+    stack = [(root, None, None)]
+    while stack:
+        element, owner_id, resource_id = stack.pop()
+        tag = _local_tag(element)
+        if tag == "style" and any(p.search(element.text or "") for p in patterns):
+            return None
+        element_id = element.get("id")
+        if element_id is not None:
+            owner_id = element_id
+        if tag in RESOURCE_TAGS and resource_id is None:
+            resource_id = element_id
+        nodes.append((element, owner_id, resource_id))
+
+        values = [v for v in element.attrib.values() if not v.startswith("data:")]
+        if any(p.search(v) for p in patterns for v in values):
+            if resource_id is not None:
+                changed_resources.add(resource_id)
+            elif owner_id is not None:
+                changed_visible.add(owner_id)
+            else:
+                return None
+
+        for child in element:
+            stack.append((child, owner_id, resource_id))
+
+    # Propagate changes through url(#...) and href references until nothing new is found
+    referencing = [(e, o, r, _references(e)) for e, o, r in nodes]
+    referencing = [item for item in referencing if item[3]]
+    grew = True
+    while grew:
+        grew = False
+        for element, owner_id, resource_id, refs in referencing:
+            if not refs & (changed_resources | changed_visible):
+                continue
+            if resource_id is not None:
+                if resource_id not in changed_resources:
+                    changed_resources.add(resource_id)
+                    grew = True
+            elif owner_id is not None:
+                changed_visible.add(owner_id)
+            else:
+                return None
+    return changed_visible
+
+# Get the canvas size in pixels, or None if user units don't map 1:1 to pixels
+def canvas_size(svg_text):
+    match = re.search(r"<svg\b[^>]*>", svg_text)
+    if not match:
+        return None
+    tag = match.group(0)
+    width = re.search(r'\swidth="([\d.]+)(px)?"', tag)
+    height = re.search(r'\sheight="([\d.]+)(px)?"', tag)
+    view_box = re.search(r'\sviewBox="([^"]+)"', tag)
+    if not width or not height:
+        return None
+    w, h = float(width.group(1)), float(height.group(1))
+    if view_box:
+        vx, vy, vw, vh = (float(v) for v in view_box.group(1).replace(",", " ").split())
+        if (vx, vy, vw, vh) != (0, 0, w, h):
+            return None
+    if w != int(w) or h != int(h):
+        return None
+    return int(w), int(h)
+
+# Ask inkscape for the bounding box of every element
+async def query_bboxes(inkscape_path, svg_path):
+    result = await tool_runner.run_tool(
+        "inkscape", [inkscape_path, svg_path, "--query-all"], name="inkscape query " + Path(svg_path).name
+    )
+    bboxes = {}
+    for line in result.stdout.decode("utf-8", errors="replace").splitlines():
+        parts = line.strip().split(",")
+        if len(parts) != 5:
+            continue
+        try:
+            bboxes[parts[0]] = tuple(float(v) for v in parts[1:])
+        except ValueError:
+            continue
+    return bboxes
+
+# Merge overlapping rectangles (x0, y0, x1, y1) so no pixel is rendered twice
+def merge_regions(regions):
+    regions = sorted(regions)
+    merged = True
+    while merged:
+        merged = False
+        result = []
+        for r in regions:
+            for i, m in enumerate(result):
+                if r[0] <= m[2] and m[0] <= r[2] and r[1] <= m[3] and m[1] <= r[3]:
+                    result[i] = (min(r[0], m[0]), min(r[1], m[1]), max(r[2], m[2]), max(r[3], m[3]))
+                    merged = True
+                    break
+            else:
+                result.append(r)
+        regions = result
+    return regions
+
+# Turn changed element ids into pixel-aligned regions to re-render
+# Returns None when a full render is the better (or only safe) option
+def changed_regions(changed_ids, bboxes, size):
+    width, height = size
+    regions = []
+    for element_id in changed_ids:
+        if element_id not in bboxes:
+            return None
+        x, y, w, h = bboxes[element_id]
+        x0 = max(0, int(x) - REGION_MARGIN)
+        y0 = max(0, int(y) - REGION_MARGIN)
+        x1 = min(width, int(x + w + 1) + REGION_MARGIN)
+        y1 = min(height, int(y + h + 1) + REGION_MARGIN)
+        if x1 > x0 and y1 > y0:
+            regions.append((x0, y0, x1, y1))
+    regions = merge_regions(regions)
+    if len(regions) > MAX_REGIONS:
+        return None
+    area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in regions)
+    if area > width * height * MAX_PARTIAL_COVERAGE:
+        return None
+    return regions
+
+# Plan a partial render during the recolour stage
+# Returns the changed element ids, or None if the sheet needs a full render
+def plan_partial_render(svg_text, colour_replacements):
+    if canvas_size(svg_text) is None:
+        return None
+    return find_changed_ids(svg_text, colour_replacements)
+
+# Render the original sheet and query its bounding boxes once, keyed by the source file's hash
+# The base PNG is re-encoded without row filters so later builds can load it quickly
+async def load_base_render(inkscape_path, source_svg, cache_folder):
+    digest = hashlib.sha1(Path(source_svg).read_bytes()).hexdigest()
+    folder = Path(cache_folder) / digest
+    base_png = folder / "base.png"
+    bbox_file = folder / "bboxes.json"
+
+    if not (base_png.is_file() and bbox_file.is_file()):
+        bboxes, rendered = await asyncio.gather(
+            query_bboxes(inkscape_path, source_svg),
+            tool_runner.run_tool("inkscape", [
+                inkscape_path, source_svg, "--export-type=png", "--export-filename=-"
+            ], name="inkscape base " + Path(source_svg).name)
+        )
+        if not rendered.stdout.startswith(PNG_SIGNATURE) or not bboxes:
+            return None
+        folder.mkdir(parents=True, exist_ok=True)
+        w, h, pixels = await asyncio.to_thread(read_png, rendered.stdout)
+        # Each file is moved into place once it's complete, so builds running at the same time never read half of one
+        suffix = f".{os.getpid()}.{id(bboxes)}.tmp"
+        tmp = base_png.with_name(base_png.name + suffix)
+        tmp.write_bytes(await asyncio.to_thread(write_png, w, h, pixels, 1))
+        tmp.replace(base_png)
+        tmp = bbox_file.with_name(bbox_file.name + suffix)
+        tmp.write_text(json.dumps(bboxes))
+        tmp.replace(bbox_file)
+
+    bboxes = {k: tuple(v) for k, v in json.loads(bbox_file.read_text()).items()}
+    return await asyncio.to_thread(read_png, base_png.read_bytes()), bboxes
+
+# Decode the rendered regions and paste them onto the base render
+# Runs on a worker thread so the tool loop stays free
+def _composite(width, height, pixels, regions, region_pngs):
+    for (x0, y0, x1, y1), region_png in zip(regions, region_pngs):
+        if not region_png.is_file():
+            return None
+        rw, rh, region_pixels = read_png(region_png.read_bytes())
+        if (rw, rh) != (x1 - x0, y1 - y0):
+            return None
+        paste_pixels(pixels, width, region_pixels, rw, rh, x0, y0)
+    return write_png(width, height, pixels)
+
+# Render a recoloured sheet by re-rendering only the changed regions
+# Returns the png bytes, or None if the partial render wasn't possible so the caller can do a full render
+async def render_png_partial(inkscape_path, source_svg, svg_text, changed_ids, cache_folder):
+    size = canvas_size(svg_text)
+    if size is None:
+        return None
+    base = await load_base_render(inkscape_path, source_svg, cache_folder)
+    if base is None:
+        return None
+    (width, height, pixels), bboxes = base
+    if (width, height) != size:
+        return None
+    regions = changed_regions(changed_ids, bboxes, size)
+    if regions is None:
+        return None
+
+    # Render every region in one inkscape process using export actions
+    # The svg is piped in, but inkscape can only write one png per export-do to a file, so regions go to a temp folder
+    with tempfile.TemporaryDirectory(prefix="cloudui_regions_") as scratch:
+        region_pngs = [Path(scratch) / f"region{i}.png" for i in range(len(regions))]
+        actions = ["export-type:png"]
+        for (x0, y0, x1, y1), region_png in zip(regions, region_pngs):
+            actions += [f"export-area:{x0}:{y0}:{x1}:{y1}", f"export-filename:{region_png}", "export-do"]
+        await tool_runner.run_tool("inkscape", [
+            inkscape_path, "--pipe", "--actions=" + ";".join(actions)
+        ], input=svg_text.encode("utf-8"), name=f"inkscape {len(regions)} region(s)")
+
+        return await asyncio.to_thread(_composite, width, height, pixels, regions, region_pngs)
+
+# Render job: try a partial render when there is a plan (Inkscape only), otherwise render everything with the renderer
+# Returns the png bytes, or None if rendering failed
+async def render_png_planned(renderer, svg_text, name, plan, cache_folder):
+    with tracing.span("export " + name, partial=plan is not None):
+        if plan is not None and renderer.uses_inkscape(name):
+            source_svg, changed_ids = plan
+            try:
+                png_data = await render_png_partial(renderer.inkscape_path, source_svg, svg_text, changed_ids, cache_folder)
+                if png_data is not None:
+                    return png_data
+            except (OSError, ValueError, subprocess.TimeoutExpired) as e:
+                log.warning(f"- Partial render failed for {name}, doing a full render: {e}")
+        return await renderer.render(svg_text, name)
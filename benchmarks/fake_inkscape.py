@@ -0,0 +1,91 @@
+# Deterministic stand-in for inkscape used by the benchmarks
+# Supports the options the tool uses: --version, --query-all, --pipe, --export-type=png,
+# --export-filename (- for stdout), --export-area and export --actions. Output depends only on the input.
+# Latency per call is set with the FAKE_INKSCAPE_LATENCY environment variable (seconds).
+
+import hashlib
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from png_utils import write_png
+
+def canvas(svg_text):
+    width = re.search(r'<svg\b[^>]*?\swidth="([\d.]+)', svg_text, re.S)
+    height = re.search(r'<svg\b[^>]*?\sheight="([\d.]+)', svg_text, re.S)
+    w = int(float(width.group(1))) if width else 64
+    h = int(float(height.group(1))) if height else 64
+    return w, h
+
+def query_all(svg_text):
+    w, h = canvas(svg_text)
+    lines = []
+    for tag in re.finditer(r"<(\w+)\b([^>]*)>", svg_text):
+        attrs = dict(re.findall(r'([\w:-]+)="([^"]*)"', tag.group(2)))
+        if "id" not in attrs:
+            continue
+        if tag.group(1) == "svg":
+            box = (0, 0, w, h)
+        else:
+            box = tuple(float(attrs.get(k, d)) for k, d in (("x", 0), ("y", 0), ("width", 1), ("height", 1)))
+        lines.append(",".join([attrs["id"]] + [f"{v:g}" for v in box]))
+    return "\n".join(lines)
+
+# Write a solid PNG whose colour is derived from the input, optionally for an area of the canvas
+def export(svg_bytes, svg_text, filename, area=None):
+    w, h = canvas(svg_text)
+    if area:
+        x0, y0, x1, y1 = (int(float(v)) for v in area.split(":"))
+        w, h = x1 - x0, y1 - y0
+    r, g, b = hashlib.sha1(svg_bytes).digest()[:3]
+    pixels = bytes((r, g, b, 255)) * (w * h)
+    png = write_png(w, h, pixels, level=1)
+    if filename == "-":
+        sys.stdout.buffer.write(png)
+    else:
+        Path(filename).write_bytes(png)
+
+def run_actions(svg_bytes, svg_text, actions):
+    state = {}
+    for action in actions.split(";"):
+        name, _, value = action.strip().partition(":")
+        if name == "export-do":
+            export(svg_bytes, svg_text, state["export-filename"], state.get("export-area"))
+        else:
+            state[name] = value
+
+def main(args):
+    time.sleep(float(os.environ.get("FAKE_INKSCAPE_LATENCY", "0")))
+
+    if "--version" in args:
+        print("Inkscape 1.4 (fake benchmark build)")
+        return 0
+
+    options = dict(a.split("=", 1) for a in args if a.startswith("--") and "=" in a)
+    inputs = [a for a in args if not a.startswith("--")]
+    if "--pipe" in args:
+        svg_bytes = sys.stdin.buffer.read()
+    elif inputs:
+        svg_bytes = Path(inputs[0]).read_bytes()
+    else:
+        return 1
+    svg_text = svg_bytes.decode("utf-8", errors="replace")
+
+    if "--query-all" in args:
+        print(query_all(svg_text))
+        return 0
+
+    if "--actions" in options:
+        run_actions(svg_bytes, svg_text, options["--actions"])
+        return 0
+
+    if options.get("--export-type") == "png" and "--export-filename" in options:
+        export(svg_bytes, svg_text, options["--export-filename"], options.get("--export-area"))
+        return 0
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
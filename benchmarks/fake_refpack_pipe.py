@@ -0,0 +1,18 @@
+# Deterministic stand-in for refpack_pipe used by the benchmarks
+# Reads stdin and writes zlib-compressed bytes to stdout - not valid Refpack, but the
+# package writer only compares sizes, so it exercises the same code path.
+# Latency per call is set with the FAKE_REFPACK_LATENCY environment variable (seconds).
+
+import os
+import sys
+import time
+import zlib
+
+def main():
+    time.sleep(float(os.environ.get("FAKE_REFPACK_LATENCY", "0")))
+    data = sys.stdin.buffer.read()
+    sys.stdout.buffer.write(zlib.compress(data, 6))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
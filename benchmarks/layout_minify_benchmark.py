@@ -0,0 +1,94 @@
+# What minifying layouts saves in each package built from Base UI
+# Minifies the layouts of the main UI package and of every patch, checks each one has
+# the same structure as the original, then compresses the layouts both ways and
+# reports the size and compression time before and after, per package.
+#
+# Usage:
+#   python benchmarks/layout_minify_benchmark.py
+#   python benchmarks/layout_minify_benchmark.py --compression max
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+BENCHMARK_FOLDER = Path(__file__).resolve().parent
+REPO_FOLDER = BENCHMARK_FOLDER.parent
+RESULTS_FOLDER = BENCHMARK_FOLDER / "results"
+sys.path.insert(0, str(REPO_FOLDER))
+
+import tool_runner
+from manifest import scan_base_ui
+from layout_minify import minify_layouts
+from dbpf_writer_lib import COMPRESSION_MODES, compress_refpack_async, refpack_compress_async, resolve_compression
+
+# Layout files of each package: {package name: [paths]}
+def package_layouts(manifest):
+    packages = {"Main UI": manifest.select(kind="main", resource_type="layout")}
+    for patch in manifest.patches():
+        layouts = manifest.select(kind="patch", resource_type="layout", section=patch)
+        if layouts:
+            packages[patch] = layouts
+    return packages
+
+# Compress every layout the way the package writer would, returning (compressed bytes, seconds)
+def compress_all(layouts, codec):
+    async def compress(data):
+        if codec == "external":
+            return await compress_refpack_async(data)
+        return await refpack_compress_async(data, codec)
+    start = time.perf_counter()
+    compressed = tool_runner.gather_sync(compress(data) for data in layouts)
+    return sum(min(len(c), len(d)) for c, d in zip(compressed, layouts)), time.perf_counter() - start
+
+def run(args):
+    manifest = scan_base_ui(args.base_ui)
+    codec = resolve_compression(args.compression)
+    results = {}
+    for package, paths in package_layouts(manifest).items():
+        files = {path.name: path.read_bytes() for path in paths}
+        minified, (before, after), unverified = minify_layouts(files)
+        compressed_before, seconds_before = compress_all(list(files.values()), codec)
+        compressed_after, seconds_after = compress_all(list(minified.values()), codec)
+        results[package] = {
+            "layouts": len(files),
+            "bytes_before": before,
+            "bytes_after": after,
+            "compressed_before": compressed_before,
+            "compressed_after": compressed_after,
+            "compress_seconds_before": round(seconds_before, 3),
+            "compress_seconds_after": round(seconds_after, 3),
+            "unverified": unverified,
+        }
+        print(f"{package[:32]:<34}{len(files):>4} layout(s)  {before / 1024:>8.0f} -> {after / 1024:>6.0f} KB"
+              f"  compressed {compressed_before / 1024:>6.0f} -> {compressed_after / 1024:>6.0f} KB"
+              f"  {seconds_before:>6.2f} -> {seconds_after:>5.2f} s"
+              f"{f'  {len(unverified)} KEPT AS THEY WERE' if unverified else ''}")
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "compression": codec,
+        "results": results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure what minifying layouts saves in each Base UI package")
+    parser.add_argument("--base-ui", type=Path, default=REPO_FOLDER / "Base UI")
+    parser.add_argument("--compression", choices=COMPRESSION_MODES, default="fast")
+    parser.add_argument("--output", type=Path, help="where to save results (default: benchmarks/results/layout-minify-<timestamp>.json)")
+    args = parser.parse_args()
+
+    report = run(args)
+    output = args.output or RESULTS_FOLDER / f"layout-minify-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    totals = {key: sum(result[key] for result in report["results"].values())
+              for key in ("bytes_before", "bytes_after", "compressed_before", "compressed_after", "compress_seconds_before", "compress_seconds_after")}
+    print(f"Total: {totals['bytes_before'] / 1e6:.1f} -> {totals['bytes_after'] / 1e6:.1f} MB, "
+          f"compressed {totals['compressed_before'] / 1e6:.2f} -> {totals['compressed_after'] / 1e6:.2f} MB, "
+          f"compression {totals['compress_seconds_before']:.1f} -> {totals['compress_seconds_after']:.1f} s")
+    print(f"Results saved to {output}")
+    return 1 if any(result["unverified"] for result in report["results"].values()) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+# Throughput and validation of the in-process Refpack codec on real Base UI resources
+# Compresses the layouts, xml/stbl files and pngs in Base UI at every level, checks that
+# each one decompresses back to the original, and reports MB/s and compression ratios.
+# When refpack_pipe can be found its output is measured the same way and decoded with
+# the in-process decompressor, so the two implementations are checked against each other.
+#
+# Usage:
+#   python benchmarks/refpack_benchmark.py
+#   python benchmarks/refpack_benchmark.py --max-mb 32 --levels max
+#   REFPACK_PIPE=/path/to/refpack_pipe python benchmarks/refpack_benchmark.py
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+BENCHMARK_FOLDER = Path(__file__).resolve().parent
+REPO_FOLDER = BENCHMARK_FOLDER.parent
+RESULTS_FOLDER = BENCHMARK_FOLDER / "results"
+sys.path.insert(0, str(REPO_FOLDER))
+
+from manifest import scan_base_ui
+from dbpf_writer_lib import REFPACK_LEVELS, _find_compressor, compress_refpack, refpack_compress, refpack_decompress
+
+RESOURCE_TYPES = ("layout", "text", "png")
+
+# Files of each resource type, in path order, up to max_bytes of each
+def sample_resources(base_ui, max_bytes):
+    manifest = scan_base_ui(base_ui)
+    samples = {}
+    for resource_type in RESOURCE_TYPES:
+        entries, total = [], 0
+        for entry in sorted(manifest.select_entries(resource_type=resource_type), key=lambda e: e.rel):
+            if total >= max_bytes:
+                break
+            entries.append(manifest.root / entry.rel)
+            total += entry.size
+        samples[resource_type] = [path.read_bytes() for path in entries]
+    return samples
+
+# Compress every file with compress_fn and check each result decodes back to the file
+def measure(files, compress_fn):
+    compressed, seconds, decode_seconds, mismatches = 0, 0.0, 0.0, 0
+    for data in files:
+        start = time.perf_counter()
+        packed = compress_fn(data)
+        seconds += time.perf_counter() - start
+        start = time.perf_counter()
+        try:
+            round_trip_ok = refpack_decompress(packed) == data
+        except ValueError:
+            round_trip_ok = False
+        decode_seconds += time.perf_counter() - start
+        mismatches += not round_trip_ok
+        compressed += len(packed)
+    size = sum(len(data) for data in files)
+    return {
+        "files": len(files),
+        "bytes_in": size,
+        "bytes_out": compressed,
+        "ratio": round(compressed / size, 4) if size else None,
+        "seconds": round(seconds, 3),
+        "mb_per_sec": round(size / seconds / 1e6, 2) if seconds else None,
+        "decode_mb_per_sec": round(size / decode_seconds / 1e6, 2) if decode_seconds else None,
+        "round_trip_failures": mismatches,
+    }
+
+# refpack_pipe if it can be found and writes Refpack (the benchmarks' fake tool doesn't), otherwise None
+def external_compressor():
+    try:
+        _find_compressor()
+    except FileNotFoundError:
+        return None
+    if compress_refpack(b"refpack check " * 4)[1:2] != b"\xfb":
+        print("refpack_pipe doesn't write Refpack streams (the benchmarks' fake tool?) - skipping it")
+        return None
+    return compress_refpack
+
+def run(args):
+    samples = sample_resources(args.base_ui, int(args.max_mb * 1024 * 1024))
+    compressors = {level: (lambda data, level=level: refpack_compress(data, level)) for level in args.levels}
+    external = external_compressor()
+    if external is not None:
+        compressors["external"] = external
+
+    results = {}
+    for resource_type, files in samples.items():
+        for name, compress_fn in compressors.items():
+            result = measure(files, compress_fn)
+            results[f"{resource_type}/{name}"] = result
+            print(f"{resource_type:<8}{name:<10}{result['bytes_in'] / 1e6:>8.2f} MB  ratio {result['ratio']:<7}"
+                  f"{result['mb_per_sec']:>8} MB/s  decode {result['decode_mb_per_sec']} MB/s"
+                  f"{'' if not result['round_trip_failures'] else f'  {result['round_trip_failures']} ROUND TRIP FAILURE(S)'}")
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "levels": {level: REFPACK_LEVELS[level]._asdict() for level in args.levels},
+        "external": external is not None,
+        "results": results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark and validate the in-process Refpack codec on Base UI resources")
+    parser.add_argument("--base-ui", type=Path, default=REPO_FOLDER / "Base UI")
+    parser.add_argument("--levels", nargs="+", choices=REFPACK_LEVELS, default=list(REFPACK_LEVELS))
+    parser.add_argument("--max-mb", type=float, default=8, help="MB of each resource type to compress")
+    parser.add_argument("--output", type=Path, help="where to save results (default: benchmarks/results/refpack-<timestamp>.json)")
+    args = parser.parse_args()
+
+    report = run(args)
+    output = args.output or RESULTS_FOLDER / f"refpack-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Results saved to {output}")
+    failures = sum(result["round_trip_failures"] for result in report["results"].values())
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
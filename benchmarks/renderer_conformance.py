@@ -0,0 +1,101 @@
+# Conformance check for the in-process renderer
+# Renders every svg in Base UI with Inkscape and with cairosvg and compares the pixels.
+# Files that match within the tolerance are saved to the report, which the "auto"
+# renderer reads to decide which files it can render without Inkscape.
+#
+# Usage:
+#   python benchmarks/renderer_conformance.py --inkscape "C:\Program Files\Inkscape\bin\inkscape.exe"
+#   python benchmarks/renderer_conformance.py --inkscape inkscape --tolerance 4 --max-differing 0.001
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+BENCHMARK_FOLDER = Path(__file__).resolve().parent
+REPO_FOLDER = BENCHMARK_FOLDER.parent
+sys.path.insert(0, str(REPO_FOLDER))
+
+import tool_runner
+from manifest import scan_base_ui
+from png_utils import read_png
+from renderers import CairoSvgRenderer, InkscapeRenderer
+
+# Compare two pngs - returns a dict with whether they match and how far apart they are
+# Channels may differ by up to tolerance (anti-aliasing), and only max_differing of the pixels may go beyond that
+def compare_pngs(reference, candidate, tolerance, max_differing):
+    if reference is None or candidate is None:
+        return {"match": False, "reason": "render failed"}
+    ref_width, ref_height, ref_pixels = read_png(reference)
+    width, height, pixels = read_png(candidate)
+    if (ref_width, ref_height) != (width, height):
+        return {"match": False, "reason": f"size {width}x{height}, expected {ref_width}x{ref_height}"}
+    if ref_pixels == pixels:
+        return {"match": True, "max_difference": 0, "differing_pixels": 0}
+    max_difference = 0
+    differing = 0
+    for i in range(0, len(pixels), 4):
+        difference = max(abs(a - b) for a, b in zip(ref_pixels[i:i + 4], pixels[i:i + 4]))
+        max_difference = max(max_difference, difference)
+        if difference > tolerance:
+            differing += 1
+    fraction = differing / (width * height)
+    return {
+        "match": fraction <= max_differing,
+        "max_difference": max_difference,
+        "differing_pixels": differing,
+        "differing_fraction": round(fraction, 6),
+    }
+
+def run(args):
+    manifest = scan_base_ui(args.base_ui)
+    svg_files = manifest.select(kind="main", resource_type="svg")
+    inkscape = InkscapeRenderer(args.inkscape)
+    cairo = CairoSvgRenderer()
+
+    results = {}
+    start = time.perf_counter()
+    for svg in svg_files:
+        svg_text = svg.read_text(encoding="utf-8")
+        reference, candidate = tool_runner.gather_sync([inkscape.render(svg_text, svg.name), cairo.render(svg_text, svg.name)])
+        try:
+            results[svg.name] = compare_pngs(reference, candidate, args.tolerance, args.max_differing)
+        except ValueError as e:
+            results[svg.name] = {"match": False, "reason": str(e)}
+        status = "match" if results[svg.name]["match"] else "differs"
+        print(f"{status:<9}{svg.name}")
+
+    matching = sorted(name for name, result in results.items() if result["match"])
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "renderer": "cairosvg",
+        "tolerance": args.tolerance,
+        "max_differing": args.max_differing,
+        "seconds": round(time.perf_counter() - start, 1),
+        "matching": matching,
+        "results": results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare cairosvg renders with Inkscape renders of the Base UI svg files")
+    parser.add_argument("--inkscape", required=True, help="path to inkscape")
+    parser.add_argument("--base-ui", type=Path, default=REPO_FOLDER / "Base UI")
+    parser.add_argument("--tolerance", type=int, default=2, help="largest channel difference still counted as the same pixel")
+    parser.add_argument("--max-differing", type=float, default=0.0005, help="fraction of pixels allowed beyond the tolerance")
+    parser.add_argument("--output", type=Path, default=REPO_FOLDER / "Cache" / "renderer_conformance.json",
+                        help="where to save the report (the auto renderer reads it from Cache/renderer_conformance.json)")
+    args = parser.parse_args()
+
+    try:
+        report = run(args)
+    except RuntimeError as e:
+        print(e)
+        return 1
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, indent=2))
+    print(f"{len(report['matching'])} of {len(report['results'])} svg file(s) match, report saved to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
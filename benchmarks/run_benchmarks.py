@@ -0,0 +1,251 @@
+# Benchmarks for the build pipeline, run against a synthetic Base UI and fake tools
+#
+# Usage:
+#   python benchmarks/run_benchmarks.py                 # default size, saves results/<timestamp>.json
+#   python benchmarks/run_benchmarks.py --sections 8 --inkscape-latency 0.2
+#   python benchmarks/run_benchmarks.py --compare results/a.json results/b.json
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCHMARK_FOLDER = Path(__file__).resolve().parent
+REPO_FOLDER = BENCHMARK_FOLDER.parent
+RESULTS_FOLDER = BENCHMARK_FOLDER / "results"
+sys.path.insert(0, str(REPO_FOLDER))
+
+from synthetic_ui import generate_base_ui, install_fake_tools, use_fake_refpack
+from utils import inkscape_info, recolour_files
+from dbpf_writer_lib import IndexTable, create_dbpf_package, read_resources
+from recolour import run_recolour
+import parallel_recolour
+from build_log import start_build_log
+
+# A representative replacement table (the Light preset with a purple accent)
+REPLACEMENTS_SVG = {
+    "#ff5599": "#b179ff", "#ff80b2": "#c398ff", "#ffaacc": "#dbb6ff", "#ffd5e5": "#e7d6ff",
+    "rgb\\(255,170,204\\)": "rgb(219,182,255)", "rgb\\(255,221,234\\)": "rgb(231,214,255)",
+    "rgb\\(191,191,191\\)": "rgb(179,179,179)", "#f2f2f2": "#f2f2f2", "#f9f9f9": "#f9f9f9",
+    "#ffffff": "#ffffff", "#b3b3b3": "#b3b3b3", "#cccccc": "#cccccc",
+    "opacity:0.75": "opacity:0.75", "opacity:0.80": "opacity:0.75", "opacity:0.8": "opacity:0.75",
+}
+REPLACEMENTS_LAYOUT = {
+    "0xffff5599": "0xffb179ff", "0xffff80b2": "0xffc398ff", "0xffffaacc": "0xffdbb6ff",
+    "0xffffd5e5": "0xffe7d6ff", "0xff545354": "0xff545354", "0xfffaf7f9": "0xfff2f2f2",
+    "0xffcccccc": "0xffcccccc", "0xff545355": "0xff545354",
+}
+
+# Seconds a fresh interpreter may take to import each module of the headless core
+IMPORT_BUDGETS = {"build": 0.05, "recolour": 0.5}
+
+# Run fn repeat times and return timing statistics in seconds
+def measure(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {
+        "min": round(min(times), 4),
+        "median": round(statistics.median(times), 4),
+        "mean": round(statistics.mean(times), 4),
+        "runs": len(times),
+    }
+
+# Import time of a module in a fresh interpreter, and whether importing it loaded tkinter
+def import_time(module):
+    code = (
+        "import sys, time; start = time.perf_counter(); "
+        f"import {module}; "
+        "print(time.perf_counter() - start, 'tkinter' in sys.modules)"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=REPO_FOLDER, stdout=subprocess.PIPE, text=True, check=True
+    ).stdout.split()
+    return float(output[0]), output[1] == "True"
+
+# Entries for a package index: a few resource types and groups, random instances, as in a merged package
+def make_index_entries(count, seed):
+    rng = random.Random(seed)
+    types = [0x2F7D0004, 0x025C95B6, 0x0333406C, 0x220557DA]
+    entries = []
+    offset = 96
+    for _ in range(count):
+        size = rng.randrange(64, 64 * 1024)
+        entries.append((rng.choice(types), rng.choice((0, 0x48D3BDB6)), rng.getrandbits(64), offset, size, size * 2))
+        offset += size + (-size % 16)
+    return entries
+
+# Fill and serialise a package index - the part of create_dbpf_package that grows with the number of resources
+def build_index(entries):
+    table = IndexTable()
+    for type_id, group_id, instance_id, offset, disk_size, mem_size in entries:
+        table.append(type_id, group_id, instance_id, offset, disk_size, mem_size, 0xFFFF)
+    return table.to_bytes(table.index_type())
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_FOLDER,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+def run(args):
+    workspace = Path(tempfile.mkdtemp(prefix="cloudui_bench_"))
+    try:
+        base = generate_base_ui(
+            workspace, sections=args.sections, svgs_per_section=args.svgs, layouts_per_section=args.layouts,
+            payload_kb=args.payload_kb, sprites=args.sprites, seed=args.seed
+        )
+        inkscape_path, refpack_path = install_fake_tools(workspace / "tools", args.inkscape_latency, args.refpack_latency)
+        use_fake_refpack(refpack_path)
+
+        svg_files = sorted(base.rglob("*.svg"))
+        layout_files = sorted(base.rglob("*.layout"))
+        source_bytes = sum(f.stat().st_size for f in svg_files + layout_files)
+        results = {}
+
+        # recolour_files over every svg and layout
+        scratch = workspace / "scratch"
+        scratch.mkdir()
+        def bench_recolour():
+            for f in svg_files:
+                recolour_files(f, REPLACEMENTS_SVG, scratch / f.name)
+            for f in layout_files:
+                recolour_files(f, REPLACEMENTS_LAYOUT, scratch / f.name)
+        results["recolour_files"] = measure(bench_recolour, args.repeat)
+        results["recolour_files"]["mb_per_sec"] = round(source_bytes / 1e6 / results["recolour_files"]["median"], 2)
+
+        # The same recolouring through the process pool (forced on, however small the synthetic UI is)
+        def bench_recolour_parallel():
+            minimum, parallel_recolour.MIN_PARALLEL_BYTES = parallel_recolour.MIN_PARALLEL_BYTES, 0
+            try:
+                parallel_recolour.recolour_many(svg_files, REPLACEMENTS_SVG)
+                parallel_recolour.recolour_many(layout_files, REPLACEMENTS_LAYOUT)
+            finally:
+                parallel_recolour.MIN_PARALLEL_BYTES = minimum
+        results["recolour_parallel"] = measure(bench_recolour_parallel, args.repeat)
+        results["recolour_parallel"]["mb_per_sec"] = round(source_bytes / 1e6 / results["recolour_parallel"]["median"], 2)
+
+        # read_resources + create_dbpf_package on the recoloured files
+        results["read_resources"] = measure(lambda: read_resources(scratch), args.repeat)
+        resources = read_resources(scratch)
+        package = workspace / "bench.package"
+        with start_build_log(workspace / "bench_log.txt"):
+            # skip_unchanged is off so every run writes the package instead of finding it unchanged
+            results["create_dbpf_package"] = measure(lambda: create_dbpf_package(package, resources, skip_unchanged=False), args.repeat)
+        results["create_dbpf_package"]["resources"] = len(resources)
+
+        # Package index for very large (merged) packages
+        for count in args.index_sizes:
+            entries = make_index_entries(count, args.seed)
+            results[f"index_{count}"] = measure(lambda: build_index(entries), args.repeat)
+            results[f"index_{count}"]["entries"] = count
+
+        # Inkscape check at startup, first run and cached
+        check_cache = workspace / "inkscape_check.json"
+        results["inkscape_check"] = measure(lambda: inkscape_info(inkscape_path), args.repeat)
+        inkscape_info(inkscape_path, check_cache)
+        results["inkscape_check_cached"] = measure(lambda: inkscape_info(inkscape_path, check_cache), args.repeat)
+
+        # Import time of the headless core - build only loads colour functions until a build starts,
+        # recolour is the whole build engine - neither may load tkinter
+        for module, budget in IMPORT_BUDGETS.items():
+            timings = [import_time(module) for _ in range(args.repeat)]
+            seconds = [t for t, _ in timings]
+            results[f"import_{module}"] = {
+                "min": round(min(seconds), 4),
+                "median": round(statistics.median(seconds), 4),
+                "mean": round(statistics.mean(seconds), 4),
+                "runs": len(seconds),
+                "budget": budget,
+                "within_budget": statistics.median(seconds) <= budget,
+                "tkinter_loaded": any(tk for _, tk in timings),
+            }
+
+        # End-to-end build
+        def bench_end_to_end():
+            run_recolour(
+                ui_path=workspace, ui_name="Bench UI", replacements_layout=REPLACEMENTS_LAYOUT,
+                replacements_svg=REPLACEMENTS_SVG, inkscape_path=inkscape_path, colour_values={"Bench": "yes"},
+                run_logos=True, run_patches=True, run_processing=True
+            )
+        with start_build_log(workspace / "bench_log.txt"):
+            results["run_recolour"] = measure(bench_end_to_end, args.end_to_end_repeat)
+
+        return {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("compare", "output")},
+            "source_files": len(svg_files) + len(layout_files),
+            "source_bytes": source_bytes,
+            "results": results,
+        }
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+# Print a side by side comparison of two saved result files
+def compare(path_a, path_b):
+    a = json.loads(Path(path_a).read_text())
+    b = json.loads(Path(path_b).read_text())
+    if a["config"] != b["config"]:
+        print("Warning: the two runs used different settings, comparisons may not be meaningful")
+    print(f"{'benchmark':<22}{'A median':>12}{'B median':>12}{'B / A':>10}")
+    for name, result_a in a["results"].items():
+        result_b = b["results"].get(name)
+        if result_b is None:
+            continue
+        ratio = result_b["median"] / result_a["median"] if result_a["median"] else float("nan")
+        print(f"{name:<22}{result_a['median']:>11.3f}s{result_b['median']:>11.3f}s{ratio:>9.2f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Cloud UI build pipeline on a synthetic Base UI")
+    parser.add_argument("--sections", type=int, default=4, help="number of synthetic UI sections")
+    parser.add_argument("--svgs", type=int, default=20, help="svg files per section")
+    parser.add_argument("--layouts", type=int, default=8, help="layout files per section")
+    parser.add_argument("--payload-kb", type=int, default=256, help="size of the base64 image payload in each svg")
+    parser.add_argument("--sprites", type=int, default=200, help="coloured elements per svg")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--inkscape-latency", type=float, default=0.05, help="seconds added to each fake inkscape call")
+    parser.add_argument("--refpack-latency", type=float, default=0.0, help="seconds added to each fake refpack call")
+    parser.add_argument("--index-sizes", type=lambda v: [int(n) for n in v.split(",")], default=[10000, 100000],
+                        help="comma separated entry counts for the package index benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each micro benchmark")
+    parser.add_argument("--end-to-end-repeat", type=int, default=1, help="runs of the full build")
+    parser.add_argument("--output", type=Path, help="where to save results (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("A", "B"), help="compare two saved result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = run(args)
+    output = args.output or RESULTS_FOLDER / f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+
+    for name, result in report["results"].items():
+        extra = f"  ({result['mb_per_sec']} MB/s)" if "mb_per_sec" in result else ""
+        if "budget" in result:
+            extra = f"  (budget {result['budget']:.3f}s{'' if result['within_budget'] else ' EXCEEDED'}"
+            extra += f"{', loads tkinter!' if result['tkinter_loaded'] else ''})"
+        print(f"{name:<22}median {result['median']:.3f}s  min {result['min']:.3f}s{extra}")
+    print(f"Results saved to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import base64
+import os
+import random
+import stat
+import sys
+from pathlib import Path
+
+# --------------------------------- #
+# Synthetic Base UI generator and stand-in tool installer for the benchmarks
+# Everything is derived from the seed, so the same settings always produce the same tree
+# --------------------------------- #
+
+BENCHMARK_FOLDER = Path(__file__).resolve().parent
+
+# Colours the real Base UI uses, so the replacement tables have work to do
+SVG_COLOURS = ["#ff5599", "#ff80b2", "#ffaacc", "#ffd5e5", "#f2f2f2", "#f9f9f9", "#ffffff", "#b3b3b3", "#cccccc", "#123456"]
+SVG_RGB = ["rgb(255,170,204)", "rgb(255,221,234)", "rgb(191,191,191)", "rgb(10,20,30)"]
+LAYOUT_COLOURS = ["0xffff5599", "0xffff80b2", "0xffffaacc", "0xffffd5e5", "0xff545354", "0xfffaf7f9", "0xffcccccc", "0xff000000", "0xffffffff"]
+
+def _instance(rng):
+    return f"{rng.getrandbits(64):016X}"
+
+def make_svg(rng, name, width, height, sprites, payload_bytes):
+    payload = base64.b64encode(rng.randbytes(payload_bytes)).decode("ascii")
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8" standalone="no"?>\n',
+        f'<svg version="1.1" id="svg1" width="{width}" height="{height}" viewBox="0 0 {width} {height}" '
+        f'sodipodi:docname="{name}" xmlns:inkscape="http://www.inkscape.org/namespaces/inkscape" '
+        'xmlns:sodipodi="http://sodipodi.sourceforge.net/DTD/sodipodi-0.dtd" '
+        'xmlns:xlink="http://www.w3.org/1999/xlink" xmlns="http://www.w3.org/2000/svg">\n',
+        '<defs id="defs1"><linearGradient id="grad1"><stop style="stop-color:#ffaacc;stop-opacity:1" offset="0" id="stop1" />'
+        '<stop style="stop-color:#ffffff;stop-opacity:1" offset="1" id="stop2" /></linearGradient></defs>\n',
+        f'<image id="image1" x="0" y="0" width="{width // 2}" height="{height // 2}" '
+        f'xlink:href="data:image/png;base64,{payload}" />\n',
+    ]
+    for i in range(sprites):
+        x, y = rng.randrange(width - 32), rng.randrange(height - 32)
+        if i % 7 == 0:
+            fill = "url(#grad1)"
+        elif i % 3 == 0:
+            fill = rng.choice(SVG_RGB)
+        else:
+            fill = rng.choice(SVG_COLOURS)
+        opacity = rng.choice(["1", "0.75", "0.8"])
+        parts.append(
+            f'<rect id="rect{i}" x="{x}" y="{y}" width="{rng.randrange(4, 32)}" height="{rng.randrange(4, 32)}" '
+            f'style="fill:{fill};opacity:{opacity};stroke:#b3b3b3" />\n'
+        )
+    parts.append("</svg>\n")
+    return "".join(parts)
+
+def make_layout(rng, objects):
+    lines = ['\ufeff<?xml version="1.0" encoding="utf-8"?>\n<graph class="Layout" type="Layout">\n']
+    for i in range(objects):
+        lines.append(f'  <object cls="Window" clsid="0x0f0b8b73" id="0x{rng.getrandbits(32):08x}">\n')
+        for prop in ("FillColor", "ShadeColor", "TextColor"):
+            lines.append(f'    <prop name="{prop}" propid="0xeec1b006" type="uint32" value="{rng.choice(LAYOUT_COLOURS)}" />\n')
+        lines.append(f'    <prop name="Area" propid="0xeec1b005" type="rectf" value="0,0,{rng.randrange(1024)},{rng.randrange(768)}" />\n')
+        lines.append("  </object>\n")
+    lines.append("</graph>\n")
+    return "".join(lines)
+
+# Create a Base UI tree under root/"Base UI" and return its path
+def generate_base_ui(root, sections=4, svgs_per_section=20, layouts_per_section=8, text_files=6,
+                     payload_kb=64, sprites=200, canvas=(512, 512), patches=1, seed=1):
+    rng = random.Random(seed)
+    base = Path(root) / "Base UI"
+    base.mkdir(parents=True, exist_ok=True)
+    (base / "CLOUD UI VERSION.txt").write_text("v0.0.0-bench", encoding="utf-8")
+    width, height = canvas
+
+    def fill_folder(folder, svg_count, layout_count, prefix):
+        folder.mkdir(parents=True, exist_ok=True)
+        for n in range(svg_count):
+            name = f"S3_2F7D0004_00000000_{_instance(rng)}_ATLAS_{prefix}_{n:02d}%%+IMAG.svg"
+            svg = make_svg(rng, name, width, height, sprites, payload_kb * 1024)
+            (folder / name).write_text(svg, encoding="utf-8")
+        for n in range(layout_count):
+            name = f"S3_025C95B6_00000000_{_instance(rng)}_{prefix}{n:02d}%%+LAYO.layout"
+            (folder / name).write_text(make_layout(rng, sprites // 4), encoding="utf-8")
+
+    for s in range(sections):
+        folder = base / f"Synthetic Section {s:02d}"
+        fill_folder(folder, svgs_per_section, layouts_per_section, f"Synth{s:02d}")
+
+    text_folder = base / "Loading Screen - Startup" / "Loading Text"
+    text_folder.mkdir(parents=True, exist_ok=True)
+    for n in range(text_files):
+        (text_folder / f"S3_0333406C_00000000_{_instance(rng)}_Text{n}%%+_XML.xml").write_bytes(rng.randbytes(8 * 1024))
+        (text_folder / f"S3_220557DA_00000000_{_instance(rng)}_Strings{n}%%+STBL.stbl").write_bytes(rng.randbytes(8 * 1024))
+
+    (base / "Patches").mkdir(exist_ok=True)
+    for p in range(patches):
+        patch = base / "Patches" / f"Synthetic_Patch{p}"
+        fill_folder(patch, 2, 2, f"Patch{p}")
+        (patch / "Read me.txt").write_text("Synthetic patch for benchmarks", encoding="utf-8")
+    return base
+
+# Write launchers for the fake tools into folder and return (inkscape path, refpack path)
+def install_fake_tools(folder, inkscape_latency=0.0, refpack_latency=0.0):
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    tools = {}
+    for name, script, variable, latency in [
+        ("inkscape", "fake_inkscape.py", "FAKE_INKSCAPE_LATENCY", inkscape_latency),
+        ("refpack_pipe", "fake_refpack_pipe.py", "FAKE_REFPACK_LATENCY", refpack_latency),
+    ]:
+        script_path = BENCHMARK_FOLDER / script
+        if sys.platform == "win32":
+            launcher = folder / f"{name}.bat"
+            launcher.write_text(f'@set {variable}={latency}\n@"{sys.executable}" "{script_path}" %*\n')
+        else:
+            launcher = folder / name
+            launcher.write_text(f'#!/bin/sh\n{variable}={latency} exec "{sys.executable}" "{script_path}" "$@"\n')
+            launcher.chmod(launcher.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+        tools[name] = str(launcher)
+    return tools["inkscape"], tools["refpack_pipe"]
+
+# Use the fake refpack_pipe for compress_refpack in this process
+def use_fake_refpack(refpack_path):
+    os.environ["REFPACK_PIPE"] = refpack_path
@@ -0,0 +1,188 @@
+import argparse
+import sys
+from collections import namedtuple
+from pathlib import Path
+from colours import COLOUR_NAMES, PRESETS, build_replacements, is_hex_colour, theme_colours, validate_selection
+
+# --------------------------------- #
+# Headless builds
+# Builds a UI from a BuildConfig without any window: colour choices in, packages out.
+# Only the colour functions are imported up front. The build modules (asyncio, the
+# package writer etc.) load when a build starts, so importing this stays quick, and
+# nothing here or in the build imports Tk, so it runs on machines without a display.
+# The GUI is a client of this module like any other.
+#
+# Usage:
+#   python build.py --ui-name "My UI" --preset Dark --accent "#7fb3ff" --inkscape /usr/bin/inkscape
+#   python build.py --ui-name "My UI" --colour "Main Font=#222222" --renderer cairosvg --no-patches
+#   python build.py --ui-name "My UI" --inkscape inkscape --render-worker 10.0.0.5:8766 --render-worker 10.0.0.6:8766
+#   python build.py --ui-name "My UI" --inkscape inkscape --compression max --reproducible
+# --------------------------------- #
+
+# ui_path is the folder with Base UI in it - packages go to ui_path/Creations/ui_name
+# colour_values is a full selection as made by colours.theme_colours
+# render_workers are host:port addresses of render_worker.py instances, used by the "remote" renderer
+# compression is one of dbpf_writer_lib.COMPRESSION_MODES - "fast" for dev builds, "max" for releases
+BuildConfig = namedtuple("BuildConfig", [
+    "ui_path", "ui_name", "colour_values", "inkscape_path", "preset",
+    "run_main", "run_logos", "run_patches", "patch_names", "keep_processing", "run_partial",
+    "optimise_png", "renderer", "resume", "reproducible", "incremental", "trace_memory", "render_workers",
+    "compression", "minify_layout", "normalise_svg",
+], defaults=[None, "Light", True, True, True, None, False, True, False, "inkscape", False, False, False, False, (), "auto", False, False])
+
+# packages is every package the build wrote or found unchanged, missing_files the main UI images that failed to export
+BuildResult = namedtuple("BuildResult", ["ui_folder", "packages", "missing_files", "reused_jobs", "seconds"])
+
+def format_elapsed(seconds):
+    minutes, seconds = divmod(seconds, 60)
+    if minutes >= 1:
+        return f"{int(minutes)} min {int(seconds)} sec"
+    return f"{int(seconds)} sec"
+
+# Build the packages described by config and return a BuildResult
+# Raises ValueError if the UI name, preset, colours or compression aren't valid
+def build_theme(config):
+    from dbpf_writer_lib import COMPRESSION_MODES
+    invalid_fields = validate_selection(config.ui_name, config.colour_values)
+    if config.preset not in PRESETS:
+        invalid_fields.append(f"Preset (must be one of {', '.join(PRESETS)})")
+    if config.compression not in COMPRESSION_MODES:
+        invalid_fields.append(f"Compression (must be one of {', '.join(COMPRESSION_MODES)})")
+    # Everything in the UI folder is cleared before a full build, so it must be a folder of its own in Creations
+    creations = (Path(config.ui_path) / "Creations").resolve()
+    if not invalid_fields and (creations / config.ui_name).resolve().parent != creations:
+        invalid_fields.append("UI Name (must name a folder directly inside Creations)")
+    if invalid_fields:
+        raise ValueError("Invalid build settings:\n" + "\n".join(invalid_fields))
+    replacements_svg, _, replacements_layout = build_replacements(config.colour_values, config.preset)
+
+    from recolour import run_recolour
+    return run_recolour(
+        ui_path=Path(config.ui_path),
+        ui_name=config.ui_name,
+        replacements_layout=replacements_layout,
+        replacements_svg=replacements_svg,
+        inkscape_path=config.inkscape_path,
+        colour_values=config.colour_values,
+        run_logos=config.run_logos,
+        run_patches=config.run_patches,
+        run_processing=not config.keep_processing,
+        run_partial=config.run_partial,
+        optimise_png=config.optimise_png,
+        renderer=config.renderer,
+        resume=config.resume,
+        reproducible=config.reproducible,
+        run_main=config.run_main,
+        patch_names=config.patch_names,
+        incremental=config.incremental,
+        trace_memory=config.trace_memory,
+        render_workers=config.render_workers,
+        compression=config.compression,
+        minify_layout=config.minify_layout,
+        normalise_svg=config.normalise_svg,
+    )
+
+# The preview svg recoloured for a selection
+def preview_svg_text(colour_values, preset, preview_svg):
+    from utils import recolour_text
+    _, replacements_svg_preview, _ = build_replacements(colour_values, preset)
+    return recolour_text(Path(preview_svg), replacements_svg_preview)
+
+# Recolour and render the preview svg for a selection - returns png bytes, or None if nothing was rendered
+def render_preview(colour_values, preset, inkscape_path, preview_svg):
+    from utils import render_png
+    return render_png(inkscape_path, preview_svg_text(colour_values, preset, preview_svg), Path(preview_svg).name)
+
+# Recolouring runs on a worker thread, so neither the caller nor the tool loop waits for it
+async def _render_preview_async(colour_values, preset, inkscape_path, preview_svg, name):
+    import asyncio
+    from utils import render_png_async
+    svg_text = await asyncio.to_thread(preview_svg_text, colour_values, preset, preview_svg)
+    return await render_png_async(inkscape_path, svg_text, name)
+
+# Start rendering the previews of several selections at once, without waiting for them
+# Returns a concurrent.futures.Future per selection, in order, of png bytes or None - cancel one to stop its render
+# All of them are queued together, tool_runner decides how many inkscape processes actually run
+def render_previews(selections, preset, inkscape_path, preview_svg):
+    import tool_runner
+    return [
+        tool_runner.submit(_render_preview_async(colour_values, preset, inkscape_path, preview_svg, f"preview {i + 1}"))
+        for i, colour_values in enumerate(selections)
+    ]
+
+def _hex_colour(value):
+    if not is_hex_colour(value):
+        raise argparse.ArgumentTypeError(f"{value} is not a hex colour like #dbb6ff")
+    return value
+
+# "Main Font=#222222" -> ("Main Font", "#222222")
+def _colour_override(value):
+    name, sep, colour = value.partition("=")
+    if not sep or name.strip() not in COLOUR_NAMES + ["Opacity"]:
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE with NAME one of: {', '.join(COLOUR_NAMES)}, Opacity")
+    return name.strip(), colour.strip()
+
+def main():
+    from dbpf_writer_lib import COMPRESSION_MODES
+    parser = argparse.ArgumentParser(description="Build a Cloud UI recolour without the window")
+    parser.add_argument("--ui-path", type=Path, default=Path(__file__).resolve().parent, help="folder containing Base UI")
+    parser.add_argument("--ui-name", required=True, help="name of the UI, used for the output folder and package names")
+    parser.add_argument("--preset", choices=PRESETS, default="Light")
+    parser.add_argument("--accent", type=_hex_colour, help="main accent colour - the other accents are worked out from it")
+    parser.add_argument("--colour", type=_colour_override, action="append", default=[], metavar="NAME=VALUE",
+                        help="set one colour (or Opacity) directly, can be repeated")
+    parser.add_argument("--inkscape", help="path to inkscape (needed by the inkscape and auto renderers)")
+    parser.add_argument("--renderer", help="inkscape, cairosvg, auto or remote (default: remote with --render-worker, otherwise inkscape)")
+    parser.add_argument("--render-worker", action="append", default=[], metavar="HOST:PORT",
+                        help="render worker to send svg exports to, can be repeated")
+    parser.add_argument("--no-logos", action="store_true", help="skip the language logo packages")
+    parser.add_argument("--no-patches", action="store_true", help="skip the compatibility patches")
+    parser.add_argument("--keep-processing", action="store_true", help="keep the processing files for debugging")
+    parser.add_argument("--optimise-png", action="store_true")
+    parser.add_argument("--minify-layout", action="store_true", help="strip whitespace and comments from .layout files")
+    parser.add_argument("--normalise-svg", action="store_true",
+                        help="render from copies of the Base UI svgs without Inkscape's editor data (checked against the originals once)")
+    parser.add_argument("--compression", choices=COMPRESSION_MODES, default="auto",
+                        help="refpack_pipe (external), in-process Refpack (fast for dev builds, max for releases), or auto")
+    parser.add_argument("--reproducible", action="store_true", help="stamp packages with a time taken from Base UI")
+    parser.add_argument("--resume", action="store_true", help="continue a build that stopped")
+    args = parser.parse_args()
+    renderer = args.renderer or ("remote" if args.render_worker else "inkscape")
+    # Without it every export would quietly come back empty and end up under "Missing files"
+    if renderer in ("inkscape", "auto") and not args.inkscape:
+        parser.error(f"--inkscape is required with the {renderer} renderer")
+
+    from build_log import start_build_log
+    config = BuildConfig(
+        ui_path=args.ui_path,
+        ui_name=args.ui_name,
+        colour_values=theme_colours(args.preset, args.accent, dict(args.colour)),
+        inkscape_path=args.inkscape,
+        preset=args.preset,
+        run_logos=not args.no_logos,
+        run_patches=not args.no_patches,
+        keep_processing=args.keep_processing,
+        optimise_png=args.optimise_png,
+        minify_layout=args.minify_layout,
+        normalise_svg=args.normalise_svg,
+        compression=args.compression,
+        renderer=renderer,
+        render_workers=tuple(args.render_worker),
+        resume=args.resume,
+        reproducible=args.reproducible,
+    )
+    try:
+        with start_build_log(args.ui_path / "console_log.txt"):
+            result = build_theme(config)
+    except (ValueError, RuntimeError, OSError) as e: # e.g. bad selections, no Base UI, Creations not writable
+        print(e)
+        return 1
+    for package in result.packages:
+        print(package)
+    if result.missing_files:
+        print("Missing files:\n" + "\n".join(result.missing_files))
+    print(f"Built {len(result.packages)} package(s) in {format_elapsed(result.seconds)}")
+    return 1 if result.missing_files else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from build_log import get_logger
+from parallel_recolour import recolour_many
+
+# --------------------------------- #
+# Build journal
+# Every package a build writes is appended to journal.jsonl with a hash of its input
+# and of the file. If a build dies, the next one can resume: packages whose input is
+# unchanged and whose file still matches its hash aren't written again. Resumed and
+# incremental builds (watch mode) also journal each recolour and export job and keep
+# its output in a blob folder, so those jobs can be skipped too. A normal build doesn't
+# pay for that - it never reads, hashes or copies a file just for the journal. Compressed
+# resources already survive between builds in the compression cache, so compression
+# isn't journalled again here. The journal is removed once the build finishes, unless
+# it's kept for incremental builds, which reuse it the same way.
+# --------------------------------- #
+
+log = get_logger("build_journal")
+
+JOURNAL_FILE = "journal.jsonl"
+BLOB_FOLDER = "blobs"
+FINISHED_FILE = "finished" # marks a journal kept after its build finished
+
+# sha1 of several str/bytes parts
+def digest(*parts):
+    h = hashlib.sha1()
+    for part in parts:
+        data = part.encode("utf-8") if isinstance(part, str) else part
+        h.update(len(data).to_bytes(8, "little"))
+        h.update(data)
+    return h.hexdigest()
+
+def journal_folder(ui_path, ui_name):
+    return Path(ui_path) / "Cache" / "Build Journal" / ui_name
+
+# Whether a build of ui_name stopped before finishing and can be resumed
+def has_unfinished_build(ui_path, ui_name):
+    folder = journal_folder(ui_path, ui_name)
+    return (folder / JOURNAL_FILE).is_file() and not (folder / FINISHED_FILE).exists()
+
+class BuildJournal:
+    # resume reuses the jobs of the last build and keeps the outputs of this one's recolour and export jobs
+    def __init__(self, folder, resume=False):
+        self.folder = Path(folder)
+        self.blobs = self.folder / BLOB_FOLDER
+        self.keep_outputs = resume
+        self.entries = {} # (kind, key) -> (input hash, output hash)
+        self.reused = 0
+        self._lock = threading.Lock()
+        if resume:
+            self._load()
+        elif self.folder.exists():
+            shutil.rmtree(self.folder)
+        if self.keep_outputs:
+            self.blobs.mkdir(parents=True, exist_ok=True)
+        else:
+            self.folder.mkdir(parents=True, exist_ok=True)
+        (self.folder / FINISHED_FILE).unlink(missing_ok=True)
+
+    def _load(self):
+        path = self.folder / JOURNAL_FILE
+        if not path.is_file():
+            return
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    job = json.loads(line)
+                    self.entries[(job["kind"], job["key"])] = (job["input"], job["output"])
+                except (ValueError, KeyError):
+                    break # a line cut short by the crash, nothing after it can be trusted
+        log.info(f"- Resuming build: {len(self.entries)} finished job(s) in the journal")
+
+    def _append(self, kind, key, input_hash, output_hash):
+        with self._lock:
+            self.entries[(kind, key)] = (input_hash, output_hash)
+            # Opened for each job so the journal is complete on disk whenever the build stops
+            with open(self.folder / JOURNAL_FILE, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"kind": kind, "key": key, "input": input_hash, "output": output_hash}) + "\n")
+
+    # Output of a finished job, or None if it has to run (again)
+    def get(self, kind, key, input_hash):
+        entry = self.entries.get((kind, key))
+        if entry is None or entry[0] != input_hash:
+            return None
+        try:
+            data = (self.blobs / entry[1]).read_bytes()
+        except OSError:
+            return None
+        if hashlib.sha1(data).hexdigest() != entry[1]:
+            return None
+        self.reused += 1
+        return data
+
+    # Record a finished job and keep its output
+    def put(self, kind, key, input_hash, data):
+        output_hash = hashlib.sha1(data).hexdigest()
+        blob = self.blobs / output_hash
+        if not blob.is_file():
+            tmp = blob.with_suffix(".tmp")
+            tmp.write_bytes(data)
+            tmp.replace(blob)
+        self._append(kind, key, input_hash, output_hash)
+        return data
+
+    # Recolour files, in a process pool if there's enough to do - returns their text in order
+    # Files recoloured by an earlier run are reused and only the rest go to the pool
+    def recolour_many(self, paths, replacements):
+        if not self.keep_outputs:
+            return recolour_many(paths, replacements)
+        table = json.dumps(replacements, sort_keys=True)
+        input_hashes = [digest(Path(path).read_bytes(), table) for path in paths]
+        texts = [self.get("recolour", str(path), input_hash) for path, input_hash in zip(paths, input_hashes)]
+        missing = [i for i, data in enumerate(texts) if data is None]
+        for i, text in zip(missing, recolour_many([paths[i] for i in missing], replacements)):
+            texts[i] = self.put("recolour", str(paths[i]), input_hashes[i], text.encode("utf-8"))
+        return [data.decode("utf-8") for data in texts]
+
+    # Run an export job (render is a function returning a coroutine), or reuse the png from an earlier run
+    # key has to be unique within the build, e.g. section and file name
+    async def export(self, key, svg_text, renderer_name, render):
+        if not self.keep_outputs:
+            return await render()
+        input_hash = digest(svg_text, renderer_name)
+        png_data = self.get("export", key, input_hash)
+        if png_data is None:
+            png_data = await render()
+            if png_data is not None:
+                self.put("export", key, input_hash, png_data)
+        return png_data
+
+    # Whether a package was already written from the same resources and is still intact on disk
+    def package_done(self, package_path, input_hash):
+        entry = self.entries.get(("package", str(package_path)))
+        if entry is None or entry[0] != input_hash:
+            return False
+        try:
+            return hashlib.sha1(Path(package_path).read_bytes()).hexdigest() == entry[1]
+        except OSError:
+            return False
+
+    # output_hash is the sha1 of the package file, as the package writer worked it out while writing it
+    def record_package(self, package_path, input_hash, output_hash):
+        self._append("package", str(package_path), input_hash, output_hash)
+
+    # Rewrite the journal with only the latest entry per job and drop blobs nothing refers to any more,
+    # so a journal kept between many incremental builds doesn't keep growing
+    def _compact(self):
+        with self._lock:
+            lines = [
+                json.dumps({"kind": kind, "key": key, "input": input_hash, "output": output_hash}) + "\n"
+                for (kind, key), (input_hash, output_hash) in self.entries.items()
+            ]
+            tmp = self.folder / (JOURNAL_FILE + ".tmp")
+            tmp.write_text("".join(lines), encoding="utf-8")
+            tmp.replace(self.folder / JOURNAL_FILE)
+            used = {output_hash for _, output_hash in self.entries.values()}
+        for blob in self.blobs.iterdir() if self.blobs.is_dir() else ():
+            if blob.name not in used:
+                blob.unlink(missing_ok=True)
+
+    # The build finished, nothing to resume any more
+    # With keep the journal stays, so the next incremental build can reuse its jobs
+    def finish(self, keep=False):
+        if keep:
+            self._compact()
+            (self.folder / FINISHED_FILE).touch()
+        else:
+            shutil.rmtree(self.folder, ignore_errors=True)
+
+# Hash of everything that goes into a package ({file name: bytes or source path})
+# Files passed through unchanged are identified by their path, size and modified time rather than read
+def package_digest(files):
+    parts = []
+    for name in sorted(files):
+        data = files[name]
+        if isinstance(data, bytes):
+            parts += [name, data]
+        else:
+            st = os.stat(data)
+            parts += [name, f"{data}|{st.st_size}|{st.st_mtime_ns}"]
+    return digest(*parts)
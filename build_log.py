@@ -0,0 +1,159 @@
+import contextvars
+import itertools
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+
+# --------------------------------- #
+# Logging for builds
+# Modules log through get_logger(); records are handed to a background thread
+# through a queue and written to the log file of the build they belong to.
+# Nothing swaps sys.stdout, so several builds can log at the same time.
+# --------------------------------- #
+
+ROOT_LOGGER = "cloudui"
+FILE_FORMAT = "%(asctime)s %(levelname)-7s %(message)s"
+CONSOLE_FORMAT = "%(message)s"
+
+_build_id = contextvars.ContextVar("build_id", default=None)
+_build_counter = itertools.count(1)
+_lock = threading.Lock()
+_queue = queue.SimpleQueue()
+_listener = None
+_router = None
+
+# Get a logger for a module, e.g. get_logger("recolour")
+def get_logger(name):
+    _ensure_listener()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+# File handler that leaves flushing to the listener thread instead of flushing every line
+# Errors are still flushed straight away so a crash doesn't lose them
+class _BufferedFileHandler(logging.FileHandler):
+    def emit(self, record):
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(self.format(record) + self.terminator)
+            if record.levelno >= logging.ERROR:
+                self.stream.flush()
+        except Exception:
+            self.handleError(record)
+
+# Adds the current build id to each record so the router knows which file it belongs to
+class _BuildContextFilter(logging.Filter):
+    def filter(self, record):
+        record.build_id = _build_id.get()
+        return True
+
+# Runs on the listener thread - sends records to their build's file, or the console otherwise
+class _BuildRouter(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.builds = {}
+        self.listeners = {} # build id -> function called with each message of that build
+        # Frozen windowed builds have no stderr to write to
+        self.console = logging.StreamHandler(sys.stderr) if sys.stderr is not None else logging.NullHandler()
+        self.console.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+
+    def emit(self, record):
+        flush_event = getattr(record, "flush_event", None)
+        if flush_event is not None:
+            for handler in list(self.builds.values()):
+                handler.flush()
+            flush_event.set()
+            return
+        handler = self.builds.get(getattr(record, "build_id", None))
+        if handler is None:
+            handler = self.console
+        if record.levelno >= handler.level:
+            handler.handle(record)
+            listener = self.listeners.get(getattr(record, "build_id", None))
+            if listener is not None:
+                try:
+                    listener(record.levelname, record.getMessage())
+                except Exception:
+                    pass # a broken listener mustn't stop the log
+
+def _ensure_listener():
+    global _listener, _router
+    with _lock:
+        if _listener is not None:
+            return
+        _router = _BuildRouter()
+        queue_handler = logging.handlers.QueueHandler(_queue)
+        queue_handler.addFilter(_BuildContextFilter())
+        root = logging.getLogger(ROOT_LOGGER)
+        root.addHandler(queue_handler)
+        root.propagate = False
+        root.setLevel(logging.INFO)
+        _listener = logging.handlers.QueueListener(_queue, _router)
+        _listener.start()
+
+# The shared logger only lets DEBUG records through while a build asks for them,
+# so isEnabledFor(logging.DEBUG) checks in hot loops are cheap and false by default
+def _update_level():
+    levels = [h.level for h in _router.builds.values()]
+    logging.getLogger(ROOT_LOGGER).setLevel(min(levels + [logging.INFO]))
+
+class BuildLog:
+    def __init__(self, path, level=logging.INFO, on_message=None):
+        self.path = path
+        self.level = level
+        self.on_message = on_message
+        self.build_id = None
+        self._token = None
+
+    def __enter__(self):
+        _ensure_listener()
+        self.build_id = f"build-{next(_build_counter)}"
+        handler = _BufferedFileHandler(self.path, mode="w", encoding="utf-8")
+        handler.setLevel(self.level)
+        handler.setFormatter(logging.Formatter(FILE_FORMAT))
+        with _lock:
+            _router.builds[self.build_id] = handler
+            if self.on_message is not None:
+                _router.listeners[self.build_id] = self.on_message
+            _update_level()
+        self._token = _build_id.set(self.build_id)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            get_logger("build").error("Build failed", exc_info=(exc_type, exc, tb))
+        _build_id.reset(self._token)
+        flush()
+        with _lock:
+            handler = _router.builds.pop(self.build_id)
+            _router.listeners.pop(self.build_id, None)
+            _update_level()
+        handler.close()
+        return False
+
+# Log everything from this thread (and threads started with in_build_context) to path
+# on_message(level name, message) is also called for each line, on the log thread, e.g. to stream progress
+def start_build_log(path, level=logging.INFO, on_message=None):
+    return BuildLog(path, level, on_message)
+
+# Wrap a function so it logs to the calling thread's build when run on a worker thread
+def in_build_context(fn):
+    build_id = _build_id.get()
+    def run(*args, **kwargs):
+        token = _build_id.set(build_id)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _build_id.reset(token)
+    return run
+
+# Block until every record queued so far has been written
+def flush():
+    if _listener is None:
+        return
+    done = threading.Event()
+    record = logging.makeLogRecord({"msg": "", "levelno": logging.NOTSET})
+    record.flush_event = done
+    _queue.put(record)
+    done.wait()
@@ -0,0 +1,362 @@
+import argparse
+import hashlib
+import itertools
+import json
+import queue
+import shutil
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import unquote
+from build import BuildConfig, build_theme, format_elapsed
+from build_log import get_logger, start_build_log
+from colours import DEFAULT_COLOURS, PRESETS, is_hex_colour, theme_colours, validate_selection
+
+# --------------------------------- #
+# Local build service
+# A small HTTP server that runs builds for several people from one machine. Theme
+# configs are posted as jobs and run by a fixed number of worker threads. A config
+# that is identical to one already queued or running joins that job instead of
+# starting another build. Every job logs to its own file and its progress can be
+# followed as a stream of server-sent events. Jobs for the same UI name share its
+# Creations folder, so each job keeps its own copy of the packages it built and
+# downloads come from there, not from whatever the folder holds by then.
+#
+# Usage:
+#   python build_service.py --inkscape /usr/bin/inkscape --workers 2
+#
+#   POST /builds                         {"ui_name": "My UI", "preset": "Dark", "accent": "#7fb3ff"} -> {"job": "1", "coalesced": false}
+#   GET  /builds                         every job
+#   GET  /builds/<job>                   state, result or error
+#   GET  /builds/<job>/events            progress as server-sent events until the job finishes
+#   GET  /builds/<job>/packages/<path>   download a package the job built (path as listed in its result)
+# --------------------------------- #
+
+log = get_logger("build_service")
+
+DEFAULT_PORT = 8765
+MAX_FINISHED_JOBS = 100 # older finished jobs are forgotten
+KEEP_ALIVE_SECONDS = 15 # comment sent on quiet event streams so proxies don't close them
+
+# Settings a request may change, with their types
+JOB_SETTINGS = {
+    "run_logos": bool, "run_patches": bool, "keep_processing": bool, "optimise_png": bool, "minify_layout": bool, "normalise_svg": bool,
+    "renderer": str, "reproducible": bool, "compression": str,
+}
+
+# Turn a request body into a BuildConfig - raises ValueError with everything that's wrong
+# With render workers, jobs render on them unless they ask for another renderer
+def config_from_request(body, ui_path, inkscape_path, render_workers=()):
+    if not isinstance(body, dict):
+        raise ValueError("Expected a JSON object")
+    errors = []
+    ui_name = body.get("ui_name")
+    if not isinstance(ui_name, str) or not ui_name.strip():
+        errors.append("ui_name (required)")
+        ui_name = ""
+    preset = body.get("preset", "Light")
+    if preset not in PRESETS:
+        errors.append(f"preset (must be one of {', '.join(PRESETS)})")
+        preset = "Light"
+    accent = body.get("accent")
+    if accent is not None and not (isinstance(accent, str) and is_hex_colour(accent)):
+        errors.append("accent (invalid hex code)")
+        accent = None
+    colours = body.get("colours", {})
+    if not isinstance(colours, dict) or any(name not in DEFAULT_COLOURS or not isinstance(value, str) for name, value in colours.items()):
+        errors.append(f"colours (an object with string values for any of: {', '.join(DEFAULT_COLOURS)})")
+        colours = {}
+    settings = {}
+    for name, value in body.items():
+        if name in ("ui_name", "preset", "accent", "colours"):
+            continue
+        if name not in JOB_SETTINGS or not isinstance(value, JOB_SETTINGS[name]):
+            errors.append(f"{name} (unknown setting)" if name not in JOB_SETTINGS else f"{name} (must be {JOB_SETTINGS[name].__name__})")
+            continue
+        settings[name] = value
+    if errors:
+        raise ValueError("Invalid build settings:\n" + "\n".join(errors))
+
+    colour_values = theme_colours(preset, accent, colours)
+    invalid_fields = validate_selection(ui_name, colour_values)
+    if invalid_fields:
+        raise ValueError("Invalid build settings:\n" + "\n".join(invalid_fields))
+    if render_workers:
+        settings = {"renderer": "remote", **settings}
+    return BuildConfig(
+        ui_path=ui_path, ui_name=ui_name, colour_values=colour_values, inkscape_path=inkscape_path, preset=preset,
+        render_workers=tuple(render_workers), **settings
+    )
+
+# Jobs with the same key would build exactly the same thing
+def config_key(config):
+    settings = {name: (str(value) if isinstance(value, Path) else value) for name, value in config._asdict().items()}
+    return hashlib.sha1(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()
+
+def result_json(result):
+    return {
+        "ui_folder": str(result.ui_folder),
+        "packages": [package.relative_to(result.ui_folder).as_posix() for package in result.packages],
+        "missing_files": result.missing_files,
+        "reused_jobs": result.reused_jobs,
+        "seconds": round(result.seconds, 2),
+    }
+
+class Job:
+    def __init__(self, job_id, key, config):
+        self.id = job_id
+        self.key = key
+        self.config = config
+        self.state = "queued"
+        self.requests = 1 # submissions coalesced into this job
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+        self.package_folder = None # this job's copy of the packages it built
+        self.events = []
+        self._changed = threading.Condition()
+
+    def add_event(self, event):
+        with self._changed:
+            self.events.append(event)
+            self._changed.notify_all()
+
+    def set_state(self, state):
+        self.state = state
+        self.add_event({"type": "state", "state": state})
+
+    # Called on the log thread for every line the job's build logs
+    def on_log(self, level, message):
+        self.add_event({"type": "log", "level": level, "message": message})
+
+    # Events after the first start ones, waiting up to timeout seconds for one to arrive
+    # Returns the events and whether the job has finished
+    def events_since(self, start, timeout):
+        with self._changed:
+            self._changed.wait_for(lambda: len(self.events) > start or self.finished is not None, timeout)
+            return self.events[start:], self.finished is not None
+
+    def summary(self):
+        return {
+            "job": self.id,
+            "ui_name": self.config.ui_name,
+            "preset": self.config.preset,
+            "state": self.state,
+            "requests": self.requests,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+            "result": self.result,
+            "error": self.error,
+        }
+
+class BuildService:
+    def __init__(self, ui_path, inkscape_path=None, workers=1, render_workers=()):
+        self.ui_path = Path(ui_path)
+        self.inkscape_path = inkscape_path
+        self.render_workers = tuple(render_workers)
+        self.log_folder = self.ui_path / "Cache" / "Build Service"
+        self.package_folder = self.log_folder / "Packages"
+        shutil.rmtree(self.package_folder, ignore_errors=True) # left by jobs of an earlier run, whose ids are reused
+        self.jobs = {} # job id -> Job, in submission order
+        self.in_flight = {} # config key -> queued or running Job
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._ui_locks = {} # ui name -> Lock - builds of the same UI write the same folder, so they take turns
+        for n in range(max(1, workers)):
+            threading.Thread(target=self._worker, name=f"build-worker-{n + 1}", daemon=True).start()
+
+    # Queue a build, or join the identical one already queued or running
+    # Returns the job and whether it was coalesced into an existing one
+    def submit(self, config):
+        key = config_key(config)
+        with self._lock:
+            job = self.in_flight.get(key)
+            if job is not None:
+                job.requests += 1
+                return job, True
+            job = Job(str(next(self._ids)), key, config)
+            self.jobs[job.id] = job
+            self.in_flight[key] = job
+            self._forget_old_jobs()
+        job.add_event({"type": "state", "state": "queued"})
+        self._queue.put(job)
+        log.info(f"Job {job.id} queued: {config.ui_name} ({config.preset})")
+        return job, False
+
+    def _forget_old_jobs(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished is not None]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            job = self.jobs.pop(job_id)
+            if job.package_folder is not None:
+                shutil.rmtree(job.package_folder, ignore_errors=True)
+
+    # Copy the packages a job built, before the next build of the same UI can overwrite them
+    def _keep_packages(self, job, result):
+        folder = self.package_folder / job.id
+        shutil.rmtree(folder, ignore_errors=True)
+        for package in result.packages:
+            kept = folder / package.relative_to(result.ui_folder)
+            kept.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(package, kept)
+        job.package_folder = folder
+
+    def _ui_lock(self, ui_name):
+        with self._lock:
+            return self._ui_locks.setdefault(ui_name, threading.Lock())
+
+    def _worker(self):
+        while True:
+            self._run(self._queue.get())
+
+    def _run(self, job):
+        try:
+            with self._ui_lock(job.config.ui_name):
+                job.started = time.time()
+                try:
+                    job.set_state("running")
+                    self.log_folder.mkdir(parents=True, exist_ok=True)
+                    with start_build_log(self.log_folder / f"job-{job.id}.log", on_message=job.on_log):
+                        result = build_theme(job.config)
+                    self._keep_packages(job, result)
+                    job.result = result_json(result)
+                    state = "done"
+                except Exception as e:
+                    job.error = str(e)
+                    state = "failed"
+        finally:
+            # Later submissions of the same config start a new build from here on - even if this job never finishes
+            with self._lock:
+                self.in_flight.pop(job.key, None)
+        if job.result is not None:
+            job.add_event({"type": "result", **job.result})
+            log.info(f"Job {job.id} done in {format_elapsed(job.result['seconds'])}")
+        else:
+            job.add_event({"type": "error", "message": job.error})
+            log.error(f"Job {job.id} failed: {job.error}")
+        job.state = state
+        job.finished = time.time()
+        job.add_event({"type": "state", "state": state})
+
+class BuildServiceHandler(BaseHTTPRequestHandler):
+    server_version = "CloudUIBuildService/1.0"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        log.info(f"{self.address_string()} {format % args}")
+
+    def _send_json(self, status, data):
+        body = json.dumps(data, indent=2).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _job(self, job_id):
+        job = self.service.jobs.get(job_id)
+        if job is None:
+            self._send_json(404, {"error": f"No job {job_id}"})
+        return job
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/builds":
+            return self._send_json(404, {"error": "Not found"})
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"null")
+            config = config_from_request(body, self.service.ui_path, self.service.inkscape_path, self.service.render_workers)
+        except ValueError as e: # includes bad JSON
+            return self._send_json(400, {"error": str(e)})
+        job, coalesced = self.service.submit(config)
+        self._send_json(202, {"job": job.id, "coalesced": coalesced, "events": f"/builds/{job.id}/events"})
+
+    def do_GET(self):
+        parts = [unquote(part) for part in self.path.split("?")[0].strip("/").split("/")]
+        if parts[0] != "builds":
+            return self._send_json(404, {"error": "Not found"})
+        if len(parts) == 1:
+            return self._send_json(200, [job.summary() for job in list(self.service.jobs.values())])
+        job = self._job(parts[1])
+        if job is None:
+            return
+        if len(parts) == 2:
+            return self._send_json(200, job.summary())
+        if parts[2:] == ["events"]:
+            return self._stream_events(job)
+        if parts[2] == "packages" and len(parts) > 3:
+            return self._send_package(job, "/".join(parts[3:]))
+        self._send_json(404, {"error": "Not found"})
+
+    # Server-sent events: everything the job logged so far, then new events as they happen
+    def _stream_events(self, job):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        sent = 0
+        try:
+            while True:
+                events, finished = job.events_since(sent, KEEP_ALIVE_SECONDS)
+                if events:
+                    self.wfile.write(b"".join(f"data: {json.dumps(event)}\n\n".encode("utf-8") for event in events))
+                    sent += len(events)
+                elif finished:
+                    return
+                else:
+                    self.wfile.write(b": keep-alive\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass # the client stopped listening, the job carries on
+
+    # Only packages listed in the job's result can be downloaded, as the job built them
+    def _send_package(self, job, name):
+        if job.result is None or name not in job.result["packages"]:
+            return self._send_json(404, {"error": f"Job {job.id} has no package {name}"})
+        try:
+            data = (job.package_folder / name).read_bytes()
+        except OSError:
+            return self._send_json(410, {"error": f"{name} is no longer on disk"})
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Disposition", f'attachment; filename="{Path(name).name}"')
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+def serve(ui_path, inkscape_path=None, host="127.0.0.1", port=DEFAULT_PORT, workers=1, render_workers=()):
+    server = ThreadingHTTPServer((host, port), BuildServiceHandler)
+    server.daemon_threads = True
+    server.service = BuildService(ui_path, inkscape_path, workers, render_workers)
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Run Cloud UI builds for several people from one machine")
+    parser.add_argument("--ui-path", type=Path, default=Path(__file__).resolve().parent, help="folder containing Base UI")
+    parser.add_argument("--inkscape", help="path to inkscape")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (0.0.0.0 to let others on the network in)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=1, help="builds that run at the same time")
+    parser.add_argument("--render-worker", action="append", default=[], metavar="HOST:PORT",
+                        help="render worker (render_worker.py) to send svg exports to, can be repeated")
+    args = parser.parse_args()
+
+    server = serve(args.ui_path, args.inkscape, args.host, args.port, args.workers, args.render_worker)
+    print(f"Build service listening on http://{args.host}:{server.server_address[1]} with {args.workers} worker(s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
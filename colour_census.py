@@ -0,0 +1,191 @@
+import argparse
+import json
+import os
+import re
+import sys
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from colours import build_replacements, theme_colours
+from manifest import load_manifest
+from parallel_recolour import BATCHES_PER_WORKER, MIN_PARALLEL_BYTES, batch_by_size
+from utils import compile_replacements
+
+# --------------------------------- #
+# Colour census
+# Counts every colour token in the Base UI svgs and layouts - hex colours, rgb()
+# colours and opacity values in svgs, 0xAARRGGBB colour props in layouts - by file and section, and
+# checks each one against the replacement tables in colours.build_replacements.
+# A token counts as mapped when a build would change it, i.e. when one of the
+# replacement patterns for its file type matches it. Frequent tokens that aren't
+# mapped are the colours a theme leaves as they were in Base UI.
+# Embedded base64 images are skipped, they are most of the bytes and hold no colours.
+#
+# Usage:
+#   python colour_census.py
+#   python colour_census.py --min-count 5 --output census.json
+# --------------------------------- #
+
+RESOURCE_TYPES = ("svg", "layout")
+
+# svg tokens - each pattern starts with a literal, so re can skip straight to candidates
+SVG_HEX = re.compile(rb"#(?<![&\w]#)(?:[0-9a-fA-F]{6}|[0-9a-fA-F]{3})(?![0-9a-fA-F])") # #ffaacc, #fac (not &#123;)
+SVG_RGB = re.compile(rb"rgba?\([^()]*\)") # rgb(255,170,204)
+SVG_OPACITY = re.compile(rb'opacity(?::|=")\s*[0-9.]+') # opacity:0.8, opacity="1" - the property prefix is added below
+PROPERTY_CHARS = frozenset(b"abcdefghijklmnopqrstuvwxyz-")
+NAMEDVIEW = re.compile(rb"<sodipodi:namedview\b[^>]*?(?:/>|>.*?</sodipodi:namedview\s*>)", re.DOTALL) # Inkscape's page colours, not the drawing's
+
+# Layout colours are the uint32 values of props named ...Color or ...Colors, either inline or as <value> children
+# (every other 0xAARRGGBB in a layout is an id, a flag or a hash)
+LAYOUT_COLOUR_PROP = re.compile(rb'<prop name="\w*Colors?"[^>]*?(?:value="(0x[0-9a-fA-F]{8})"[^>]*/>|>(.*?)</prop>)', re.DOTALL)
+LAYOUT_VALUE = re.compile(rb"<value>(0x[0-9a-fA-F]{8})</value>")
+
+BASE64 = b"base64,"
+BASE64_END = re.compile(rb"[^A-Za-z0-9+/=\s]")
+WHITESPACE = re.compile(r"\s+")
+
+# Token as it is counted: lower case, without whitespace or quotes
+def _normalise_token(token):
+    return WHITESPACE.sub("", token.decode("ascii").lower()).replace('"', "")
+
+# The parts of data outside base64 payloads
+def _without_base64(data):
+    pos = 0
+    while True:
+        start = data.find(BASE64, pos)
+        if start < 0:
+            yield data[pos:]
+            return
+        yield data[pos:start]
+        end = BASE64_END.search(data, start + len(BASE64))
+        if end is None:
+            return
+        pos = end.start()
+
+def _svg_tokens(data):
+    for part in _without_base64(data):
+        part = NAMEDVIEW.sub(b"", part)
+        yield from SVG_HEX.findall(part)
+        yield from SVG_RGB.findall(part)
+        for match in SVG_OPACITY.finditer(part):
+            start = match.start()
+            while start and part[start - 1] in PROPERTY_CHARS: # fill-opacity, stop-opacity...
+                start -= 1
+            yield part[start:match.end()]
+
+def _layout_tokens(data):
+    for inline, children in LAYOUT_COLOUR_PROP.findall(data):
+        if inline:
+            yield inline
+        else:
+            yield from LAYOUT_VALUE.findall(children)
+
+TOKENS = {"svg": _svg_tokens, "layout": _layout_tokens}
+
+# Colour tokens in one file: {token: count}
+def count_tokens(path, resource_type):
+    return Counter(_normalise_token(token) for token in TOKENS[resource_type](Path(path).read_bytes()))
+
+def _count_batch(files):
+    return [count_tokens(path, resource_type) for path, resource_type in files]
+
+# Count the tokens of every (path, resource type), in a process pool when there's enough of them
+def count_files(files, sizes, workers=None):
+    workers = min(workers or os.cpu_count() or 1, len(files))
+    if workers <= 1 or sum(sizes) < MIN_PARALLEL_BYTES:
+        return _count_batch(files)
+    batches = batch_by_size(files, sizes, workers * BATCHES_PER_WORKER)
+    counts = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for batch, results in zip(batches, pool.map(_count_batch, batches)):
+            counts.update(zip(batch, results))
+    return [counts[file] for file in files]
+
+# Section a file is reported under - patches are grouped under their patch folder
+def section_name(entry):
+    return f"Patches/{entry.section}" if entry.kind in ("patch", "patch_readme") else entry.section or "(top level)"
+
+# Replacement patterns for each resource type (the keys don't depend on the colours chosen)
+def replacement_patterns():
+    replacements_svg, _, replacements_layout = build_replacements(theme_colours())
+    return {
+        "svg": compile_replacements(replacements_svg),
+        "layout": compile_replacements(replacements_layout),
+    }
+
+# Count the colour tokens in every svg and layout in Base UI
+# Returns a report dict: per resource type, each token's count, files, sections and whether it's mapped,
+# the replacement patterns that match nothing, and per-file counts
+def run_census(base_ui, workers=None):
+    manifest = load_manifest(base_ui)
+    entries = [e for e in manifest.entries if e.resource_type in RESOURCE_TYPES]
+    files = [(manifest.root / e.rel, e.resource_type) for e in entries]
+    counts = count_files(files, [e.size for e in entries], workers)
+    patterns = replacement_patterns()
+
+    tokens = {resource_type: defaultdict(lambda: {"count": 0, "files": 0, "sections": Counter()}) for resource_type in RESOURCE_TYPES}
+    per_file = {}
+    for entry, file_counts in zip(entries, counts):
+        if not file_counts:
+            continue
+        per_file[entry.rel.as_posix()] = dict(file_counts.most_common())
+        for token, count in file_counts.items():
+            record = tokens[entry.resource_type][token]
+            record["count"] += count
+            record["files"] += 1
+            record["sections"][section_name(entry)] += count
+
+    report = {"files_scanned": len(entries), "bytes_scanned": sum(e.size for e in entries), "tokens": {}, "unused_patterns": {}}
+    for resource_type in RESOURCE_TYPES:
+        found = tokens[resource_type]
+        matched_patterns = set()
+        for token, record in found.items():
+            matching = [pattern.pattern for pattern, _ in patterns[resource_type] if pattern.search(token)]
+            matched_patterns.update(matching)
+            record["mapped"] = bool(matching)
+            record["sections"] = dict(record["sections"].most_common())
+        report["tokens"][resource_type] = dict(sorted(found.items(), key=lambda item: -item[1]["count"]))
+        report["unused_patterns"][resource_type] = [pattern.pattern for pattern, _ in patterns[resource_type] if pattern.pattern not in matched_patterns]
+    report["files"] = per_file
+    return report
+
+# Tokens used at least min_count times that no replacement pattern changes, most frequent first
+def unmapped_tokens(report, min_count=1):
+    return [
+        (resource_type, token, record)
+        for resource_type, found in report["tokens"].items()
+        for token, record in found.items()
+        if not record["mapped"] and record["count"] >= min_count
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description="Count the colours used in Base UI and report the ones the replacement tables miss")
+    parser.add_argument("--base-ui", type=Path, default=Path(__file__).resolve().parent / "Base UI")
+    parser.add_argument("--min-count", type=int, default=20, help="only report unmapped tokens used at least this many times")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--output", type=Path, help="save the full census as JSON")
+    args = parser.parse_args()
+
+    report = run_census(args.base_ui, args.workers)
+    print(f"Scanned {report['files_scanned']} file(s), {report['bytes_scanned'] / 1e6:.0f} MB")
+    for resource_type, found in report["tokens"].items():
+        mapped = sum(record["count"] for record in found.values() if record["mapped"])
+        total = sum(record["count"] for record in found.values())
+        print(f"{resource_type}: {len(found)} distinct token(s), {mapped} of {total} uses mapped")
+
+    unmapped = unmapped_tokens(report, args.min_count)
+    print(f"\nUnmapped tokens used at least {args.min_count} times:")
+    for resource_type, token, record in unmapped:
+        sections = ", ".join(f"{name} ({count})" for name, count in list(record["sections"].items())[:3])
+        print(f"  {resource_type:<7}{token:<28}{record['count']:>7} in {record['files']:>4} file(s)  {sections}")
+    for resource_type, unused in report["unused_patterns"].items():
+        if unused:
+            print(f"\n{resource_type} replacement patterns that match nothing in Base UI: {', '.join(unused)}")
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"\nCensus saved to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,331 @@
+import colorsys
+import re
+
+# --------------------------------- #
+# Colours
+# Presets, the shades worked out from the main accent, and the replacement tables
+# that turn a set of colour choices into regex replacements for svg and layout files.
+# Nothing here needs Tk, so builds can run without a window.
+# --------------------------------- #
+
+PRESETS = ("Light", "Colourful", "Dark")
+
+# Default colour presets
+DEFAULT_COLOURS = {
+    "Main Font": {
+        "Light": "#545354",
+        "Colourful": "#545354",
+        "Dark": "#ebebeb"
+    },
+    "Darkest Accent": {
+        "Light": "#b179ff",
+        "Colourful": "#b179ff",
+        "Dark": "#b179ff"
+    },
+    "Dark Accent": {
+        "Light": "#c398ff",
+        "Colourful": "#c398ff",
+        "Dark": "#c398ff"
+    },
+    "Main Accent": {
+        "Light": "#dbb6ff",
+        "Colourful": "#d4b6ff",
+        "Dark": "#d4b6ff"
+    },
+    "Light Accent": {
+        "Light": "#e7d6ff",
+        "Colourful": "#e7d6ff",
+        "Dark": "#e7d6ff"
+    },
+    "Background Light": {
+        "Light": "#e7d6ff",
+        "Colourful": "#e7d6ff",
+        "Dark": "#333333"
+    },
+    "Background Dark": {
+        "Light": "#d4b6ff",
+        "Colourful": "#d4b6ff",
+        "Dark": "#333333"
+    },
+    "HUD Background 1": {
+        "Light": "#f2f2f2",
+        "Colourful": "#c398ff",
+        "Dark": "#1a1a1a"
+    },
+    "HUD Background 2": {
+        "Light": "#f9f9f9",
+        "Colourful": "#e7d6ff",
+        "Dark": "#1a1a1a"
+    },
+    "HUD Accent Light": {
+        "Light": "#ffffff",
+        "Colourful": "#f7f0ff",
+        "Dark": "#333333"
+    },
+    "HUD Accent Dark": {
+        "Light": "#b3b3b3",
+        "Colourful": "#c398ff",
+        "Dark": "#000000"
+    },
+    "MISC": {
+        "Light": "#cccccc",
+        "Colourful": "#c398ff",
+        "Dark": "#000000"
+    },
+    "Opacity": {
+        "Light": "0.75",
+        "Colourful": "0.80",
+        "Dark": "0.85"
+    }
+}
+
+COLOUR_NAMES = [name for name in DEFAULT_COLOURS if name != "Opacity"]
+
+# --------------------------------- #
+# Colour functions
+# --------------------------------- #
+
+# Convert HEX code to RGB
+def hex_to_rgb_string(hex_color):
+    hex_color = hex_color.lstrip("#")
+    r, g, b = int(hex_color[0:2], 16), int(hex_color[2:4], 16), int(hex_color[4:6], 16)
+    return f"rgb({r},{g},{b})"
+
+# For the chosen main accent colour, generate 1 lighter shade and two darker shades
+def generate_shades(input_hex):
+    # convert input HEX to RGB then HLS
+    hex_color = input_hex.lstrip("#")
+    r, g, b = int(hex_color[0:2], 16)/255.0, int(hex_color[2:4], 16)/255.0, int(hex_color[4:6], 16)/255.0
+    h, l_orig, s = colorsys.rgb_to_hls(r, g, b)
+
+    l_light = min(l_orig + 0.1, 1)
+    l_dark = max(0, l_orig - 0.1)
+    l_darkest = max(0, l_orig - 0.2)
+
+    # convert back to RGB and then HEX
+    r_light, g_light, b_light = colorsys.hls_to_rgb(h, l_light, s)
+    r_dark, g_dark, b_dark = colorsys.hls_to_rgb(h, l_dark, s)
+    r_darkest, g_darkest, b_darkest = colorsys.hls_to_rgb(h, l_darkest, s)
+
+    r_light = int(r_light * 255)
+    g_light = int(g_light * 255)
+    b_light = int(b_light * 255)
+
+    r_dark = int(r_dark * 255)
+    g_dark = int(g_dark * 255)
+    b_dark = int(b_dark * 255)
+
+    r_darkest = int(r_darkest * 255)
+    g_darkest = int(g_darkest * 255)
+    b_darkest = int(b_darkest * 255)
+
+    hex_light = f"#{r_light:02x}{g_light:02x}{b_light:02x}"
+    hex_dark = f"#{r_dark:02x}{g_dark:02x}{b_dark:02x}"
+    hex_darker = f"#{r_darkest:02x}{g_darkest:02x}{b_darkest:02x}"
+
+    shades = [hex_light, input_hex, hex_dark, hex_darker]
+    return shades
+
+# Lighten a hex colour by 50% - used for HUD Accent Light
+def lighten_hex_50(hex_code):
+    # Convert hex to RGB
+    hex_code = hex_code.lstrip('#')
+
+    r = int(hex_code[0:2], 16) / 255.0
+    g = int(hex_code[2:4], 16) / 255.0
+    b = int(hex_code[4:6], 16) / 255.0
+
+    # Convert RGB to HLS
+    h, l, s = colorsys.rgb_to_hls(r, g, b)
+
+    # Lighten by 50%
+    l = l + (1.0 - l) * 0.5
+    l = min(l, 1.0)
+
+    # Convert back to RGB
+    r, g, b = colorsys.hls_to_rgb(h, l, s)
+
+    # Convert to hex
+    return '#{:02X}{:02X}{:02X}'.format(int(r * 255), int(g * 255), int(b * 255)).lower()
+
+# Invert colour - used for fonts
+def invert_hex(hex_color):
+    hex_color = hex_color.lstrip('#')
+
+    # Convert to RGB
+    r = int(hex_color[0:2], 16)
+    g = int(hex_color[2:4], 16)
+    b = int(hex_color[4:6], 16)
+
+    # Invert each channel
+    inverted_r = 255 - r
+    inverted_g = 255 - g
+    inverted_b = 255 - b
+
+    # Convert back to hex
+    return '#{:02x}{:02x}{:02x}'.format(inverted_r, inverted_g, inverted_b)
+
+def is_hex_colour(value):
+    return bool(re.fullmatch(r"#([0-9a-fA-F]{6})", value))
+
+# --------------------------------- #
+# Colour selections
+# A selection is a dict with every name in DEFAULT_COLOURS, e.g. {"Main Font": "#545354", ..., "Opacity": "0.75"}
+# --------------------------------- #
+
+# The default selection for a preset
+def preset_colours(preset):
+    return {name: values[preset] for name, values in DEFAULT_COLOURS.items()}
+
+# Colours that follow the main accent: the four accent shades, the backgrounds (except in Dark)
+# and the HUD colours (Colourful only) - returns {name: hex} for the ones the preset changes
+def accent_colours(accent, preset):
+    shades = generate_shades(accent)
+    colours = dict(zip(["Light Accent", "Main Accent", "Dark Accent", "Darkest Accent"], shades))
+
+    # Update backgrounds
+    if preset != "Dark":
+        colours["Background Dark"] = shades[1]
+        colours["Background Light"] = shades[0]
+
+    if preset == "Colourful":
+        colours["HUD Background 1"] = shades[0] # light accent
+        colours["HUD Background 2"] = shades[0] # light accent
+        colours["HUD Accent Light"] = lighten_hex_50(shades[0]) # halfway between white and light accent
+        colours["HUD Accent Dark"] = shades[2] # dark accent
+        colours["MISC"] = shades[0]
+    return colours
+
+# A full selection: the preset's defaults, then the shades of accent if given, then any overrides
+def theme_colours(preset="Light", accent=None, overrides=None):
+    colours = preset_colours(preset)
+    if accent is not None:
+        colours.update(accent_colours(accent, preset))
+    colours.update(overrides or {})
+    return colours
+
+# Themes for a gallery: the main accent swept round the colour wheel in hue_steps even steps,
+# at lightness_steps lightnesses spread evenly over accent's lightness +/- lightness_spread
+# (HLS lightness, kept between 0.1 and 0.95 so no row is all black or all white)
+# Each theme is worked out like picking that accent in the window: the preset's defaults plus accent_colours
+# Returns rows (one per lightness, darkest first) of (accent, full selection)
+def sweep_themes(preset, accent, hue_steps=8, lightness_steps=3, lightness_spread=0.15):
+    hex_color = accent.lstrip("#")
+    r, g, b = int(hex_color[0:2], 16)/255.0, int(hex_color[2:4], 16)/255.0, int(hex_color[4:6], 16)/255.0
+    h, l, s = colorsys.rgb_to_hls(r, g, b)
+
+    lowest, highest = max(0.1, l - lightness_spread), min(0.95, l + lightness_spread)
+    rows = []
+    for step in range(lightness_steps):
+        lightness = l if lightness_steps == 1 else lowest + (highest - lowest) * step / (lightness_steps - 1)
+        row = []
+        for hue_step in range(hue_steps):
+            r, g, b = colorsys.hls_to_rgb((h + hue_step / hue_steps) % 1.0, lightness, s)
+            swept = f"#{round(r * 255):02x}{round(g * 255):02x}{round(b * 255):02x}"
+            row.append((swept, theme_colours(preset, swept)))
+        rows.append(row)
+    return rows
+
+# What's wrong with a UI name and selection, as a list of messages (empty if everything is valid)
+def validate_selection(ui_name, colour_values):
+    invalid_fields = []
+
+    # Validate hex fields (except Opacity)
+    for label in DEFAULT_COLOURS:
+        val = str(colour_values.get(label, "")).strip()
+        if label == "Opacity":
+            try:
+                valid = 0.0 <= float(val) <= 1.0
+            except ValueError:
+                valid = False
+            if not valid:
+                invalid_fields.append(f"{label} (must be a number between 0 and 1)")
+        else:
+            if val == "":
+                invalid_fields.append(f"{label} (cannot be blank)")
+            elif not is_hex_colour(val):
+                invalid_fields.append(f"{label} (invalid hex code)")
+
+    # Validate UI Name - it's the name of a folder in Creations, so it can't point anywhere else
+    invalid_chars = r'<>:"/\\|?*'
+    if ui_name.strip() in ("", ".", ".."):
+        invalid_fields.append("UI Name (cannot be blank, . or ..)")
+    elif any(char in ui_name.strip() for char in invalid_chars):
+        invalid_fields.append(f'UI Name (contains invalid characters: {invalid_chars})')
+    return invalid_fields
+
+# --------------------------------- #
+# Replacement tables
+# --------------------------------- #
+
+# Extract colour values to replace
+# Returns the svg replacements, the svg replacements for the preview (which also recolours the font) and the layout replacements
+def build_replacements(colour_values, preset="Light"):
+    font_main = colour_values["Main Font"]
+    accent_darker = colour_values["Darkest Accent"]
+    accent_dark = colour_values["Dark Accent"]
+    accent_main = colour_values["Main Accent"]
+    accent_light = colour_values["Light Accent"]
+    background_light = colour_values["Background Light"]
+    background_dark = colour_values["Background Dark"]
+    hud_background1 = colour_values["HUD Background 1"]
+    hud_background2 = colour_values["HUD Background 2"]
+    hud_accent_light = colour_values["HUD Accent Light"]
+    hud_accent_dark = colour_values["HUD Accent Dark"]
+    misc = colour_values["MISC"]
+    opacity = colour_values["Opacity"]
+
+    # Colour replacements for SVG files
+    replacements_svg = {
+        "#ff5599": accent_darker,
+        "#ff80b2": accent_dark,
+        "#ffaacc": accent_main,
+        "#ffd5e5": accent_light,
+        "rgb\\(255,170,204\\)": hex_to_rgb_string(accent_main), # main accent ffaacc
+        "rgb\\(255,221,234\\)": hex_to_rgb_string(accent_light),
+        "rgb\\(191,191,191\\)": hex_to_rgb_string(hud_accent_dark), # drop shadow in white boxes
+        "rgb\\(192,191,192\\)": hex_to_rgb_string(hud_accent_dark), # relationship panel/opportunities tabs
+        "rgb\\(255,163,200\\)": hex_to_rgb_string(background_dark), # CAS background dark
+        "rgb\\(250,250,250\\)": hex_to_rgb_string(background_light), # CAS background light
+        "#fafafa": background_light,
+        "#fde7f0": background_light, # background gradient light, light mode default: accent_light
+        "#ebc7d0": background_dark, # background gradient dark: light mode default: accent_main
+        "#ffdbe9": background_dark, # startup loading screen
+        "#f2f2f2": hud_background1, # DARK MODE HUD - main background
+        "#f9f9f9": hud_background2,
+        "#ffffff": hud_accent_light,
+        "#b3b3b3": hud_accent_dark,
+        "rgb\\(145,145,145\\)": hex_to_rgb_string(hud_accent_dark), #  build/buy category images
+        "#999999": hud_accent_dark, # build/buy darker controls
+        "#e6e6e6": misc, # WHAT IS THIS?
+        "#cccccc": misc, # deselected tab, other misc stuff
+        "#808080": hud_accent_dark, # DARK MODE - unavailable tab
+        "opacity:0.75": "opacity:" + opacity,
+        "opacity:0.80": "opacity:" + opacity,
+        "opacity:0.8": "opacity:" + opacity,
+        "opacity:0.801": "opacity:" + opacity
+    }
+
+    # Colour replacements for LAYOUT files
+    replacements_layout = {
+        "0xffff5599": accent_darker.replace("#", "0xff"),
+        "0xffff80b2": accent_dark.replace("#", "0xff"),
+        "0xffffaacc": accent_main.replace("#", "0xff"),
+        "0xffffd5e5": accent_light.replace("#", "0xff"),
+        "0xff545354": font_main.replace("#", "0xff"), # TEXT COLOUR
+        "0xfffaf7f9": hud_background1.replace("#", "0xff"), # divider colours
+        "0xffcccccc": misc.replace("#", "0xff") # table alternate row colour
+    }
+
+    # Replace pie menu highlighted text
+    # Use font_main for light and colourful modes and the inverse of font_main for dark mode
+    if preset == "Dark":
+        replacements_layout["0xff545355"] = invert_hex(font_main).replace("#", "0xff")
+    else:
+        replacements_layout["0xff545355"] = font_main.replace("#", "0xff")
+
+    # Keep font SVG only for preview - it might break the other SVGs
+    replacements_svg_preview = replacements_svg.copy()
+    replacements_svg_preview["#545354"] = font_main
+
+    return replacements_svg, replacements_svg_preview, replacements_layout
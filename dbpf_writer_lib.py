@@ -1,13 +1,26 @@
 # The majority of this code was written by p182 (https://github.com/p182) for use in this project
 # Thank you so much p182 - I could not have done this without you!!
 
+import hashlib # content hashes for the compression cache
+import json # compression cache index
 import re
 import struct # for structured writing
+from array import array # compact columns for the package index, hash chains for in-process Refpack
+from collections import namedtuple # in-process Refpack levels
+from concurrent.futures import ProcessPoolExecutor # in-process Refpack on every core
 import io # to create BytesIO stream
 import time # Unix timestamp for DBPF creation and modification date
 import os # for os.path.getsize in debug output
-import subprocess # for calling the external Refpack compressor
+import subprocess # TimeoutExpired from the external Refpack compressor
+import asyncio # compressing resources concurrently
+import tool_runner # runs the external Refpack compressor
 import sys # for platform (OS) check, etc.
+import tracing # build instrumentation spans
+import logging # for level checks before per-resource debug output
+import threading # compression cache lock
+from build_log import get_logger
+
+log = get_logger("dbpf_writer_lib")
 
 # --- DBPF Constants ---
 DBPF_SIGNATURE = b'DBPF'
@@ -20,14 +33,103 @@ DBPF_UNKNOWN_0x14_FIELD = 0x00000000
 DBPF_INDEX_MAJOR_VERSION = 0x00000001
 DBPF_INDEX_MINOR_VERSION = 0x00000003 # Typically 3 for DBPF 2.0
 
+_UINT32 = 'I' if array('I').itemsize == 4 else 'L' # array typecode for uint32 columns
+
 RESOURCE_ALIGNMENT = 16 # 16 byte alignment for reading access (filesystem, computing) optimization, not neccesarry, can be disabled for slightly smalller filesize
+COPY_BLOCK_SIZE = 1024 * 1024 # Block size when streaming pass-through resources from their source file
+RESOURCE_NAME_PATTERN = re.compile(r"S3_([0-9A-Fa-f]{8})_([0-9A-Fa-f]{8})_([0-9A-Fa-f]{16})") # Type, group and instance in a file name
 
 # --- Helper Functions ---
 
-def _pad_data(data: bytes, alignment: int) -> bytes:
-    """Pads data with null bytes to meet specified alignment."""
-    padding_needed = (alignment - (len(data) % alignment)) % alignment
-    return data + b'\x00' * padding_needed
+def _padding(length: int, alignment: int) -> bytes:
+    """Null bytes needed after data of the given length to meet specified alignment."""
+    padding_needed = (alignment - (length % alignment)) % alignment
+    return b'\x00' * padding_needed
+
+def _copy_file_into(source_path: str, f, sha1=None) -> int:
+    """Streams a file into an open output file and returns the number of bytes copied, adding them to sha1 if given."""
+    copied = 0
+    with open(source_path, 'rb') as src:
+        while True:
+            block = src.read(COPY_BLOCK_SIZE)
+            if not block:
+                return copied
+            f.write(block)
+            if sha1 is not None:
+                sha1.update(block)
+            copied += len(block)
+
+def _file_matches(source_path: str, f, sha1=None) -> bool:
+    """Compares a file with the next bytes of an open file, block by block, adding them to sha1 if given."""
+    with open(source_path, 'rb') as src:
+        while True:
+            block = src.read(COPY_BLOCK_SIZE)
+            if not block:
+                return True
+            if f.read(len(block)) != block:
+                return False
+            if sha1 is not None:
+                sha1.update(block)
+
+def _without_timestamps(header: bytes) -> bytes:
+    """The DBPF header with the Date Created/Modified fields (bytes 24-31) left out."""
+    return header[:24] + header[32:]
+
+def _package_unchanged(output_path: str, header: bytes, data_chunks: list, index_data: bytes, sha1=None) -> bool:
+    """
+    Whether the package already at output_path has exactly the content that would be written,
+    apart from its timestamps. The size and index are checked first, so a changed package is
+    usually spotted without reading its resource data. If it is unchanged, sha1 (if given)
+    has been fed the whole existing file.
+    """
+    try:
+        existing_size = os.path.getsize(output_path)
+    except OSError:
+        return False
+    new_size = len(header) + sum(disk_size + len(_padding(disk_size, RESOURCE_ALIGNMENT)) for _, disk_size in data_chunks) + len(index_data)
+    if existing_size != new_size:
+        return False
+    with open(output_path, 'rb') as f:
+        existing_header = f.read(len(header))
+        if _without_timestamps(existing_header) != _without_timestamps(header):
+            return False
+        f.seek(new_size - len(index_data))
+        if f.read() != index_data:
+            return False
+        f.seek(len(header))
+        if sha1 is not None:
+            sha1.update(existing_header)
+        for chunk, disk_size in data_chunks:
+            padding = _padding(disk_size, RESOURCE_ALIGNMENT)
+            if isinstance(chunk, bytes):
+                if f.read(len(chunk)) != chunk:
+                    return False
+                if sha1 is not None:
+                    sha1.update(chunk)
+            elif not _file_matches(chunk, f, sha1):
+                return False
+            if f.read(len(padding)) != padding:
+                return False
+            if sha1 is not None:
+                sha1.update(padding)
+    if sha1 is not None:
+        sha1.update(index_data)
+    return True
+
+def reproducible_timestamp(source_paths=()) -> int:
+    """
+    A package timestamp that only depends on the sources: SOURCE_DATE_EPOCH when it is set
+    (the usual convention for reproducible builds), otherwise the newest modified time of source_paths.
+    """
+    if os.environ.get("SOURCE_DATE_EPOCH", "").isdigit():
+        return int(os.environ["SOURCE_DATE_EPOCH"])
+    newest = 0
+    for path in source_paths:
+        try:
+            newest = max(newest, int(os.stat(path).st_mtime))
+        except OSError:
+            pass
+    return newest
 
 def _bytes_to_human_readable(num_bytes: int) -> str:
     """Converts a byte count to a human-readable format (KB, MB, GB)."""
@@ -40,10 +142,13 @@ def _bytes_to_human_readable(num_bytes: int) -> str:
     else:
         return f"{num_bytes / (1024.0 * 1024.0 * 1024.0):.2f} GB"
 
+def _resource_name(index: int, res: dict) -> str:
+    """Name of a resource for log messages, only built when a message is actually logged."""
+    return res.get('name', f'Resource {index+1} (Type:0x{res["type_id"]:X}, Group:0x{res["group_id"]:X}, Instance:0x{res["instance_id"]:X})')
+
 # --- Refpack Compression Function ---
-def compress_refpack(data: bytes) -> bytes:
+def _find_compressor() -> str:
     """
-    Compresses data using an external Rust-based Refpack utility via stdin/stdout.
     Dynamically determines the compressor's executable name based on OS and searches for it.
     """
     compressor_name = "refpack_pipe"
@@ -53,8 +158,9 @@ def compress_refpack(data: bytes) -> bytes:
     # Possible paths to check for the compressor
     script_dir = os.path.dirname(os.path.abspath(__file__)) # Directory of the current Python script
     
+    # Priority 0: An explicit path in the REFPACK_PIPE environment variable (used by the benchmarks)
     # Priority 1: In the same directory as the script
-    compressor_path = os.path.join(script_dir, compressor_name)
+    compressor_path = os.environ.get("REFPACK_PIPE") or os.path.join(script_dir, compressor_name)
     
     if not os.path.exists(compressor_path):
         # Priority 2: In a 'bin' subfolder relative to the script
@@ -72,29 +178,594 @@ def compress_refpack(data: bytes) -> bytes:
                     f"or the current working directory '{os.getcwd()}'."
                 )
 
-    startupinfo = None
-    creationflags = 0
-    if sys.platform == "win32":
-        startupinfo = subprocess.STARTUPINFO()
-        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-        creationflags = subprocess.CREATE_NO_WINDOW
-
-    proc = subprocess.Popen(
-        [compressor_path], # Use the dynamically found path
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        startupinfo=startupinfo,
-        creationflags=creationflags
-    )
-    out, err = proc.communicate(input=data)
-    if proc.returncode != 0:
-        raise RuntimeError(f"Refpack compression failed (exit code {proc.returncode}):\n{err.decode()}")
-    return out
+    return compressor_path
+
+async def compress_refpack_async(data: bytes) -> bytes:
+    """
+    Compresses data using an external Rust-based Refpack utility via stdin/stdout.
+    The process is run by tool_runner, which limits how many compressors run at once.
+    """
+    result = await tool_runner.run_tool("refpack", [_find_compressor()], input=data, name="refpack")
+    if result.returncode != 0:
+        raise RuntimeError(f"Refpack compression failed (exit code {result.returncode}):\n{result.stderr.decode()}")
+    return result.stdout
+
+def compress_refpack(data: bytes) -> bytes:
+    """Blocking version of compress_refpack_async."""
+    return tool_runner.run_sync(compress_refpack_async(data))
+
+# --- In-process Refpack ---
+# A Refpack stream is a 5 byte header (flags, 0xFB, big-endian uncompressed size - 4 bytes with flag 0x80)
+# followed by opcodes. Each opcode copies 0-3 literal bytes and then a back-reference of 3-1028 bytes,
+# or copies a run of 4-112 literals; 0xFC-0xFF end the stream with 0-3 last literals.
+#   2 bytes: 0DDLLLPP DDDDDDDD                   length 3-10,   distance up to 1024
+#   3 bytes: 10LLLLLL PPDDDDDD DDDDDDDD          length 4-67,   distance up to 16384
+#   4 bytes: 110DLLPP DDDDDDDD DDDDDDDD LLLLLLLL length 5-1028, distance up to 131072
+
+REFPACK_WINDOW = 131072     # Furthest back a back-reference can reach
+REFPACK_MAX_MATCH = 1028    # Longest back-reference
+
+# How hard the match finder looks:
+# chain_depth - earlier positions with the same 3 bytes tried for each match
+# good_length - a match at least this long is taken without looking further
+# lazy - check whether starting one byte later gives a longer match (and index every position inside matches)
+# skip_shift - after 2**skip_shift positions in a row without a match, start skipping ahead (incompressible data)
+RefpackLevel = namedtuple("RefpackLevel", ["chain_depth", "good_length", "lazy", "skip_shift"])
+REFPACK_LEVELS = {
+    "fast": RefpackLevel(chain_depth=8, good_length=32, lazy=False, skip_shift=5),   # Preview and dev builds
+    "max": RefpackLevel(chain_depth=256, good_length=258, lazy=True, skip_shift=8),  # Releases
+}
+
+# Compression settings accepted by create_dbpf_package:
+# "auto" uses refpack_pipe if it can be found and compresses in-process at the fast level otherwise,
+# "external" always uses refpack_pipe, "fast" and "max" compress in-process at that level
+COMPRESSION_MODES = ("auto", "external") + tuple(REFPACK_LEVELS)
+
+def _common_length(data: bytes, a: int, b: int, known: int, limit: int) -> int:
+    """
+    How many bytes data[a:] and data[b:] have in common (at least known, at most limit).
+    Blocks of growing size are compared first, then a binary search finds the first difference,
+    so long matches only take a handful of slice comparisons.
+    """
+    length, step = known, 16
+    while length + step <= limit and data[a + length:a + length + step] == data[b + length:b + length + step]:
+        length += step
+        step *= 2
+    high = min(length + step, limit)
+    while length < high:
+        middle = (length + high + 1) // 2
+        if data[a + length:a + middle] == data[b + length:b + middle]:
+            length = middle
+        else:
+            high = middle - 1
+    return length
+
+def _emit_literal_runs(out: bytearray, data: bytes, start: int, end: int) -> int:
+    """Writes data[start:end] as runs of 4-112 literals and returns where the 0-3 leftover bytes start."""
+    while end - start >= 4:
+        run = min((end - start) & ~3, 112)
+        out.append(0xE0 | ((run >> 2) - 1))
+        out += data[start:start + run]
+        start += run
+    return start
+
+def refpack_compress(data: bytes, level: str = "max") -> bytes:
+    """
+    Compresses data to a Refpack stream in this process, at one of the REFPACK_LEVELS.
+    Matches are found with hash chains: every indexed position is linked to the previous one
+    that starts with the same 3 bytes, within the last REFPACK_WINDOW bytes.
+    """
+    chain_depth, good_length, lazy, skip_shift = REFPACK_LEVELS[level]
+    size = len(data)
+    if size > 0xFFFFFF:
+        out = bytearray(b'\x90\xfb') + size.to_bytes(4, 'big')
+    else:
+        out = bytearray(b'\x10\xfb') + size.to_bytes(3, 'big')
+
+    head = {}                                     # 3 bytes -> last position they were seen at
+    head_get = head.get
+    chain_size = min(REFPACK_WINDOW, 1 << max(size - 1, 1).bit_length()) # Small inputs never wrap around a smaller ring
+    mask = chain_size - 1
+    chain = array('i', [-1]) * chain_size         # position -> previous position with the same 3 bytes (ring buffer)
+
+    def match_at(pos):
+        """Indexes pos and returns the best (length, distance) starting there, or (0, 0)."""
+        key = data[pos:pos + 3]
+        candidate = head_get(key, -1)
+        head[key] = pos
+        chain[pos & mask] = candidate
+        oldest = pos - REFPACK_WINDOW
+        if candidate < 0 or candidate <= oldest:
+            return 0, 0
+        if oldest < -1:
+            oldest = -1
+        limit = min(REFPACK_MAX_MATCH, size - pos)
+        best_length = best_distance = 0
+        depth = chain_depth
+        while candidate > oldest and depth:
+            depth -= 1
+            # Only a candidate that also matches the byte after the best match so far can beat it
+            if data[candidate + best_length] == data[pos + best_length]:
+                length = _common_length(data, candidate, pos, 3, limit)
+                distance = pos - candidate
+                if length > best_length and length >= (3 if distance <= 1024 else 4 if distance <= 16384 else 5):
+                    best_length, best_distance = length, distance
+                    if length >= good_length or length == limit:
+                        break
+            candidate = chain[candidate & mask]
+        return best_length, best_distance
+
+    end = size - 2 # Last position with 3 bytes left to match
+    pos = literal_start = misses = 0
+    next_prune = REFPACK_WINDOW
+    while pos < end:
+        if pos >= next_prune:
+            # Forget 3 byte sequences that are out of reach, so head stays small on incompressible data
+            oldest = pos - REFPACK_WINDOW
+            kept = {key: p for key, p in head.items() if p > oldest}
+            head.clear()
+            head.update(kept)
+            next_prune = pos + REFPACK_WINDOW
+        length, distance = match_at(pos)
+        next_index = pos + 1
+        if not length:
+            misses += 1
+            pos += 1 + (misses >> skip_shift)
+            continue
+        while lazy and length < good_length and pos + 1 < end:
+            next_length, next_distance = match_at(pos + 1)
+            next_index = pos + 2
+            if next_length <= length:
+                break
+            pos += 1
+            length, distance = next_length, next_distance
+
+        literal_start = _emit_literal_runs(out, data, literal_start, pos)
+        plain = pos - literal_start
+        d = distance - 1
+        if length <= 10 and distance <= 1024:
+            out += bytes((((d >> 3) & 0x60) | ((length - 3) << 2) | plain, d & 0xFF))
+        elif length <= 67 and distance <= 16384:
+            out += bytes((0x80 | (length - 4), (plain << 6) | (d >> 8), d & 0xFF))
+        else:
+            out += bytes((0xC0 | ((d >> 12) & 0x10) | (((length - 5) >> 6) & 0x0C) | plain, (d >> 8) & 0xFF, d & 0xFF, (length - 5) & 0xFF))
+        out += data[literal_start:pos]
+        pos += length
+        literal_start = pos
+        misses = 0
+        if lazy:
+            for p in range(next_index, min(pos, end)):
+                key = data[p:p + 3]
+                chain[p & mask] = head_get(key, -1)
+                head[key] = p
+
+    literal_start = _emit_literal_runs(out, data, literal_start, size)
+    out.append(0xFC | (size - literal_start))
+    out += data[literal_start:size]
+    return bytes(out)
+
+def refpack_decompress(data: bytes) -> bytes:
+    """Decompresses a Refpack stream (from refpack_compress, refpack_pipe or the game). Raises ValueError if it is damaged."""
+    if len(data) < 5 or data[1] != 0xFB:
+        raise ValueError("Not a Refpack stream")
+    flags = data[0]
+    size_bytes = 4 if flags & 0x80 else 3
+    pos = 2 + (size_bytes if flags & 0x01 else 0) # Flag 0x01: the compressed size comes first
+    size = int.from_bytes(data[pos:pos + size_bytes], 'big')
+    pos += size_bytes
+    out = bytearray()
+    end = len(data)
+    try:
+        while pos < end:
+            b0 = data[pos]
+            if b0 < 0x80:
+                b1 = data[pos + 1]
+                pos += 2
+                plain = b0 & 0x03
+                length = ((b0 & 0x1C) >> 2) + 3
+                distance = ((b0 & 0x60) << 3) + b1 + 1
+            elif b0 < 0xC0:
+                b1, b2 = data[pos + 1], data[pos + 2]
+                pos += 3
+                plain = b1 >> 6
+                length = (b0 & 0x3F) + 4
+                distance = ((b1 & 0x3F) << 8) + b2 + 1
+            elif b0 < 0xE0:
+                b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+                pos += 4
+                plain = b0 & 0x03
+                length = ((b0 & 0x0C) << 6) + b3 + 5
+                distance = ((b0 & 0x10) << 12) + (b1 << 8) + b2 + 1
+            elif b0 < 0xFC:
+                run = ((b0 & 0x1F) << 2) + 4
+                out += data[pos + 1:pos + 1 + run]
+                pos += 1 + run
+                continue
+            else:
+                plain = b0 & 0x03
+                out += data[pos + 1:pos + 1 + plain]
+                break
+            out += data[pos:pos + plain]
+            pos += plain
+            start = len(out) - distance
+            if start < 0:
+                raise ValueError("Refpack back-reference before the start of the data")
+            if distance >= length:
+                out += out[start:start + length]
+            else:
+                # Overlapping copy: the last distance bytes repeat
+                out += (out[start:] * (length // distance + 1))[:length]
+    except IndexError:
+        raise ValueError("Refpack stream ends in the middle of an opcode") from None
+    if len(out) != size:
+        raise ValueError(f"Refpack stream decoded to {len(out)} bytes, expected {size}")
+    return bytes(out)
+
+_codec_pool = None
+_codec_pool_users = 0
+_codec_pool_lock = threading.Lock()
+
+def _get_codec_pool():
+    """Worker processes for in-process compression, started the first time they're needed (None on a single core)."""
+    global _codec_pool
+    with _codec_pool_lock:
+        if _codec_pool is None and tool_runner.CPU_COUNT > 1:
+            _codec_pool = ProcessPoolExecutor(max_workers=tool_runner.CPU_COUNT)
+        return _codec_pool
+
+def hold_codec_pool() -> None:
+    """
+    Keep the compression worker processes for a build. Builds that run at the same time share
+    them, and they're shut down by the release_codec_pool call of the last one to finish.
+    """
+    global _codec_pool_users
+    with _codec_pool_lock:
+        _codec_pool_users += 1
+
+def release_codec_pool() -> None:
+    """Undo hold_codec_pool, shutting the worker processes down if no other build holds them."""
+    global _codec_pool, _codec_pool_users
+    with _codec_pool_lock:
+        _codec_pool_users = max(0, _codec_pool_users - 1)
+        pool = _codec_pool if _codec_pool_users == 0 else None
+        if pool is not None:
+            _codec_pool = None
+    if pool is not None:
+        pool.shutdown()
+
+async def refpack_compress_async(data: bytes, level: str = "max") -> bytes:
+    """
+    refpack_compress on a worker process (a worker thread on single core machines),
+    so the tool loop keeps running while resources compress.
+    """
+    pool = _get_codec_pool()
+    if pool is None:
+        return await asyncio.to_thread(refpack_compress, data, level)
+    return await asyncio.get_running_loop().run_in_executor(pool, refpack_compress, data, level)
+
+def resolve_compression(compression: str) -> str:
+    """The codec a compression setting uses: "external", or one of REFPACK_LEVELS."""
+    if compression not in COMPRESSION_MODES:
+        raise ValueError(f"Unknown compression '{compression}' (must be one of {', '.join(COMPRESSION_MODES)})")
+    if compression != "auto":
+        return compression
+    try:
+        _find_compressor()
+    except FileNotFoundError:
+        log.info("  refpack_pipe not found - compressing in-process at the fast level.")
+        return "fast"
+    return "external"
+
+# --- Compression Cache ---
+
+def _write_atomic(path: str, data: bytes):
+    """Write to a temporary file and move it into place, so builds running at the same time never read half a file."""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+class CompressionCache:
+    """
+    Refpack output for pass-through resources (read from their source file, never modified),
+    stored by codec and content hash so the same bytes are only ever compressed once per codec.
+    An index keyed by path, size and modification time lets later builds skip reading unchanged sources entirely.
+    """
+    INDEX_VERSION = 2
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        self.index_path = os.path.join(folder, "index.json")
+        self._lock = threading.Lock()
+        self._files = None    # "codec|path|size|mtime_ns" -> content key
+        self._contents = None # content key ("codec-sha1") -> {"mem_size", "disk_size", "compressed"}
+        self._dirty = False
+
+    def _load(self):
+        if self._files is not None:
+            return
+        self._files, self._contents = {}, {}
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if index.get("version") == self.INDEX_VERSION:
+                self._files, self._contents = index["files"], index["contents"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    @staticmethod
+    def _file_key(path: str, codec: str) -> str:
+        st = os.stat(path)
+        return f"{codec}|{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+
+    @staticmethod
+    def _content_key(data: bytes, codec: str) -> str:
+        return f"{codec}-{hashlib.sha1(data).hexdigest()}"
+
+    def blob_path(self, content_hash: str) -> str:
+        return os.path.join(self.folder, content_hash + ".refpack")
+
+    def _usable(self, content_hash):
+        entry = self._contents.get(content_hash)
+        if entry is None or (entry["compressed"] and not os.path.exists(self.blob_path(content_hash))):
+            return None
+        return dict(entry, hash=content_hash)
+
+    def lookup_path(self, path: str, codec: str):
+        """Cached entry for a source file that hasn't changed since it was last seen, without reading it."""
+        with self._lock:
+            self._load()
+            content_hash = self._files.get(self._file_key(path, codec))
+            return self._usable(content_hash) if content_hash else None
+
+    def lookup_data(self, path: str, data: bytes, codec: str):
+        """Cached entry for the given contents (e.g. a file that was touched but not changed)."""
+        content_hash = self._content_key(data, codec)
+        with self._lock:
+            self._load()
+            entry = self._usable(content_hash)
+            if entry is not None:
+                self._files[self._file_key(path, codec)] = content_hash
+                self._dirty = True
+            return entry
+
+    def store(self, path: str, data: bytes, compressed_data, codec: str):
+        """Remember the result of compressing a source file. compressed_data is None if compression didn't help."""
+        content_hash = self._content_key(data, codec)
+        if compressed_data is not None:
+            os.makedirs(self.folder, exist_ok=True)
+            _write_atomic(self.blob_path(content_hash), compressed_data)
+        with self._lock:
+            self._load()
+            self._contents[content_hash] = {
+                "mem_size": len(data),
+                "disk_size": len(compressed_data) if compressed_data is not None else len(data),
+                "compressed": compressed_data is not None,
+            }
+            self._files[self._file_key(path, codec)] = content_hash
+            self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(self.folder, exist_ok=True)
+            index = {"version": self.INDEX_VERSION, "files": self._files, "contents": self._contents}
+            _write_atomic(self.index_path, json.dumps(index).encode("utf-8"))
+            self._dirty = False
+
+# --- Package Index ---
+
+class IndexTable:
+    """
+    The package index held as one uint32 column per field instead of a dict per entry.
+    Finding the common type/group/instance-high and serialising the index both work on
+    whole columns, which keeps packages with tens of thousands of resources cheap to write.
+    """
+    def __init__(self):
+        self.type_ids = array(_UINT32)
+        self.group_ids = array(_UINT32)
+        self.instance_highs = array(_UINT32)
+        self.instance_lows = array(_UINT32)
+        self.chunk_offsets = array(_UINT32)
+        self.disk_sizes = array(_UINT32)   # Actual size on disk (compressed or uncompressed), OR-ed with 0x80000000
+        self.mem_sizes = array(_UINT32)    # Original uncompressed size
+        self.flag_words = array(_UINT32)   # IsCompressedFlag and UnknownWord, two little-endian uint16s read as one uint32
+
+    def __len__(self):
+        return len(self.type_ids)
+
+    def append(self, type_id, group_id, instance_id, chunk_offset, disk_size, mem_size, is_compressed_flag, unknown_word=0x0000):
+        self.type_ids.append(type_id)
+        self.group_ids.append(group_id)
+        self.instance_highs.append((instance_id >> 32) & 0xFFFFFFFF)
+        self.instance_lows.append(instance_id & 0xFFFFFFFF)
+        self.chunk_offsets.append(chunk_offset)
+        self.disk_sizes.append(disk_size | 0x80000000) # DiskSize is OR-ed with 0x80000000 as per DBPF spec (indicates valid disk size)
+        self.mem_sizes.append(mem_size)
+        self.flag_words.append(is_compressed_flag | (unknown_word << 16))
+
+    @staticmethod
+    def _is_constant(column):
+        return len(column) > 0 and column.count(column[0]) == len(column)
+
+    def index_type(self):
+        """
+        Bitmask of the TGI parts shared by every entry (0x01 type, 0x02 group, 0x04 instance high).
+        Shared parts are promoted into the index header, so each entry doesn't need to store them.
+        """
+        index_type_main = 0x00000000
+        if self._is_constant(self.type_ids):
+            index_type_main |= 0x01
+        if self._is_constant(self.group_ids):
+            index_type_main |= 0x02
+        if self._is_constant(self.instance_highs):
+            index_type_main |= 0x04
+        return index_type_main
+
+    def _entry_columns(self, index_type_main):
+        columns = []
+        if (index_type_main & 0x01) == 0: columns.append(self.type_ids)       # TypeID is NOT common
+        if (index_type_main & 0x02) == 0: columns.append(self.group_ids)      # GroupID is NOT common
+        if (index_type_main & 0x04) == 0: columns.append(self.instance_highs) # Instance High is NOT common
+        # Instance Low and the remaining fields are always written
+        columns += [self.instance_lows, self.chunk_offsets, self.disk_sizes, self.mem_sizes, self.flag_words]
+        return columns
+
+    def size(self, index_type_main):
+        """Size of the serialised index in bytes."""
+        return 4 * (1 + bin(index_type_main).count("1") + len(self) * len(self._entry_columns(index_type_main)))
+
+    def to_bytes(self, index_type_main):
+        """Index header followed by every entry, interleaved from the columns in one pass."""
+        header = array(_UINT32, [index_type_main])
+        if len(self) > 0:
+            if (index_type_main & 0x01) != 0: header.append(self.type_ids[0])       # Promoting common type to header
+            if (index_type_main & 0x02) != 0: header.append(self.group_ids[0])      # Promoting common group to header
+            if (index_type_main & 0x04) != 0: header.append(self.instance_highs[0]) # Promoting common higher part of instance ID to header
+
+        columns = self._entry_columns(index_type_main)
+        stride = len(columns)
+        entries = array(_UINT32, bytes(4 * stride * len(self)))
+        for field, column in enumerate(columns):
+            entries[field::stride] = column
+        header.extend(entries)
+        if sys.byteorder != "little":
+            header.byteswap()
+        return header.tobytes()
+
+# --- Package Reader ---
+
+# One resource in a package's index - compressed is True when the data on disk is Refpack
+PackageEntry = namedtuple("PackageEntry", ["type_id", "group_id", "instance_id", "offset", "disk_size", "mem_size", "compressed"])
+
+def read_package_index(path: str) -> list:
+    """
+    The index entries of a DBPF 2.0 package, in the order they are stored.
+    Only the header and the index are read. Raises ValueError if path isn't a package this writer can read.
+    """
+    with open(path, "rb") as f:
+        header = f.read(96)
+        if len(header) != 96 or header[:4] != DBPF_SIGNATURE:
+            raise ValueError(f"'{path}' is not a DBPF package")
+        count, = struct.unpack_from("<I", header, 36)
+        index_size, = struct.unpack_from("<I", header, 44)
+        index_offset, = struct.unpack_from("<I", header, 64)
+        f.seek(index_offset)
+        index_data = f.read(index_size)
+    if len(index_data) != index_size or index_size % 4:
+        raise ValueError(f"'{path}' has a damaged index")
+
+    words = array(_UINT32, index_data)
+    if sys.byteorder != "little":
+        words.byteswap()
+    index_type_main = words[0]
+    common = {}
+    position = 1
+    for bit in (0x01, 0x02, 0x04): # common type, group and instance high follow the index type, in that order
+        if index_type_main & bit:
+            common[bit] = words[position]
+            position += 1
+    stride = 5 + sum(1 for bit in (0x01, 0x02, 0x04) if not index_type_main & bit)
+    if len(words) != position + stride * count:
+        raise ValueError(f"'{path}' has a damaged index")
+
+    entries = []
+    for start in range(position, len(words), stride):
+        fields = iter(words[start:start + stride])
+        type_id = common[0x01] if 0x01 in common else next(fields)
+        group_id = common[0x02] if 0x02 in common else next(fields)
+        instance_high = common[0x04] if 0x04 in common else next(fields)
+        instance_low, offset, disk_size, mem_size, flag_word = fields
+        entries.append(PackageEntry(
+            type_id, group_id, (instance_high << 32) | instance_low,
+            offset, disk_size & 0x7FFFFFFF, mem_size, (flag_word & 0xFFFF) != 0
+        ))
+    return entries
+
+def read_package_resource(path: str, entry: PackageEntry) -> bytes:
+    """The data of one resource in a package, decompressed."""
+    with open(path, "rb") as f:
+        f.seek(entry.offset)
+        data = f.read(entry.disk_size)
+    if len(data) != entry.disk_size:
+        raise ValueError(f"'{path}' is shorter than its index says")
+    return refpack_decompress(data) if entry.compressed else data
 
 # --- Main DBPF Writer Function ---
 
-def create_dbpf_package(output_path: str, resources: list):
+async def _compress_resource(index: int, res: dict, raw_data: bytes, codec: str, debug_enabled: bool):
+    """
+    Compresses one resource's data with codec ("external" or a Refpack level) if that makes it smaller.
+    Returns (data to write, compressed flag, whether compression ran without errors).
+    """
+    try:
+        if codec == "external":
+            compressed_data = await compress_refpack_async(raw_data)
+        else:
+            compressed_data = await refpack_compress_async(raw_data, codec)
+    except (FileNotFoundError, RuntimeError, subprocess.TimeoutExpired) as e:
+        log.warning(f"  Warning: Refpack compression failed for {_resource_name(index, res)}: {e}. Using uncompressed data.")
+        return raw_data, 0x0000, False
+    # Check if compressed data is actually smaller
+    if len(compressed_data) < len(raw_data):
+        if debug_enabled:
+            log.debug(f"  Info: {_resource_name(index, res)} compressed from {len(raw_data)} B to {len(compressed_data)} B.")
+        return compressed_data, 0xFFFF, True # Mark as compressed
+    if debug_enabled:
+        log.debug(f"  Info: {_resource_name(index, res)} compressed size ({len(compressed_data)} B) is not smaller than original ({len(raw_data)} B). Using uncompressed data.")
+    return raw_data, 0x0000, True
+
+async def _prepare_path_resource(index: int, res: dict, compression_cache: CompressionCache, codec: str, debug_enabled: bool):
+    """
+    Works out what to write for a pass-through resource without keeping a copy of it.
+    Returns (bytes or file path to stream, disk size, mem size, compressed flag).
+    """
+    source_path = res["path"]
+    entry = compression_cache.lookup_path(source_path, codec) if compression_cache is not None else None
+    if entry is None:
+        with open(source_path, 'rb') as f:
+            raw_data = f.read()
+        tracing.count(bytes_in=len(raw_data))
+        if not raw_data:
+            return source_path, 0, 0, 0x0000
+        entry = compression_cache.lookup_data(source_path, raw_data, codec) if compression_cache is not None else None
+        if entry is None:
+            data_to_process, is_compressed_flag, compressed_ok = await _compress_resource(index, res, raw_data, codec, debug_enabled)
+            if compression_cache is not None and compressed_ok:
+                compression_cache.store(source_path, raw_data, data_to_process if is_compressed_flag else None, codec)
+            if is_compressed_flag:
+                return data_to_process, len(data_to_process), len(raw_data), is_compressed_flag
+            return source_path, len(raw_data), len(raw_data), 0x0000
+
+    if debug_enabled:
+        log.debug(f"  Info: {_resource_name(index, res)} taken from the compression cache.")
+    if entry["compressed"]:
+        return compression_cache.blob_path(entry["hash"]), entry["disk_size"], entry["mem_size"], 0xFFFF
+    return source_path, entry["disk_size"], entry["mem_size"], 0x0000
+
+async def _prepare_resource(index: int, res: dict, compression_cache: CompressionCache, codec: str, debug_enabled: bool):
+    """
+    Compresses one resource (or finds it in the compression cache).
+    Returns (bytes or file path to write, disk size, mem size, compressed flag).
+    """
+    # Pass-through resources are streamed from their source (or the cache) when the package is written
+    if "path" in res:
+        return await _prepare_path_resource(index, res, compression_cache, codec, debug_enabled)
+
+    raw_data = res["data"]
+
+    # Compression logic
+    if not raw_data:
+        log.warning(f"  Warning: {_resource_name(index, res)} has empty data. Skipping compression and writing 0-byte resource.")
+        return b'', 0, 0, 0x0000 # MemSize should be 0 for empty data
+
+    data_to_process, is_compressed_flag, _ = await _compress_resource(index, res, raw_data, codec, debug_enabled)
+    return data_to_process, len(data_to_process), len(raw_data), is_compressed_flag
+
+async def create_dbpf_package_async(output_path: str, resources: list, compression_cache: CompressionCache = None,
+                                    timestamp: int = None, skip_unchanged: bool = True, compression: str = "auto",
+                                    return_digest: bool = False):
     """
     Creates a DBPF package from a list of provided resources,
     with optional Refpack compression.
@@ -107,144 +778,93 @@ def create_dbpf_package(output_path: str, resources: list):
                 "group_id": uint32,   # The resource Group ID
                 "instance_id": uint64,# The resource Instance ID
                 "data": bytes         # The raw binary data of the resource
+                "path": str           # (Instead of data) Source file of a pass-through resource, streamed into the package
                 "name": str           # (Optional) Name for logging purposes
             }
+        compression_cache (CompressionCache): (Optional) Where compressed pass-through resources are kept between builds.
+        timestamp (int): (Optional) Unix time for the Date Created/Modified fields. Defaults to now -
+            pass a fixed value (e.g. from reproducible_timestamp) to get identical bytes for identical input.
+        skip_unchanged (bool): Leave an existing package alone if its content (apart from the timestamps) is the same.
+        compression (str): One of COMPRESSION_MODES - refpack_pipe ("external"), in-process Refpack at
+            a level from REFPACK_LEVELS ("fast", "max"), or "auto" for refpack_pipe when it can be found.
+        return_digest (bool): Also return the sha1 of the package file, worked out from the bytes as they
+            are written (or compared, if the package was unchanged) rather than by reading the file back.
+
+    Returns:
+        bool: True if the package was written, False if an identical one was already there.
+            With return_digest, a (bool, sha1 hex string) tuple.
     """
-    print(f"--- Starting DBPF package creation: {output_path} ---")
-
-    all_data_blocks_buffer = io.BytesIO() # Buffer to collect all resource data
-    index_entries_to_write = []           # List to store information for index entries
+    log.info(f"--- Starting DBPF package creation: {output_path} ---")
+    debug_enabled = log.isEnabledFor(logging.DEBUG) # Checked once so the per-resource lines cost nothing when off
+    codec = resolve_compression(compression)
+
+    # 1. Compress every resource, all in flight at once - tool_runner (or the codec pool) limits how many actually run
+    prepared = await asyncio.gather(*(
+        _prepare_resource(i, res, compression_cache, codec, debug_enabled) for i, res in enumerate(resources)
+    ))
+    if compression_cache is not None:
+        compression_cache.save()
+
+    # 2. Lay out and write the file on a worker thread so the tool loop stays free
+    written, digest = await asyncio.to_thread(_write_package, output_path, resources, prepared, debug_enabled, timestamp, skip_unchanged, return_digest)
+    return (written, digest) if return_digest else written
+
+def create_dbpf_package(output_path: str, resources: list, compression_cache: CompressionCache = None,
+                        timestamp: int = None, skip_unchanged: bool = True, compression: str = "auto",
+                        return_digest: bool = False):
+    """Blocking version of create_dbpf_package_async, with the same arguments."""
+    return tool_runner.run_sync(create_dbpf_package_async(output_path, resources, compression_cache, timestamp, skip_unchanged, compression, return_digest))
+
+def _write_package(output_path: str, resources: list, prepared: list, debug_enabled: bool,
+                   timestamp: int = None, skip_unchanged: bool = True, return_digest: bool = False) -> tuple:
+    """
+    Writes the header, the prepared resource data and the index to output_path.
+    Returns whether it was written, and with return_digest the sha1 of the file (otherwise None).
+    """
+    data_chunks = []                      # What to write for each resource: bytes, or a file path to stream from
+    index_table = IndexTable()            # Index entries, one column per field
     current_physical_data_offset = 96     # Data offset starts after the DBPF header (96 bytes)
 
-    # 1. Process each resource: handle as uncompressed, pad, collect data and index info
-    for i, res in enumerate(resources):
-        type_id = res["type_id"]
-        group_id = res["group_id"]
-        instance_id = res["instance_id"]
-        raw_data = res["data"]
-        resource_name = res.get('name', f'Resource {i+1} (Type:0x{type_id:X}, Group:0x{group_id:X}, Instance:0x{instance_id:X})')
-
-        original_data_len = len(raw_data) # This will always be the MemSize
-        data_to_process = raw_data         # This will be the data written to disk (could be compressed or original)
-        disk_size = original_data_len      # Default to original size on disk
-        is_compressed_flag = 0x0000        # Default to uncompressed
-
-        # Compression logic
-        if not raw_data:
-            print(f"  Warning: {resource_name} has empty data. Skipping compression and writing 0-byte resource.")
-            data_to_process = b'' # Ensure empty bytes if data is truly empty
-            disk_size = 0
-            original_data_len = 0 # MemSize should be 0 for empty data
-        else:
-            try:
-                compressed_data = compress_refpack(raw_data)
-                # Check if compressed data is actually smaller
-                if len(compressed_data) < original_data_len:
-                    data_to_process = compressed_data
-                    disk_size = len(compressed_data)
-                    is_compressed_flag = 0xFFFF # Mark as compressed
-                    #print(f"  Info: {resource_name} compressed from {original_data_len} B to {len(compressed_data)} B.")
-                #else:
-                    #print(f"  Info: {resource_name} compressed size ({len(compressed_data)} B) is not smaller than original ({original_data_len} B). Using uncompressed data.")
-                    # Defaults (data_to_process=raw_data, disk_size=original_data_len, is_compressed_flag=0x0000) are already set
-            except (FileNotFoundError, RuntimeError) as e:
-                print(f"  Warning: Refpack compression failed for {resource_name}: {e}. Using uncompressed data.")
-                # Defaults are already set
-
-        # Pad resource data to the required alignment
-        padded_data = _pad_data(data_to_process, RESOURCE_ALIGNMENT)
-        
-        # Write the padded resource data to the main data buffer
-        all_data_blocks_buffer.write(padded_data)
+    # Collect data and index info for each resource
+    for res, (data_to_process, disk_size, original_data_len, is_compressed_flag) in zip(resources, prepared):
+        # Keep the resource data to write; padding to the required alignment is added when writing
+        data_chunks.append((data_to_process, disk_size))
+        padding_len = len(_padding(disk_size, RESOURCE_ALIGNMENT))
 
         # Store information needed for the index entry
-        index_entries_to_write.append({
-            "type_id": type_id,
-            "group_id": group_id,
-            "instance_id": instance_id,
-            "chunk_offset": current_physical_data_offset,
-            "disk_size": disk_size,             # Actual size on disk (compressed or uncompressed)
-            "mem_size": original_data_len,      # Original uncompressed size
-            "is_compressed_flag": is_compressed_flag,
-            "unknown_word": 0x0000 # 0x0000 as per usual DBPF observation
-        })
-
-        current_physical_data_offset += len(padded_data)
-
-    total_padded_data_bytes = all_data_blocks_buffer.tell() # Total size of all resource data (including padding)
-    print(f"\nTotal resource data size (including padding): {_bytes_to_human_readable(total_padded_data_bytes)}")
-
-    # 2. Dynamic Index Header (indextype_main) Calculation
-    index_offset = current_physical_data_offset # Index offset is right after all resources data section
-    index_entry_count = len(index_entries_to_write) # Index (usually 1 per resource) count in collection
+        index_table.append(
+            res["type_id"], res["group_id"], res["instance_id"],
+            current_physical_data_offset, disk_size, original_data_len, is_compressed_flag,
+            0x0000 # 0x0000 as per usual DBPF observation
+        )
 
-    calculated_index_header_size = 4 # Initial size for indextype_main itself
-    calculated_single_entry_base_size = 32 # Default entry size if all TGI parts are in it
+        current_physical_data_offset += disk_size + padding_len
 
-    dynamic_index_type_main = 0x00000000
+    total_padded_data_bytes = current_physical_data_offset - 96 # Total size of all resource data (including padding)
+    log.info(f"Total resource data size (including padding): {_bytes_to_human_readable(total_padded_data_bytes)}")
 
-    common_type_id = 0
-    common_group_id = 0
-    common_instance_high = 0
+    # Dynamic Index Header (indextype_main) Calculation
+    index_offset = current_physical_data_offset # Index offset is right after all resources data section
+    index_entry_count = len(index_table) # Index (usually 1 per resource) count in collection
+    dynamic_index_type_main = index_table.index_type()
 
     if index_entry_count > 0:
-        first_entry = index_entries_to_write[0]
-        common_type_id = first_entry["type_id"]
-        common_group_id = first_entry["group_id"]
-        common_instance_high = (first_entry["instance_id"] >> 32) & 0xFFFFFFFF
-
-        all_types_same = True
-        for entry in index_entries_to_write:
-            if entry["type_id"] != common_type_id:
-                all_types_same = False
-                break
-        
-        all_groups_same = True
-        for entry in index_entries_to_write:
-            if entry["group_id"] != common_group_id:
-                all_groups_same = False
-                break
-
-        all_instance_high_same = True
-        for entry in index_entries_to_write:
-            if ((entry["instance_id"] >> 32) & 0xFFFFFFFF) != common_instance_high:
-                all_instance_high_same = False
-                break
-
-        if all_types_same:
-            dynamic_index_type_main |= 0x01 # Set 1 to bitmask
-            calculated_index_header_size += 4 # We promoting common entry type into header, so header size higher to store it
-            calculated_single_entry_base_size -= 4 # We promoting common entry type into header, so each entry size smaller, because we don't need to store it separately
-        if all_groups_same:
-            dynamic_index_type_main |= 0x02 # Set 2 to bitmask
-            calculated_index_header_size += 4 # We promoting common entry group into header, so header size higher to store it
-            calculated_single_entry_base_size -= 4 # We promoting common entry group into header, so each entry size smaller, because we don't need to store it separately
-        if all_instance_high_same:
-            dynamic_index_type_main |= 0x04 # Set 4 to bitmask
-            calculated_index_header_size += 4 # We promoting common higher part of instance ID into header, so header size higher to store it
-            calculated_single_entry_base_size -= 4 # We promoting common higher part of instance ID into header, so each entry size smaller, because we don't need to store it separately
-        
-        print(f"  DEBUG: Dynamic IndexTypeMain: 0x{dynamic_index_type_main:X}")
+        log.debug(f"  DEBUG: Dynamic IndexTypeMain: 0x{dynamic_index_type_main:X}")
         if (dynamic_index_type_main & 0x01) != 0:
-            print(f"  DEBUG:   Common TypeId: 0x{common_type_id:X}")
+            log.debug(f"  DEBUG:   Common TypeId: 0x{index_table.type_ids[0]:X}")
         if (dynamic_index_type_main & 0x02) != 0:
-            print(f"  DEBUG:   Common GroupId: 0x{common_group_id:X}")
+            log.debug(f"  DEBUG:   Common GroupId: 0x{index_table.group_ids[0]:X}")
         if (dynamic_index_type_main & 0x04) != 0:
-            print(f"  DEBUG:   Common Instance High: 0x{common_instance_high:X}")
-    else:
-        # No entries, use default flags and sizes
-        dynamic_index_type_main = 0x00000000
-        calculated_index_header_size = 4
-        calculated_single_entry_base_size = 32
+            log.debug(f"  DEBUG:   Common Instance High: 0x{index_table.instance_highs[0]:X}")
 
-    index_size = calculated_index_header_size + (index_entry_count * calculated_single_entry_base_size)
-    print(f"  Calculated Index Size: {index_size} bytes")
-    print(f"  Number of Index Entries: {index_entry_count}")
-    print(f"  Index Offset: {index_offset} bytes")
+    index_size = index_table.size(dynamic_index_type_main)
+    log.info(f"  Calculated Index Size: {index_size} bytes")
+    log.info(f"  Number of Index Entries: {index_entry_count}")
+    log.info(f"  Index Offset: {index_offset} bytes")
 
-    # 3. Build DBPF Header (96 bytes total)
+    # Build DBPF Header (96 bytes total)
     dbpf_header_buffer = io.BytesIO()
-    current_unix_time = int(time.time())
+    current_unix_time = int(time.time()) if timestamp is None else timestamp
 
     # Pack DBPF header fields (little-endian)
     dbpf_header_buffer.write(DBPF_SIGNATURE)
@@ -267,90 +887,80 @@ def create_dbpf_package(output_path: str, resources: list):
     dbpf_header_buffer.write(struct.pack('<I', 0x00000000)) # Unknown 2.0 field
     dbpf_header_buffer.write(b'\x00' * 24) # Reserved (3 x ulong = 24 bytes)
 
-    # 4. Build Index Data
-    index_data_buffer = io.BytesIO()
-
-    # Write Index Header (indextype_main and common TGI parts)
-    index_data_buffer.write(struct.pack('<I', dynamic_index_type_main))
-    if (dynamic_index_type_main & 0x01) != 0:
-        index_data_buffer.write(struct.pack('<I', common_type_id)) # Promoting common type to header
-    if (dynamic_index_type_main & 0x02) != 0:
-        index_data_buffer.write(struct.pack('<I', common_group_id)) # Promoting common group to header
-    if (dynamic_index_type_main & 0x04) != 0:
-        index_data_buffer.write(struct.pack('<I', common_instance_high))# Promoting common higher part of instance ID to header
-
-    # Write individual Index Entries
-    for entry in index_entries_to_write:
-        # DiskSize is OR-ed with 0x80000000 as per DBPF spec (indicates valid disk size)
-        final_disk_size = entry["disk_size"] | 0x80000000 
-
-        # InstanceID (uint64) is split into High and Low DWords for writing
-        instance_high = (entry["instance_id"] >> 32) & 0xFFFFFFFF
-        instance_low = entry["instance_id"] & 0xFFFFFFFF
-
-        entry_args_for_pack = []
-
-        if (dynamic_index_type_main & 0x01) == 0: # TypeID is NOT common
-            entry_args_for_pack.append(entry["type_id"])
-        if (dynamic_index_type_main & 0x02) == 0: # GroupID is NOT common
-            entry_args_for_pack.append(entry["group_id"])
-        if (dynamic_index_type_main & 0x04) == 0: # Instance High is NOT common
-            entry_args_for_pack.append(instance_high)
-        
-        # Instance Low is always written
-        entry_args_for_pack.append(instance_low)
-
-        # Remaining fields are always written
-        entry_args_for_pack.extend([
-            entry["chunk_offset"],
-            final_disk_size,
-            entry["mem_size"],
-            entry["is_compressed_flag"],
-            entry["unknown_word"]
-        ])
-        
-        # Determine the struct format string based on what TGI parts were included
-        current_entry_format = '<'
-        if (dynamic_index_type_main & 0x01) == 0: current_entry_format += 'I' # TypeID
-        if (dynamic_index_type_main & 0x02) == 0: current_entry_format += 'I' # GroupID
-        if (dynamic_index_type_main & 0x04) == 0: current_entry_format += 'I' # Instance High
-        current_entry_format += 'I' # Instance Low (always present)
-        current_entry_format += 'IIIHH' # ChunkOffset, DiskSize, MemSize, IsCompressedFlag, UnknownWord
-        
-        #print(f"  DEBUG - Entry {entry['instance_id']:X}: Format='{current_entry_format}', Args Count={len(entry_args_for_pack)}")
-        index_data_buffer.write(struct.pack(current_entry_format, *entry_args_for_pack))
-
-    # 5. Write to file
-    with open(output_path, 'wb') as f:
-        f.write(dbpf_header_buffer.getvalue()) # Write header
-        f.write(all_data_blocks_buffer.getvalue()) # Write resource data
-        f.write(index_data_buffer.getvalue()) # Write index
+    # Build Index Data - header and every entry in one bulk serialisation
+    index_data = index_table.to_bytes(dynamic_index_type_main)
+
+    # Nothing to do if the same package is already there - its file (and modified time) stay as they are
+    if skip_unchanged:
+        sha1 = hashlib.sha1() if return_digest else None
+        if _package_unchanged(output_path, dbpf_header_buffer.getvalue(), data_chunks, index_data, sha1):
+            log.info(f"DBPF package '{output_path}' is unchanged, not rewritten.")
+            return False, sha1 and sha1.hexdigest()
+    sha1 = hashlib.sha1() if return_digest else None # a fresh one, the check may have stopped part way
+
+    # Write to file
+    with tracing.span("write " + os.path.basename(output_path)), open(output_path, 'wb') as f:
+        def write(data):
+            f.write(data)
+            if sha1 is not None:
+                sha1.update(data)
+
+        write(dbpf_header_buffer.getvalue()) # Write header
+        for chunk, disk_size in data_chunks: # Write resource data
+            if isinstance(chunk, bytes):
+                write(chunk)
+            elif _copy_file_into(chunk, f, sha1) != disk_size:
+                raise RuntimeError(f"'{chunk}' changed while the package was being written")
+            write(_padding(disk_size, RESOURCE_ALIGNMENT))
+        write(index_data) # Write index
+        tracing.count(bytes_out=f.tell())
+
+    log.info(f"DBPF package '{output_path}' successfully created.")
+    log.info(f"File size on disk: {_bytes_to_human_readable(os.path.getsize(output_path))}")
+    return True, sha1 and sha1.hexdigest()
+
+# Build a resource from a file name like S3_<type>_<group>_<instance>... and its contents
+# file_data can also be the path of a file to pass through unchanged, which is streamed in when the package is written
+# Returns None if the name doesn't contain a TGI
+def make_resource(filename, file_data):
+    match = RESOURCE_NAME_PATTERN.search(filename)
+    if not match:
+        return None
+    type_id_str, group_id_str, instance_id_str = match.groups()
+    resource = {
+        "type_id": int(type_id_str, 16),
+        "group_id": int(group_id_str, 16),
+        "instance_id": int(instance_id_str, 16),
+    }
+    if isinstance(file_data, bytes):
+        resource["data"] = file_data
+    else:
+        resource["path"] = os.fspath(file_data)
+    return resource
 
-    print(f"\nDBPF package '{output_path}' successfully created.")
-    print(f"File size on disk: {_bytes_to_human_readable(os.path.getsize(output_path))}")
+# Build resources from in-memory files, e.g. {file name: bytes or source path}
+def resources_from_files(files):
+    resources = []
+    for filename, file_data in files.items():
+        resource = make_resource(filename, file_data)
+        if resource is not None:
+            resources.append(resource)
+    return resources
 
 # Load contents to import into the package
 def read_resources(folder_path):
-    pattern = re.compile(r"S3_([0-9A-Fa-f]{8})_([0-9A-Fa-f]{8})_([0-9A-Fa-f]{16})")
     resources = []
 
-    for root, _, files in os.walk(folder_path):
-        for filename in files:
-            match = pattern.search(filename)
-            if match:
-                type_id_str, group_id_str, instance_id_str = match.groups()
-                file_path = os.path.join(root, filename)
-                
-                with open(file_path, "rb") as f:
-                    file_data = f.read()
-
-                resource = {
-                    "type_id": int(type_id_str, 16),
-                    "group_id": int(group_id_str, 16),
-                    "instance_id": int(instance_id_str, 16),
-                    "data": file_data
-                }
-
-                resources.append(resource)
+    with tracing.span("read resources " + os.path.basename(folder_path)):
+        for root, _, files in os.walk(folder_path):
+            for filename in files:
+                if RESOURCE_NAME_PATTERN.search(filename):
+                    file_path = os.path.join(root, filename)
+                    
+                    with open(file_path, "rb") as f:
+                        file_data = f.read()
+                    tracing.count(bytes_in=len(file_data))
+
+                    resources.append(make_resource(filename, file_data))
 
     return resources
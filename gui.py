@@ -1,11 +1,19 @@
+import base64
+import os
 import re
+import subprocess
 import sys
+import threading
+import time
 from pathlib import Path
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, colorchooser
 import sv_ttk
-from utils import hex_to_rgb_string, color_chooser, recolour_files, export_png, generate_shades, lighten_hex_50, invert_hex, validate_all_inputs, validate_hex_input, enforce_hash_prefix, validate_opacity
-from recolour import run_recolour
+from colours import DEFAULT_COLOURS, accent_colours, is_hex_colour, validate_selection
+from build import BuildConfig, build_theme, format_elapsed, render_preview
+from build_log import get_logger, start_build_log
+
+log = get_logger("gui")
 
 # File paths
 if getattr(sys, 'frozen', False):
@@ -19,212 +27,97 @@ creations_path = base_path / "Creations"
 entries = {}
 color_previews = {}
 
-# Default colour presets
-default_colours = {
-    "Main Font": {
-        "Light": "#545354",
-        "Colourful": "#545354",
-        "Dark": "#ebebeb"
-    },
-    "Darkest Accent": {
-        "Light": "#b179ff",
-        "Colourful": "#b179ff",
-        "Dark": "#b179ff"
-    },
-    "Dark Accent": {
-        "Light": "#c398ff",
-        "Colourful": "#c398ff",
-        "Dark": "#c398ff"
-    },
-    "Main Accent": {
-        "Light": "#dbb6ff",
-        "Colourful": "#d4b6ff",
-        "Dark": "#d4b6ff"
-    },
-    "Light Accent": {
-        "Light": "#e7d6ff",
-        "Colourful": "#e7d6ff",
-        "Dark": "#e7d6ff"
-    },
-    "Background Light": {
-        "Light": "#e7d6ff",
-        "Colourful": "#e7d6ff",
-        "Dark": "#333333"
-    },
-    "Background Dark": {
-        "Light": "#d4b6ff",
-        "Colourful": "#d4b6ff",
-        "Dark": "#333333"
-    },
-    "HUD Background 1": {
-        "Light": "#f2f2f2",
-        "Colourful": "#c398ff",
-        "Dark": "#1a1a1a"
-    },
-    "HUD Background 2": {
-        "Light": "#f9f9f9",
-        "Colourful": "#e7d6ff",
-        "Dark": "#1a1a1a"
-    },
-    "HUD Accent Light": {
-        "Light": "#ffffff",
-        "Colourful": "#f7f0ff",
-        "Dark": "#333333"
-    },
-    "HUD Accent Dark": {
-        "Light": "#b3b3b3",
-        "Colourful": "#c398ff",
-        "Dark": "#000000"
-    },
-    "MISC": {
-        "Light": "#cccccc",
-        "Colourful": "#c398ff",
-        "Dark": "#000000"
-    },
-    "Opacity": {
-        "Light": "0.75",
-        "Colourful": "0.80",
-        "Dark": "0.85"
-    }
-}
+# --------------------------------- #
+# Input helpers
+# --------------------------------- #
+
+# Create a colour picker 
+def color_chooser(entry, color_preview):
+    def pick_color():
+        current = entry.get()
+        try:
+            rgb, hex_color = colorchooser.askcolor(current)
+            if hex_color:
+                entry.delete(0, tk.END)
+                entry.insert(0, hex_color)
+                color_preview.config(bg=hex_color)
+        except Exception:
+            pass
+    return pick_color
+
+# Enforce hex structure
+def validate_hex_input(value):
+    if value == "":
+        return True
+    if not value.startswith("#"):
+        value = "#" + value
+    return bool(re.fullmatch(r"#([0-9a-fA-F]{0,6})", value))
+
+# Ensure there is always a # in front of hex
+def enforce_hash_prefix(event, preview=None):
+    widget = event.widget
+    val = widget.get()
+    if val and not val.startswith("#"):
+        widget.delete(0, tk.END)
+        widget.insert(0, "#" + val)
+    if preview:
+        # Manually update preview color after modifying the entry text
+        val = widget.get()
+        if is_hex_colour(val):
+            preview.config(bg=val)
+
+# Ensure opacity can only be between 0 and 1
+def validate_opacity(value):
+    if value == "":
+        return True  # Allow empty so user can delete
+    try:
+        val = float(value)
+        return 0.0 <= val <= 1.0
+    except ValueError:
+        return False
+
+# Check that hex and opacity inputs are valid when attempting to use them
+def validate_all_inputs(ui_name, colour_values):
+    invalid_fields = validate_selection(ui_name, colour_values)
+
+    # Show error message if there are any invalid fields
+    if invalid_fields:
+        messagebox.showerror(
+            "Invalid Input",
+            "Please fix the following field(s):\n\n" + "\n".join(invalid_fields)
+        )
+        return False
+
+    return True
+
+# Open a folder in the file manager
+def open_folder(path):
+    if sys.platform == "win32":
+        os.startfile(path)
+    else:
+        subprocess.Popen(["open" if sys.platform == "darwin" else "xdg-open", str(path)])
+
+# Set an entry and its preview box to a value
+def set_entry(label, value):
+    entries[label].delete(0, tk.END)
+    entries[label].insert(0, value)
+    if label in color_previews:
+        color_previews[label].config(bg=value)
 
 # Update shades in Detailed Controls section based on selection
 def update_shades(hex_code, preset_val):
-    if re.fullmatch(r"#([0-9a-fA-F]{6})", hex_code):
-        shades = generate_shades(hex_code)
-        labels = ["Light Accent", "Main Accent", "Dark Accent", "Darkest Accent"]
-        for label, shade in zip(labels, shades):
+    if is_hex_colour(hex_code):
+        for label, shade in accent_colours(hex_code, preset_val).items():
             if label in entries:
-                entries[label].delete(0, tk.END)
-                entries[label].insert(0, shade)
-                if label in color_previews:
-                    color_previews[label].config(bg=shade)
-
-        # Update backgrounds
-        if preset_val != "Dark":
-            entries["Background Dark"].delete(0, tk.END)
-            entries["Background Dark"].insert(0, shades[1])
-            entries["Background Light"].delete(0, tk.END)
-            entries["Background Light"].insert(0, shades[0])
-            color_previews["Background Dark"].config(bg=shades[1])
-            color_previews["Background Light"].config(bg=shades[0])
-            
-        if preset_val == "Colourful":
-            # HUD Background 1 = light accent
-            entries["HUD Background 1"].delete(0, tk.END)
-            entries["HUD Background 1"].insert(0, shades[0])
-            color_previews["HUD Background 1"].config(bg=shades[0])
-            # HUD Background 2 = light accent
-            entries["HUD Background 2"].delete(0, tk.END)
-            entries["HUD Background 2"].insert(0, shades[0])
-            color_previews["HUD Background 2"].config(bg=shades[0])
-            # HUD Accent Light = halfway between white and light accent
-            hud_accent_light_shade = lighten_hex_50(shades[0])
-            entries["HUD Accent Light"].delete(0, tk.END)
-            entries["HUD Accent Light"].insert(0, hud_accent_light_shade)
-            color_previews["HUD Accent Light"].config(bg=hud_accent_light_shade)
-            # HUD Accent Dark = dark accent
-            entries["HUD Accent Dark"].delete(0, tk.END)
-            entries["HUD Accent Dark"].insert(0, shades[2])
-            color_previews["HUD Accent Dark"].config(bg=shades[2])
-            # MISC
-            entries["MISC"].delete(0, tk.END)
-            entries["MISC"].insert(0, shades[0])
-            color_previews["MISC"].config(bg=shades[0])
-
-# Extract colour values to replace
-def colour_extractor(preset_val):
-
-    # Grab the current values in the HEX code inputs
-    font_main=entries["Main Font"].get()
-    accent_darker=entries["Darkest Accent"].get()
-    accent_dark=entries["Dark Accent"].get()
-    accent_main=entries["Main Accent"].get()
-    accent_light=entries["Light Accent"].get()
-    background_light=entries["Background Light"].get()
-    background_dark=entries["Background Dark"].get()
-    hud_background1=entries["HUD Background 1"].get()
-    hud_background2=entries["HUD Background 2"].get()
-    hud_accent_light=entries["HUD Accent Light"].get()
-    hud_accent_dark=entries["HUD Accent Dark"].get()
-    misc=entries["MISC"].get()
-    opacity = entries["Opacity"].get()
-    
-    # Colour selections for output file
-    input_values = {
-        "Main Font": font_main,
-        "Darkest Accent": accent_darker,
-        "Dark Accent": accent_dark,
-        "Main Accent": accent_main,
-        "Light Accent": accent_light,
-        "Background Light": background_light,
-        "Background Dark": background_dark,
-        "HUD Background 1": hud_background1,
-        "HUD Background 2": hud_background2,
-        "HUD Accent Light": hud_accent_light,
-        "HUD Accent Dark": hud_accent_dark,
-        "MISC": misc,
-        "Opacity": opacity
-    }
-
-    # Colour replacements for SVG files
-    replacements_svg = {
-        "#ff5599": accent_darker,
-        "#ff80b2": accent_dark,
-        "#ffaacc": accent_main,
-        "#ffd5e5": accent_light,
-        "rgb\\(255,170,204\\)": hex_to_rgb_string(accent_main), # main accent ffaacc
-        "rgb\\(255,221,234\\)": hex_to_rgb_string(accent_light),
-        "rgb\\(191,191,191\\)": hex_to_rgb_string(hud_accent_dark), # drop shadow in white boxes
-        "rgb\\(192,191,192\\)": hex_to_rgb_string(hud_accent_dark), # relationship panel/opportunities tabs
-        "rgb\\(255,163,200\\)": hex_to_rgb_string(background_dark), # CAS background dark
-        "rgb\\(250,250,250\\)": hex_to_rgb_string(background_light), # CAS background light
-        "#fafafa": background_light,
-        "#fde7f0": background_light, # background gradient light, light mode default: accent_light
-        "#ebc7d0": background_dark, # background gradient dark: light mode default: accent_main
-        "#ffdbe9": background_dark, # startup loading screen
-        "#f2f2f2": hud_background1, # DARK MODE HUD - main background
-        "#f9f9f9": hud_background2,
-        "#ffffff": hud_accent_light,
-        "#b3b3b3": hud_accent_dark,
-        "rgb\\(145,145,145\\)": hex_to_rgb_string(hud_accent_dark), #  build/buy category images
-        "#999999": hud_accent_dark, # build/buy darker controls
-        "#e6e6e6": misc, # WHAT IS THIS?
-        "#cccccc": misc, # deselected tab, other misc stuff    
-        "#808080": hud_accent_dark, # DARK MODE - unavailable tab
-        "opacity:0.75": "opacity:" + opacity,
-        "opacity:0.80": "opacity:" + opacity,
-        "opacity:0.8": "opacity:" + opacity,
-        "opacity:0.801": "opacity:" + opacity
-    }
-
-    # Colour replacements for LAYOUT files
-    replacements_layout = {
-        "0xffff5599": accent_darker.replace("#", "0xff"),
-        "0xffff80b2": accent_dark.replace("#", "0xff"),
-        "0xffffaacc": accent_main.replace("#", "0xff"),
-        "0xffffd5e5": accent_light.replace("#", "0xff"),
-        "0xff545354": font_main.replace("#", "0xff"), # TEXT COLOUR
-        "0xfffaf7f9": hud_background1.replace("#", "0xff"), # divider colours
-        "0xffcccccc": misc.replace("#", "0xff") # table alternate row colour
-    }
-
-    # Replace pie menu highlighted text
-    # Use font_main for light and colourful modes and the inverse of font_main for dark mode
-    if preset_val == "Dark":
-        replacements_layout["0xff545355"] = invert_hex(font_main).replace("#", "0xff")
-    else:
-        replacements_layout["0xff545355"] = font_main.replace("#", "0xff")
-    
-
-    # Keep font SVG only for preview - it might break the other SVGs
-    replacements_svg_preview = replacements_svg.copy()
-    replacements_svg_preview["#545354"] = font_main
+                set_entry(label, shade)
 
-    return replacements_svg, replacements_svg_preview, replacements_layout, input_values
+# The current colour selections, e.g. {"Main Font": "#545354", ..., "Opacity": "0.75"}
+def selected_colours():
+    return {label: entries[label].get().strip() for label in DEFAULT_COLOURS}
 
 # Create the tool GUI
-def run_app(inkscape_path):
+# launch_time is time.perf_counter() when the tool started, to log how long the window took to appear
+def run_app(inkscape_path, launch_time=None):
     root = tk.Tk()
     icon_path = base_path / "PinkPlumbob.ico"
     if icon_path.exists():    
@@ -302,9 +195,9 @@ def run_app(inkscape_path):
         update_shades(entry_accent.get(), selected_option.get())
 
         # Update opacity entry when changing presets
-        if "Opacity" in default_colours and preset_name in default_colours["Opacity"]:
+        if "Opacity" in DEFAULT_COLOURS and preset_name in DEFAULT_COLOURS["Opacity"]:
             entry_opacity.delete(0, tk.END)
-            entry_opacity.insert(0, default_colours["Opacity"][preset_name])
+            entry_opacity.insert(0, DEFAULT_COLOURS["Opacity"][preset_name])
 
     # Create radio buttons with Light selected to start with
     options = ["Light", "Colourful", "Dark"]
@@ -326,7 +219,7 @@ def run_app(inkscape_path):
     # When the main accent colour is changed, updated the preview box colour
     def update_accent_preview(event):
         val = entry_accent.get()
-        if re.fullmatch(r"#([0-9a-fA-F]{6})", val):
+        if is_hex_colour(val):
             accent_preview.config(bg=val)
             update_shades(val, selected_option.get())
 
@@ -375,9 +268,9 @@ def run_app(inkscape_path):
     toggle_button.grid(row=1, column=0, columnspan=3, padx=5, pady=(10,0))
 
     preset = selected_option.get()
-    colour_keys = [k for k in default_colours.keys() if k != "Opacity"]
+    colour_keys = [k for k in DEFAULT_COLOURS.keys() if k != "Opacity"]
     for i, label_text in enumerate(colour_keys): 
-        default = default_colours[label_text][preset]
+        default = DEFAULT_COLOURS[label_text][preset]
 
         # Colour input label
         ttk.Label(color_input_frame, text=label_text).grid(row=i, column=0, padx=5, pady=4, sticky="e")
@@ -402,7 +295,7 @@ def run_app(inkscape_path):
         # Update preview box when selected colour changes
         def update_preview(event, ent=entry, prev=preview):
             val = ent.get()
-            if re.fullmatch(r"#([0-9a-fA-F]{6})", val):
+            if is_hex_colour(val):
                 prev.config(bg=val)
         entry.bind("<KeyRelease>", update_preview)
 
@@ -410,28 +303,28 @@ def run_app(inkscape_path):
             for label, entry in entries.items():
                 if label == "Opacity":
                     continue  # Skip opacity for color preview
-                if label in default_colours and preset_name in default_colours[label]:
-                    hex_value = default_colours[label][preset_name]
+                if label in DEFAULT_COLOURS and preset_name in DEFAULT_COLOURS[label]:
+                    hex_value = DEFAULT_COLOURS[label][preset_name]
                     entry.delete(0, tk.END)
                     entry.insert(0, hex_value)
                     if label in color_previews:
                         color_previews[label].config(bg=hex_value)
 
             # Set opacity separately
-            if "Opacity" in default_colours and preset_name in default_colours["Opacity"]:
+            if "Opacity" in DEFAULT_COLOURS and preset_name in DEFAULT_COLOURS["Opacity"]:
                 entry_opacity.delete(0, tk.END)
-                entry_opacity.insert(0, default_colours["Opacity"][preset_name])
+                entry_opacity.insert(0, DEFAULT_COLOURS["Opacity"][preset_name])
 
     # Add opacity control
     ttk.Label(color_input_frame, text="Opacity").grid(row=len(colour_keys), column=0, padx=5, pady=5, sticky="e")
 
     vcmd = root.register(validate_opacity)
     entry_opacity = ttk.Entry(color_input_frame, width=10, validate="key", validatecommand=(vcmd, "%P"))
-    entry_opacity.insert(0, default_colours["Opacity"][preset])
+    entry_opacity.insert(0, DEFAULT_COLOURS["Opacity"][preset])
     entry_opacity.grid(row=len(colour_keys), column=1, padx=5, pady=5, sticky="w")
     entries["Opacity"] = entry_opacity
 
-    last_row = len(default_colours) + 7
+    last_row = len(DEFAULT_COLOURS) + 7
 
     tk.Label(frame_detailed, text="").grid(row=last_row, column=0, padx=5, pady=1)
 
@@ -445,101 +338,194 @@ def run_app(inkscape_path):
 
     # Preview UI
     def preview_UI():
-        if not validate_all_inputs(input_ui_name = entry_ui_name, input_entries = entries):
+        if not validate_all_inputs(entry_ui_name.get(), selected_colours()):
             return  # Abort if invalid inputs
 
         try:
-            _, replacements_svg_preview, _, _ = colour_extractor(selected_option.get())
-            recolour_files(
-                file_input_path=base_path / "UI_Preview.svg",
-                colour_replacements=replacements_svg_preview,
-                file_output_path=base_path / "UI_Preview_Edited.svg"
-            )
-            export_png(
-                inkscape_path,
-                input_path=base_path / "UI_Preview_Edited.svg",
-                output_path=base_path / "UI_Preview.png"
-            )
-            img = tk.PhotoImage(file=base_path / "UI_Preview.png")
+            png_data = render_preview(selected_colours(), selected_option.get(), inkscape_path, base_path / "UI_Preview.svg")
+            if png_data is None:
+                raise RuntimeError("Inkscape did not return a preview image")
+            img = tk.PhotoImage(data=base64.b64encode(png_data))
             image_label.configure(image=img, text="")
             image_label.image = img
         except Exception as e:
-            print("Preview failed:", e)
+            log.exception(f"Preview failed: {e}")
             image_label.configure(text=f"Failed to load preview.\nCheck that UI_Preview.svg is in the same folder as Cloud UI Recolour Tool.exe\n{e}")
     
     ttk.Button(frame_run, text="✨ Show Preview ✨", command=preview_UI, width=55).grid(
-        row=last_row + 1, column=0, columnspan=3, padx=5, pady=(5,10), sticky="w"
+        row=last_row + 1, column=0, columnspan=3, padx=5, pady=(5,5), sticky="w"
+    )
+
+    # Load a theme picked in the gallery into the preset, main accent and Detailed Controls
+    def load_theme(preset, accent, colour_values):
+        selected_option.set(preset)
+        entry_accent.delete(0, tk.END)
+        entry_accent.insert(0, accent)
+        accent_preview.config(bg=accent)
+        for label, value in colour_values.items():
+            if label in entries:
+                set_entry(label, value)
+
+    # Preview a sweep of accents around the current one and load the one clicked
+    def on_theme_gallery():
+        if not is_hex_colour(entry_accent.get()):
+            messagebox.showerror("Invalid Colour", "Enter a valid main accent colour to sweep around first.")
+            return
+        from theme_gallery import open_theme_gallery
+        open_theme_gallery(root, inkscape_path, base_path / "UI_Preview.svg", entry_accent.get(), selected_option.get(), load_theme)
+
+    ttk.Button(frame_run, text="🎨 Theme gallery 🎨", command=on_theme_gallery, width=55).grid(
+        row=last_row + 2, column=0, columnspan=3, padx=5, pady=(0,10), sticky="w"
     )
 
     # Settings toggles
-    ttk.Label(frame_run, text="Build the UI mod from your current selections", wraplength=500).grid(row=last_row + 2, column=0, padx=5, pady=5, sticky="w")
+    ttk.Label(frame_run, text="Build the UI mod from your current selections", wraplength=500).grid(row=last_row + 3, column=0, padx=5, pady=5, sticky="w")
 
     include_logos = tk.BooleanVar(value=True)
     include_patches = tk.BooleanVar(value=True)
     delete_processing_files = tk.BooleanVar(value=True)
-
-    ttk.Checkbutton(frame_run, text="Generate language logos", variable=include_logos).grid(row=last_row + 3, sticky="w", padx=5)
-    ttk.Checkbutton(frame_run, text="Generate patches", variable=include_patches).grid(row=last_row + 4, sticky="w", padx=5)
-    ttk.Checkbutton(frame_run, text="Delete processing files", variable=delete_processing_files).grid(row=last_row + 5, sticky="w", padx=5)
+    optimise_pngs = tk.BooleanVar(value=False)
+    minify_layouts = tk.BooleanVar(value=False)
+    normalise_svgs = tk.BooleanVar(value=False)
+
+    ttk.Checkbutton(frame_run, text="Generate language logos", variable=include_logos).grid(row=last_row + 4, sticky="w", padx=5)
+    ttk.Checkbutton(frame_run, text="Generate patches", variable=include_patches).grid(row=last_row + 5, sticky="w", padx=5)
+    ttk.Checkbutton(frame_run, text="Delete processing files (keep them only for debugging)", variable=delete_processing_files).grid(row=last_row + 6, sticky="w", padx=5)
+    ttk.Checkbutton(frame_run, text="Optimise .png files (smaller packages, slower export)", variable=optimise_pngs).grid(row=last_row + 7, sticky="w", padx=5)
+    ttk.Checkbutton(frame_run, text="Minify .layout files (smaller packages)", variable=minify_layouts).grid(row=last_row + 8, sticky="w", padx=5)
+    ttk.Checkbutton(frame_run, text="Render from normalised .svg files (faster exports after the first build)", variable=normalise_svgs).grid(row=last_row + 9, sticky="w", padx=5)
+
+    # Build settings from the current selections
+    def build_config(**settings):
+        return BuildConfig(
+            ui_path=base_path,
+            ui_name=entry_ui_name.get(),
+            colour_values=selected_colours(),
+            inkscape_path=inkscape_path,
+            preset=selected_option.get(),
+            run_logos=include_logos.get(),
+            run_patches=include_patches.get(),
+            keep_processing=not delete_processing_files.get(),
+            optimise_png=optimise_pngs.get(),
+            minify_layout=minify_layouts.get(),
+            normalise_svg=normalise_svgs.get(),
+        )._replace(**settings)
+
+    # Create UI and watch mode rebuilds write the same Creations folder, journal and console log, so they take turns
+    build_lock = threading.Lock()
 
     # Create UI 
     def on_create_ui():
 
         # Check that inputs are real hex codes etc
-        if not validate_all_inputs(input_ui_name = entry_ui_name, input_entries = entries):
+        if not validate_all_inputs(entry_ui_name.get(), selected_colours()):
             return  # Abort if invalid inputs    
         elif not ui_path.exists():        
             # If the Base UI folder does not exist, show warning box
             messagebox.showwarning("Missing Base UI", f"Base UI folder was not found. Please ensure the Base UI folder is in the same folder as Cloud UI Recolour Tool.exe")
         else:
-            # Grab required inputs for recolour function
-            replacements_svg, _, replacements_layout, input_values = colour_extractor(selected_option.get())
             # Log output for debugging
             log_file_path = base_path / "console_log.txt"
             log_file = log_file_path.resolve()
 
-            class Logger:
-                def __init__(self, path):
-                    self.file = open(path, "w", buffering=1)
-                def write(self, text):
-                    self.file.write(text)
-                def flush(self):
-                    self.file.flush()
-                def close(self):
-                    self.file.close()
-
-            def run_recolour_with_log(**kwargs):
-                logger = Logger(log_file)
-                original_stdout = sys.stdout
-                original_stderr = sys.stderr
-
-                try:
-                    sys.stdout = logger
-                    sys.stderr = logger
-                    run_recolour(**kwargs)  # your existing function call
-                finally:
-                    sys.stdout = original_stdout
-                    sys.stderr = original_stderr
-                    logger.close()
-            
-            # Run the main recolouring function
-            run_recolour_with_log(
-                ui_path=base_path,
-                ui_name=entry_ui_name.get(),
-                replacements_layout=replacements_layout,
-                replacements_svg=replacements_svg,
-                inkscape_path=inkscape_path,
-                colour_values=input_values,
-                run_logos=include_logos.get(),
-                run_patches=include_patches.get(),
-                run_processing=delete_processing_files.get()
+            # The build modules are only loaded once they're needed, which keeps startup quick
+            from build_journal import has_unfinished_build
+
+            # Offer to pick up where the last build of this UI stopped
+            resume = has_unfinished_build(base_path, entry_ui_name.get()) and messagebox.askyesno(
+                "Resume Build", "The last build of this UI did not finish. Do you want to continue where it stopped?"
+            )
+
+            # Waiting here for a watch mode rebuild would freeze the window with no message
+            if not build_lock.acquire(blocking=False):
+                messagebox.showinfo("Build Running", "A watch rebuild is running. Click Create UI again once it has finished.")
+                return
+            try:
+                with start_build_log(log_file):
+                    result = build_theme(build_config(resume=resume))
+            finally:
+                build_lock.release()
+
+            # Notify user if there are missing images even after re-exporting
+            if result.missing_files:
+                messagebox.showerror("Error", "Missing files:\n" + "\n".join(result.missing_files))
+
+            open_folder(result.ui_folder) # open UI folder
+
+            # Popup window to notify about completion
+            messagebox.showinfo(
+                "Done!",
+                f"A folder containing your custom UI and other helpful files has been opened for you. "
+                f"Copy the relevant .package files from this folder into your Mods folder.\n\n"
+                f"You can find all the custom UIs you've created by navigating to Cloud UI Recolour Tool > Creations.\n\n"
+                f"UI export completed in {format_elapsed(result.seconds)}."
             )
 
-    ttk.Button(frame_run, text="✨ Create UI ✨", command=on_create_ui, width=55).grid(
-        row=last_row + 6, column=0, columnspan=3, padx=5, pady=5, sticky="w"
+    create_button = ttk.Button(frame_run, text="✨ Create UI ✨", command=on_create_ui, width=55)
+    create_button.grid(row=last_row + 10, column=0, columnspan=3, padx=5, pady=5, sticky="w")
+
+    # Watch mode: rebuild the affected packages whenever a Base UI file is saved, using the selections from when it was started
+    watch_stop = []
+
+    # A rebuild under way when watching is stopped still runs to the end, so Create UI (and
+    # watching again) only come back once the watch thread has exited
+    def wait_for_watcher(thread):
+        if thread.is_alive():
+            root.after(200, wait_for_watcher, thread)
+            return
+        create_button.config(state="normal")
+        watch_button.config(state="normal", text="👀 Watch Base UI for changes 👀")
+
+    def on_watch():
+        if watch_stop:
+            stop, thread = watch_stop.pop()
+            stop.set()
+            create_button.config(state="disabled")
+            watch_button.config(state="disabled", text="⏳ Stopping watch mode ⏳")
+            wait_for_watcher(thread)
+            return
+        if not validate_all_inputs(entry_ui_name.get(), selected_colours()):
+            return
+        if not ui_path.exists():
+            messagebox.showwarning("Missing Base UI", "Base UI folder was not found. Please ensure the Base UI folder is in the same folder as Cloud UI Recolour Tool.exe")
+            return
+        log_file = (base_path / "console_log.txt").resolve()
+
+        from watch import start_watching
+
+        # Dev builds - compress quickly rather than small
+        config = build_config(incremental=True, compression="fast")
+
+        # Runs on the watch thread
+        def rebuild(run_main, run_logos, patches):
+            with build_lock, start_build_log(log_file):
+                build_theme(config._replace(
+                    run_main=run_main, run_logos=run_logos and config.run_logos,
+                    run_patches=config.run_patches and (patches is None or len(patches) > 0), patch_names=patches
+                ))
+
+        watch_stop.append(start_watching(ui_path, rebuild, build_first=True))
+        watch_button.config(text="⏹ Stop watching ⏹")
+
+    watch_button = ttk.Button(frame_run, text="👀 Watch Base UI for changes 👀", command=on_watch, width=55)
+    watch_button.grid(row=last_row + 11, column=0, columnspan=3, padx=5, pady=5, sticky="w")
+
+    # Browse the images in the packages of the last build of this UI
+    def on_browse_assets():
+        ui_folder = creations_path / entry_ui_name.get()
+        if not ui_folder.is_dir():
+            messagebox.showinfo("Nothing Built Yet", f"No build of {entry_ui_name.get()} was found in Creations. Click Create UI first.")
+            return
+        from manifest import load_manifest
+        from asset_browser import open_asset_browser
+        manifest = load_manifest(ui_path, cache_file=base_path / "Cache" / "base_ui_manifest.json")
+        open_asset_browser(root, ui_folder, manifest, base_path / "Cache" / "Thumbnails", inkscape_path)
+
+    ttk.Button(frame_run, text="🖼️ Browse built images 🖼️", command=on_browse_assets, width=55).grid(
+        row=last_row + 12, column=0, columnspan=3, padx=5, pady=5, sticky="w"
     )
 
-    ttk.Label(frame_run, text="Note: This tool will freeze once Create UI is clicked - this is normal, it is just generating the files in the background. A message will pop up once the UI packages have been generated.", wraplength=500).grid(row=last_row + 7, column=0, padx=5, pady=5, sticky="w")
+    ttk.Label(frame_run, text="Note: This tool will freeze once Create UI is clicked - this is normal, it is just generating the files in the background. A message will pop up once the UI packages have been generated.", wraplength=500).grid(row=last_row + 13, column=0, padx=5, pady=5, sticky="w")
     
     # --------------------------------- #
     # GUI RIGHT SIDE: UI preview image
@@ -567,4 +553,6 @@ def run_app(inkscape_path):
     frame_detailed.grid(sticky="ew")
     frame_run.grid(sticky="ew")
 
+    if launch_time is not None:
+        root.after_idle(lambda: log.info(f"Window ready {time.perf_counter() - launch_time:.2f} sec after launch"))
     root.mainloop()
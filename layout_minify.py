@@ -0,0 +1,78 @@
+import os
+import re
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from parallel_recolour import MIN_PARALLEL_BYTES
+
+# --------------------------------- #
+# Layout minification
+# .layout files are indented XML. The indentation, the line breaks between elements
+# and comments mean nothing to the game, but they make up a large part of every
+# layout and all of it has to be compressed, packaged and parsed. Minifying removes
+# them and leaves everything else alone: the BOM, the XML declaration, element text
+# and every attribute value stay exactly as they were. Each minified layout is parsed
+# and compared with the original, and a layout that doesn't compare equal is kept as it was.
+# --------------------------------- #
+
+COMMENT = re.compile(rb"<!--.*?-->", re.DOTALL)
+# Whitespace-only text between two tags ("<" can't appear in an attribute value), in two parts so that
+# whitespace that is all of an element's text stays - <x> </x> isn't the same as <x></x>
+BEFORE_TAG = re.compile(rb">\s+(?=<[^/])") # before a tag that isn't a closing tag
+BEFORE_CLOSING_TAG = re.compile(rb"(/>|</[^<>]*>)\s+(?=</)") # between the end of a child and its parent's closing tag
+BEFORE_EMPTY_TAG_END = re.compile(rb'(="[^"]*")\s+/>') # '<prop value="0" />' -> '<prop value="0"/>'
+
+def minify_layout(data):
+    data = COMMENT.sub(b"", data)
+    data = BEFORE_TAG.sub(b">", data)
+    data = BEFORE_CLOSING_TAG.sub(rb"\1", data)
+    return BEFORE_EMPTY_TAG_END.sub(rb"\1/>", data)
+
+def _is_text(text):
+    return bool(text) and not text.isspace()
+
+# Whether two layouts have the same elements in the same order, with the same attributes and text
+# Comments and the whitespace between element-only children - the parts minifying removes - don't count,
+# all other text has to match exactly
+def same_structure(original, minified):
+    try:
+        a, b = ET.fromstring(original), ET.fromstring(minified)
+    except ET.ParseError:
+        return False
+    for x, y in zip(a.iter(), b.iter()):
+        if x.tag != y.tag or x.attrib != y.attrib or len(x) != len(y):
+            return False
+        if not len(x):
+            if (x.text or "") != (y.text or ""):
+                return False
+            continue
+        # Its own text and the tails of its children, side by side
+        texts = [(x.text, y.text)] + [(cx.tail, cy.tail) for cx, cy in zip(x, y)]
+        element_only = not any(_is_text(t) or _is_text(u) for t, u in texts)
+        if not element_only and any((t or "") != (u or "") for t, u in texts):
+            return False
+    return True
+
+# Minified layout, or None if it doesn't have the same structure as the original
+def _minify_checked(data):
+    minified = minify_layout(data)
+    if minified == data:
+        return data
+    return minified if same_structure(data, minified) else None
+
+# Minify a {filename: layout bytes} dict, in a process pool when there's enough of them
+# Returns the minified dict, (bytes before, bytes after) and the names of layouts kept as they were because the check failed
+def minify_layouts(files, workers=None):
+    names = list(files)
+    if not names:
+        return {}, (0, 0), []
+    before = sum(len(files[name]) for name in names)
+    workers = min(workers or os.cpu_count() or 1, len(names))
+    if workers == 1 or before < MIN_PARALLEL_BYTES:
+        results = [_minify_checked(files[name]) for name in names]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_minify_checked, [files[name] for name in names]))
+    unverified = [name for name, result in zip(names, results) if result is None]
+    minified = {name: files[name] if result is None else result for name, result in zip(names, results)}
+    after = sum(len(data) for data in minified.values())
+    return minified, (before, after), unverified
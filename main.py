@@ -4,14 +4,21 @@
 # if inkscape path is found, open main app
 # if browse dialog returns succesful exe, open main app
 
+import time
+launch_time = time.perf_counter() # for measuring time to first window
+
 from pathlib import Path
+import multiprocessing
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import webbrowser
 import sv_ttk
-from utils import is_valid_inkscape
+from utils import is_valid_inkscape, inkscape_info
 import sys
 from gui import run_app
+from build_log import get_logger
+
+log = get_logger("main")
 
 # File paths
 if getattr(sys, 'frozen', False):
@@ -19,6 +26,9 @@ if getattr(sys, 'frozen', False):
 else:
     base_path = Path(__file__).parent # when running from .py
 
+# Inkscape checks are cached here, keyed on the exe's size and modified time
+inkscape_check_cache = base_path / "Cache" / "inkscape_check.json"
+
 # Return a valid path for inkscape.exe if it is found, otherwise return ""
 def valid_inkscape():
     # Check for previously saved path
@@ -27,24 +37,24 @@ def valid_inkscape():
         saved_path = prev_saved_path.read_text(encoding="utf-8").strip()   
         # If the path is a valid inkscape .exe, return path     
         if saved_path != "":
-            if is_valid_inkscape(saved_path) == True:
-                print("Valid saved inkscape path found, continuing to main app")
+            if is_valid_inkscape(saved_path, inkscape_check_cache) == True:
+                log.info("Valid saved inkscape path found, continuing to main app")
                 return saved_path   
             
     # Check common install locations for a valid path
-    print("No valid saved inkscape path found, checking common install locations")
+    log.info("No valid saved inkscape path found, checking common install locations")
     possible_paths = [
         r"C:\Program Files\Inkscape\bin\inkscape.exe",
         r"C:\Program Files (x86)\Inkscape\bin\inkscape.exe",
     ] 
     for path in possible_paths:
-        if is_valid_inkscape(path) == True:
+        if is_valid_inkscape(path, inkscape_check_cache) == True:
             # if it's a valid path, save the path to the main folder for later and return path
-            print("Valid inkscape location found, saving path to .txt and continuing to main app")
+            log.info("Valid inkscape location found, saving path to .txt and continuing to main app")
             settings_path = base_path / "inkscape_path.txt"
             settings_path.write_text(path)
             return path
-    print("No valid inkscape path found, opening inkscape dialog")
+    log.info("No valid inkscape path found, opening inkscape dialog")
     return "" # no valid path found
 
 def run_inkscape_dialog():
@@ -85,9 +95,9 @@ def run_inkscape_dialog():
 
     def on_continue():
         path = entry_inkscape.get().strip()
-        if is_valid_inkscape(path):
+        if is_valid_inkscape(path, inkscape_check_cache):
             # Save the valid path for later use
-            print("Valid inkscape location found, saving path to .txt and continuing to main app")
+            log.info("Valid inkscape location found, saving path to .txt and continuing to main app")
             settings_path = base_path / "inkscape_path.txt"
             settings_path.write_text(path)
 
@@ -103,8 +113,12 @@ def run_inkscape_dialog():
     inkscape_dialog.mainloop()
 
 if __name__ == "__main__":
+    # The png optimiser starts worker processes, which re-run the .exe when frozen
+    multiprocessing.freeze_support()
     path = valid_inkscape()
     if path == "":
         run_inkscape_dialog()
     else:
-        run_app(inkscape_path=path)
\ No newline at end of file
+        if not inkscape_info(path, inkscape_check_cache)["pipe"]:
+            log.warning("This version of Inkscape is too old to export from memory - Inkscape 1.0 or newer is needed")
+        run_app(inkscape_path=path, launch_time=launch_time)
\ No newline at end of file
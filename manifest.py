@@ -0,0 +1,164 @@
+import json
+import os
+import threading
+from collections import namedtuple
+from pathlib import Path
+from build_log import get_logger
+
+# --------------------------------- #
+# Base UI manifest
+# One os.scandir walk over Base UI that classifies every file by section and
+# resource type. The result is cached (in memory and on disk) and only rebuilt
+# when a directory's mtime changes, i.e. when files are added, removed or renamed.
+# --------------------------------- #
+
+log = get_logger("manifest")
+
+MANIFEST_VERSION = 1
+LOGOS_FOLDER = "Logos - All languages"
+PATCHES_FOLDER = "Patches"
+
+# Resource type for each extension the build uses
+RESOURCE_TYPES = {
+    ".svg": "svg",
+    ".layout": "layout",
+    ".xml": "text",
+    ".stbl": "text",
+    ".png": "png",
+}
+
+# One file in Base UI - size is as of the last scan, only used for planning (batching, partial renders)
+ManifestEntry = namedtuple("ManifestEntry", ["rel", "section", "kind", "resource_type", "size"])
+
+_memory_cache = {}
+_memory_lock = threading.Lock()
+
+# Work out which part of the build a file belongs to from its path relative to Base UI
+# kind is one of: main, logo_template, logo_non_english, logo_english, patch, patch_readme, version, other
+def classify(parts):
+    if parts[0] == PATCHES_FOLDER:
+        if len(parts) != 3: # only files directly inside a patch folder are used
+            return None, "other"
+        return parts[1], "patch_readme" if parts[2] == "Read me.txt" else "patch"
+    if len(parts) == 1:
+        return "", "version" if parts[0] == "CLOUD UI VERSION.txt" else "other"
+    section = parts[0]
+    if LOGOS_FOLDER in parts:
+        i = parts.index(LOGOS_FOLDER)
+        rest = parts[i + 1:]
+        if len(rest) == 1:
+            return section, "logo_template"
+        if rest[0] == "Non English Replacements":
+            return section, "logo_non_english"
+        if rest[0] == "English Replacements":
+            return section, "logo_english"
+        return section, "other"
+    return section, "main"
+
+class Manifest:
+    def __init__(self, root, entries, dir_mtimes):
+        self.root = Path(root)
+        self.entries = entries # list of ManifestEntry
+        self.dir_mtimes = dir_mtimes
+        self._sizes = {self.root / e.rel: e.size for e in entries}
+
+    # Entries matching the given filters, in a stable order
+    def select_entries(self, kind=None, resource_type=None, section=None):
+        return [
+            e for e in self.entries
+            if (kind is None or e.kind == kind)
+            and (resource_type is None or e.resource_type == resource_type)
+            and (section is None or e.section == section)
+        ]
+
+    # Same as select_entries, but as absolute paths
+    def select(self, kind=None, resource_type=None, section=None):
+        return [self.root / e.rel for e in self.select_entries(kind, resource_type, section)]
+
+    # Size in bytes of a file from the last scan
+    def size_of(self, path):
+        return self._sizes.get(Path(path), 0)
+
+    # Patch folder names in a stable order
+    def patches(self):
+        return sorted({e.section for e in self.entries if e.kind in ("patch", "patch_readme")})
+
+    def is_current(self):
+        for rel, mtime in self.dir_mtimes.items():
+            try:
+                if os.stat(self.root / rel).st_mtime_ns != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def to_json(self):
+        return {
+            "version": MANIFEST_VERSION,
+            "root": str(self.root),
+            "entries": [[e.rel.as_posix(), e.section, e.kind, e.resource_type, e.size] for e in self.entries],
+            "dir_mtimes": {rel.as_posix(): m for rel, m in self.dir_mtimes.items()},
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        if data.get("version") != MANIFEST_VERSION:
+            return None
+        entries = [ManifestEntry(Path(rel), sec, k, rtype, size) for rel, sec, k, rtype, size in data["entries"]]
+        dir_mtimes = {Path(rel): m for rel, m in data["dir_mtimes"].items()}
+        return cls(data["root"], entries, dir_mtimes)
+
+# Walk Base UI once with os.scandir
+def scan_base_ui(root):
+    root = Path(root)
+    entries = []
+    dir_mtimes = {Path("."): os.stat(root).st_mtime_ns}
+    stack = [(root, ())]
+    while stack:
+        folder, parts = stack.pop()
+        with os.scandir(folder) as it:
+            for entry in it:
+                entry_parts = parts + (entry.name,)
+                if entry.is_dir():
+                    dir_mtimes[Path(*entry_parts)] = entry.stat().st_mtime_ns
+                    stack.append((entry.path, entry_parts))
+                elif entry.is_file():
+                    section, kind = classify(entry_parts)
+                    rtype = RESOURCE_TYPES.get(os.path.splitext(entry.name)[1].lower(), "other")
+                    entries.append(ManifestEntry(Path(*entry_parts), section, kind, rtype, entry.stat().st_size))
+    entries.sort(key=lambda e: e.rel.as_posix())
+    return Manifest(root, entries, dir_mtimes)
+
+# Get the manifest for a Base UI folder, rescanning only if a directory changed
+# cache_file is optional - when given, the manifest is also kept between runs of the tool
+def load_manifest(root, cache_file=None):
+    root = Path(root)
+    key = str(root.resolve())
+    with _memory_lock:
+        manifest = _memory_cache.get(key)
+    if manifest is not None and manifest.is_current():
+        return manifest
+
+    if manifest is None and cache_file is not None and Path(cache_file).is_file():
+        try:
+            manifest = Manifest.from_json(json.loads(Path(cache_file).read_text(encoding="utf-8")))
+        except (ValueError, KeyError, TypeError):
+            manifest = None
+        if manifest is not None and (manifest.root != root or not manifest.is_current()):
+            manifest = None
+        if manifest is not None:
+            log.info("- Loaded cached Base UI manifest")
+
+    if manifest is None or not manifest.is_current():
+        log.info("- Scanning Base UI folder")
+        manifest = scan_base_ui(root)
+        if cache_file is not None:
+            Path(cache_file).parent.mkdir(parents=True, exist_ok=True)
+            # Written next to the cache and moved into place, so builds running at the same time never read half of it
+            tmp = Path(f"{cache_file}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(json.dumps(manifest.to_json()), encoding="utf-8")
+            tmp.replace(cache_file)
+
+    with _memory_lock:
+        _memory_cache[key] = manifest
+    return manifest
@@ -0,0 +1,55 @@
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+import tracing
+from utils import compile_replacements, recolour_text
+
+# --------------------------------- #
+# Parallel recolouring
+# Recolouring is pure regex work, so it's spread over a process pool. Files are
+# grouped into batches of about the same total size, biggest files first, and each
+# worker compiles the replacement table once when it starts. Small jobs stay in this
+# process - starting workers would take longer than the recolouring itself.
+# --------------------------------- #
+
+MIN_PARALLEL_BYTES = 8 * 1024 * 1024 # below this much text the files are recoloured here
+BATCHES_PER_WORKER = 4 # more batches than workers, so a worker that finishes early picks up another
+
+_replacements = None
+
+def _init_worker(replacements):
+    global _replacements
+    _replacements = replacements
+    compile_replacements(replacements)
+
+def _recolour_batch(paths):
+    return [recolour_text(path, _replacements) for path in paths]
+
+# Split paths into up to count batches of about the same total size
+# Each file goes into the batch with the least work so far, biggest files first
+def batch_by_size(paths, sizes, count):
+    heap = [(0, i, []) for i in range(max(1, count))]
+    for size, path in sorted(zip(sizes, paths), key=lambda item: item[0], reverse=True):
+        total, i, batch = heapq.heappop(heap)
+        batch.append(path)
+        heapq.heappush(heap, (total + size, i, batch))
+    return [batch for _, _, batch in sorted(heap, key=lambda item: item[1]) if batch]
+
+# Recolour files and return their text in the same order as paths
+def recolour_many(paths, replacements, workers=None):
+    paths = list(paths)
+    if not paths:
+        return []
+    sizes = [os.path.getsize(path) for path in paths]
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    if workers == 1 or sum(sizes) < MIN_PARALLEL_BYTES:
+        return [recolour_text(path, replacements) for path in paths]
+
+    batches = batch_by_size(paths, sizes, workers * BATCHES_PER_WORKER)
+    with tracing.span("recolour pool", files=len(paths), workers=workers):
+        texts = {}
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(replacements,)) as pool:
+            for batch, results in zip(batches, pool.map(_recolour_batch, batches)):
+                texts.update(zip(batch, results))
+        tracing.count(bytes_in=sum(sizes), bytes_out=sum(len(text) for text in texts.values()))
+    return [texts[path] for path in paths]
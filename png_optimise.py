@@ -0,0 +1,117 @@
+import os
+import sys
+import zlib
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from png_utils import encode_png, read_png
+
+# --------------------------------- #
+# Lossless PNG optimisation
+# Inkscape writes every image as 8-bit RGBA with default compression. Most UI assets
+# have few colours, no transparency or no colour at all, so re-encoding them as a
+# palette, RGB or greyscale image with the best row filter is a lot smaller.
+# Pixels are never changed - only how they are stored.
+# --------------------------------- #
+
+# Row filter strategies tried for every candidate encoding
+FILTER_STRATEGIES = (0, 1, 2, 3, "adaptive")
+
+# Pack one byte per sample into 1, 2 or 4 bits per sample
+def _pack_row(indices, bit_depth):
+    if bit_depth == 8:
+        return bytes(indices)
+    per_byte = 8 // bit_depth
+    padded = bytes(indices) + bytes(-len(indices) % per_byte)
+    value = 0
+    for k in range(per_byte):
+        # Take every per_byte'th sample and shift it into its place in the byte
+        value |= int.from_bytes(padded[k::per_byte], "big") << (bit_depth * (per_byte - 1 - k))
+    return value.to_bytes(len(padded) // per_byte, "big")
+
+# Palette encoding for images with 256 colours or less, transparent entries first so tRNS stays short
+def _palette_candidate(width, pixels):
+    colours = set(array("I", bytes(pixels)))
+    if len(colours) > 256:
+        return None
+    colours = sorted(colours, key=lambda c: (c.to_bytes(4, sys.byteorder)[3] == 255, c))
+    entries = [c.to_bytes(4, sys.byteorder) for c in colours]
+    index_of = {c: i for i, c in enumerate(colours)}
+    bit_depth = next(d for d in (1, 2, 4, 8) if len(colours) <= 1 << d)
+    values = array("I", bytes(pixels))
+    rows = []
+    for y in range(len(values) // width):
+        rows.append(_pack_row([index_of[c] for c in values[y * width:(y + 1) * width]], bit_depth))
+    palette = b"".join(e[:3] for e in entries)
+    transparency = bytes(e[3] for e in entries if e[3] != 255)
+    return 3, bit_depth, rows, {"palette": palette, "transparency": transparency}
+
+# The smallest lossless colour type for the image, plus a palette version if it has few colours
+def _candidates(width, height, pixels):
+    stride = width * 4
+    red, green, blue, alpha = (pixels[c::4] for c in range(4))
+    opaque = alpha.count(255) == len(alpha)
+    grey = red == green == blue
+    if grey and opaque:
+        colour_type, channels = 0, [red]
+    elif grey:
+        colour_type, channels = 4, [red, alpha]
+    elif opaque:
+        colour_type, channels = 2, [red, green, blue]
+    else:
+        colour_type, channels = 6, None
+
+    if channels is None:
+        rows = [bytes(pixels[y * stride:(y + 1) * stride]) for y in range(height)]
+    else:
+        interleaved = bytearray(width * height * len(channels))
+        for c, channel in enumerate(channels):
+            interleaved[c::len(channels)] = channel
+        row_size = width * len(channels)
+        rows = [bytes(interleaved[y * row_size:(y + 1) * row_size]) for y in range(height)]
+    candidates = [(colour_type, 8, rows, {})]
+
+    palette = _palette_candidate(width, pixels)
+    if palette is not None:
+        candidates.append(palette)
+    return candidates
+
+# Re-encode a PNG and return the smallest of the tried encodings, or the original if nothing beats it
+# PNGs the reader doesn't support are returned unchanged
+def optimise_png(data):
+    try:
+        width, height, pixels = read_png(data)
+    except (ValueError, zlib.error):
+        return data
+    if width == 0 or height == 0:
+        return data
+
+    best = data
+    for colour_type, bit_depth, rows, extra in _candidates(width, height, pixels):
+        encoded = {
+            strategy: encode_png(width, height, colour_type, bit_depth, rows, strategy, **extra)
+            for strategy in FILTER_STRATEGIES
+        }
+        strategy = min(encoded, key=lambda s: len(encoded[s]))
+        # Z_FILTERED sometimes does better on filtered rows
+        filtered = encode_png(width, height, colour_type, bit_depth, rows, strategy, zlib_strategy=zlib.Z_FILTERED, **extra)
+        for result in (encoded[strategy], filtered):
+            if len(result) < len(best):
+                best = result
+    return best
+
+# Optimise a {filename: png bytes} dict in a process pool
+# Returns the optimised dict and (bytes before, bytes after)
+def optimise_pngs(files, workers=None):
+    names = list(files)
+    if not names:
+        return {}, (0, 0)
+    workers = min(workers or os.cpu_count() or 1, len(names))
+    if workers == 1:
+        results = [optimise_png(files[name]) for name in names]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(optimise_png, [files[name] for name in names]))
+    optimised = dict(zip(names, results))
+    before = sum(len(files[name]) for name in names)
+    after = sum(len(data) for data in results)
+    return optimised, (before, after)
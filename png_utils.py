@@ -0,0 +1,250 @@
+import struct
+import zlib
+from functools import lru_cache
+
+# --------------------------------- #
+# Minimal PNG reading & writing
+# Only what the tool needs: non-interlaced 8-bit greyscale/RGB/RGBA (what Inkscape exports)
+# and palette images, which the png optimiser can write
+# --------------------------------- #
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Samples per pixel for each colour type
+CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+# Split PNG bytes into a list of (chunk type, chunk data)
+def read_chunks(data):
+    if data[:8] != PNG_SIGNATURE:
+        raise ValueError("Invalid PNG: bad signature")
+    chunks = []
+    pos = 8
+    while pos < len(data):
+        length, chunk_type = struct.unpack(">I4s", data[pos:pos + 8])
+        chunks.append((chunk_type, data[pos + 8:pos + 8 + length]))
+        pos += 12 + length
+        if chunk_type == b"IEND":
+            break
+    return chunks
+
+# Pack a single chunk with its length and CRC
+def pack_chunk(chunk_type, chunk_data):
+    crc = zlib.crc32(chunk_type + chunk_data) & 0xFFFFFFFF
+    return struct.pack(">I", len(chunk_data)) + chunk_type + chunk_data + struct.pack(">I", crc)
+
+# Paeth predictor from the PNG spec
+def _paeth(a, b, c):
+    p = a + b - c
+    pa = abs(p - a)
+    pb = abs(p - b)
+    pc = abs(p - c)
+    if pa <= pb and pa <= pc:
+        return a
+    if pb <= pc:
+        return b
+    return c
+
+# Undo the per-row filter of a scanline
+def _unfilter_row(filter_type, row, prev, bpp):
+    if filter_type == 0:
+        return row
+    if filter_type == 2:
+        return bytearray((a + b) & 0xFF for a, b in zip(row, prev))
+    out = bytearray(row)
+    if filter_type == 1:
+        for i in range(bpp, len(out)):
+            out[i] = (out[i] + out[i - bpp]) & 0xFF
+    elif filter_type == 3:
+        for i in range(len(out)):
+            left = out[i - bpp] if i >= bpp else 0
+            out[i] = (out[i] + ((left + prev[i]) >> 1)) & 0xFF
+    elif filter_type == 4:
+        for i in range(len(out)):
+            if i >= bpp:
+                out[i] = (out[i] + _paeth(out[i - bpp], prev[i], prev[i - bpp])) & 0xFF
+            else:
+                out[i] = (out[i] + prev[i]) & 0xFF
+    else:
+        raise ValueError(f"Invalid PNG: unknown filter type {filter_type}")
+    return out
+
+# Split packed 1, 2 or 4 bit samples into one byte each, using a translate table per position in the byte
+@lru_cache(maxsize=None)
+def _unpack_tables(bit_depth):
+    mask = (1 << bit_depth) - 1
+    return [bytes((b >> (8 - bit_depth * (k + 1))) & mask for b in range(256)) for k in range(8 // bit_depth)]
+
+def _unpack_samples(row, bit_depth, count):
+    if bit_depth == 8:
+        return bytes(row[:count])
+    tables = _unpack_tables(bit_depth)
+    out = bytearray(len(row) * len(tables))
+    for k, table in enumerate(tables):
+        out[k::len(tables)] = row.translate(table)
+    return bytes(out[:count])
+
+# Decode a PNG into (width, height, RGBA pixel bytearray)
+# Rows written by write_png are unfiltered, so re-reading them is just a decompress
+def read_png(data):
+    width = height = None
+    idat = []
+    palette = transparency = None
+    for chunk_type, chunk_data in read_chunks(data):
+        if chunk_type == b"IHDR":
+            width, height, bit_depth, colour_type, _, _, interlace = struct.unpack(">IIBBBBB", chunk_data)
+            low_depth_ok = colour_type in (0, 3) and bit_depth in (1, 2, 4)
+            if colour_type not in CHANNELS or (bit_depth != 8 and not low_depth_ok) or interlace != 0:
+                raise ValueError(f"Unsupported PNG format (bit depth {bit_depth}, colour type {colour_type}, interlace {interlace})")
+        elif chunk_type == b"PLTE":
+            palette = chunk_data
+        elif chunk_type == b"tRNS":
+            transparency = chunk_data
+        elif chunk_type == b"IDAT":
+            idat.append(chunk_data)
+    if width is None:
+        raise ValueError("Invalid PNG: missing IHDR")
+    if colour_type == 3 and palette is None:
+        raise ValueError("Invalid PNG: missing PLTE")
+    if transparency is not None and colour_type in (0, 2):
+        raise ValueError("Unsupported PNG format (colour key transparency)")
+
+    raw = zlib.decompress(b"".join(idat))
+    channels = CHANNELS[colour_type]
+    bpp = max(1, channels * bit_depth // 8)
+    stride = (width * channels * bit_depth + 7) // 8
+    if colour_type == 3:
+        # One translate table per output channel, indexed by palette entry
+        entries = len(palette) // 3
+        alpha = (transparency or b"") + b"\xff" * (256 - len(transparency or b""))
+        lookups = [bytes(palette[i * 3 + c] if i < entries else 0 for i in range(256)) for c in range(3)] + [alpha[:256]]
+    elif colour_type == 0 and bit_depth != 8:
+        scale = bytes(v * 255 // ((1 << bit_depth) - 1) if v < (1 << bit_depth) else 0 for v in range(256))
+    pixels = bytearray()
+    prev = bytearray(stride)
+    pos = 0
+    for _ in range(height):
+        row = _unfilter_row(raw[pos], raw[pos + 1:pos + 1 + stride], prev, bpp)
+        pos += stride + 1
+        prev = row
+        if colour_type == 6:
+            pixels += row
+            continue
+        # Expand to RGBA
+        rgba = bytearray(width * 4)
+        if colour_type == 2:
+            rgba[0::4] = row[0::3]
+            rgba[1::4] = row[1::3]
+            rgba[2::4] = row[2::3]
+            rgba[3::4] = b"\xff" * width
+        elif colour_type == 4:
+            rgba[0::4] = rgba[1::4] = rgba[2::4] = row[0::2]
+            rgba[3::4] = row[1::2]
+        elif colour_type == 0:
+            grey = _unpack_samples(row, bit_depth, width)
+            if bit_depth != 8:
+                grey = grey.translate(scale)
+            rgba[0::4] = rgba[1::4] = rgba[2::4] = grey
+            rgba[3::4] = b"\xff" * width
+        else:
+            indices = _unpack_samples(row, bit_depth, width)
+            for c, lookup in enumerate(lookups):
+                rgba[c::4] = indices.translate(lookup)
+        pixels += rgba
+    return width, height, pixels
+
+# Encode RGBA pixels as a PNG (filter type 0 on every row)
+def write_png(width, height, pixels, level=6):
+    stride = width * 4
+    raw = bytearray()
+    for y in range(height):
+        raw += b"\x00"
+        raw += pixels[y * stride:(y + 1) * stride]
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return (
+        PNG_SIGNATURE
+        + pack_chunk(b"IHDR", ihdr)
+        + pack_chunk(b"IDAT", zlib.compress(bytes(raw), level))
+        + pack_chunk(b"IEND", b"")
+    )
+
+# Copy a smaller RGBA image into a larger one at (left, top)
+def paste_pixels(dest, dest_width, src, src_width, src_height, left, top):
+    src_stride = src_width * 4
+    dest_stride = dest_width * 4
+    for y in range(src_height):
+        d = (top + y) * dest_stride + left * 4
+        s = y * src_stride
+        dest[d:d + src_stride] = src[s:s + src_stride]
+
+# --------------------------------- #
+# Row filters for encoding
+# Filters work on whole rows at once as big integers (bytewise subtract and average
+# without carries between bytes), so encoding stays fast in pure Python.
+# Paeth needs a per-byte choice and isn't used for encoding.
+# --------------------------------- #
+
+ENCODE_FILTERS = (0, 1, 2, 3)
+
+@lru_cache(maxsize=64)
+def _masks(length):
+    full = (1 << (8 * length)) - 1
+    high = int.from_bytes(b"\x80" * length, "big")
+    no_low_bit = int.from_bytes(b"\xfe" * length, "big")
+    return full, high, full ^ high, no_low_bit
+
+# (a - b) mod 256 for every byte
+def _bytewise_sub(a, b):
+    full, high, low, _ = _masks(len(a))
+    x = int.from_bytes(a, "big")
+    y = int.from_bytes(b, "big")
+    return ((((x | high) - (y & low)) ^ ((x ^ y ^ full) & high)) & full).to_bytes(len(a), "big")
+
+# floor((a + b) / 2) for every byte
+def _bytewise_avg(a, b):
+    _, _, _, no_low_bit = _masks(len(a))
+    x = int.from_bytes(a, "big")
+    y = int.from_bytes(b, "big")
+    return ((x & y) + (((x ^ y) & no_low_bit) >> 1)).to_bytes(len(a), "big")
+
+def _filter_row(filter_type, row, prev, bpp):
+    if filter_type == 0 or not row:
+        return row
+    if filter_type == 2:
+        return _bytewise_sub(row, prev)
+    left = bytes(bpp) + row[:-bpp]
+    if filter_type == 1:
+        return _bytewise_sub(row, left)
+    return _bytewise_sub(row, _bytewise_avg(left, prev))
+
+# Signed magnitude of each filtered byte, for picking a filter per row
+_ABS_TABLE = bytes(min(b, 256 - b) for b in range(256))
+
+# Filter every scanline with one filter type, or with "adaptive" pick the filter per row
+# that gives the smallest sum of absolute values (the heuristic from the PNG spec)
+def filter_rows(rows, bpp, strategy):
+    out = bytearray()
+    prev = bytes(len(rows[0])) if rows else b""
+    for row in rows:
+        if strategy == "adaptive":
+            options = [(f, _filter_row(f, row, prev, bpp)) for f in ENCODE_FILTERS]
+            filter_type, filtered = min(options, key=lambda o: sum(o[1].translate(_ABS_TABLE)))
+        else:
+            filter_type, filtered = strategy, _filter_row(strategy, row, prev, bpp)
+        out.append(filter_type)
+        out += filtered
+        prev = row
+    return bytes(out)
+
+# Encode already packed scanlines (bytes per row) as a PNG
+def encode_png(width, height, colour_type, bit_depth, rows, strategy=0, level=9, zlib_strategy=zlib.Z_DEFAULT_STRATEGY, palette=None, transparency=None):
+    bpp = max(1, CHANNELS[colour_type] * bit_depth // 8)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 15, 9, zlib_strategy)
+    idat = compressor.compress(filter_rows(rows, bpp, strategy)) + compressor.flush()
+    ihdr = struct.pack(">IIBBBBB", width, height, bit_depth, colour_type, 0, 0, 0)
+    chunks = [pack_chunk(b"IHDR", ihdr)]
+    if palette is not None:
+        chunks.append(pack_chunk(b"PLTE", palette))
+    if transparency:
+        chunks.append(pack_chunk(b"tRNS", transparency))
+    chunks += [pack_chunk(b"IDAT", idat), pack_chunk(b"IEND", b"")]
+    return PNG_SIGNATURE + b"".join(chunks)
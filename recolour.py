@@ -1,311 +1,446 @@
-import os
 import re
 import shutil
 import time
-from concurrent.futures import ThreadPoolExecutor
-from itertools import repeat
-from tkinter import messagebox
-from utils import recolour_files, export_png, get_png_dimensions, save_choices
-from dbpf_writer_lib import create_dbpf_package, read_resources
-
-def run_recolour(ui_path, ui_name, replacements_layout, replacements_svg, inkscape_path, colour_values, run_logos, run_patches, run_processing):
-    print("# ----- Starting recolour.py script ----- #")
+from pathlib import Path
+import tracing
+import tool_runner
+from build_log import get_logger
+from utils import get_png_dimensions, save_choices, save_files
+from dbpf_writer_lib import (
+    CompressionCache, create_dbpf_package, hold_codec_pool, release_codec_pool, reproducible_timestamp, resources_from_files
+)
+from atlas_regions import is_partial_candidate, plan_partial_render, render_png_planned
+from manifest import load_manifest
+from renderers import get_renderer
+from build_journal import BuildJournal, journal_folder, package_digest
+from png_optimise import optimise_pngs
+from layout_minify import minify_layouts
+from svg_normalise import open_normalised_svgs
+from build import BuildResult, format_elapsed
+
+log = get_logger("recolour")
+
+# Re-encode the rendered pngs in files (name -> bytes) as small as possible, in place
+def optimise_png_files(files):
+    pngs = {name: data for name, data in files.items() if name.lower().endswith(".png") and isinstance(data, bytes)}
+    with tracing.span("optimise pngs"):
+        optimised, (before, after) = optimise_pngs(pngs)
+        tracing.count(bytes_in=before, bytes_out=after)
+    files.update(optimised)
+    if before:
+        log.info(f"- Optimised {len(pngs)} png(s): saved {(before - after) / 1024:.0f} KB ({(before - after) / before:.0%})")
+
+# Strip the whitespace and comments from the recoloured layouts in files (name -> bytes), in place
+def minify_layout_files(files):
+    layouts = {name: data for name, data in files.items() if name.lower().endswith(".layout") and isinstance(data, bytes)}
+    with tracing.span("minify layouts"):
+        minified, (before, after), unverified = minify_layouts(layouts)
+        tracing.count(bytes_in=before, bytes_out=after)
+    files.update(minified)
+    for name in unverified:
+        log.warning(f"- {name} changed structure when minified, keeping it as it was")
+    if before:
+        log.info(f"- Minified {len(layouts)} layout(s): saved {(before - after) / 1024:.0f} KB ({(before - after) / before:.0%})")
+
+# Package files (name -> bytes or source path), unless a resumed build already wrote the same package
+# Every package this build produces is added to built, so old ones can be cleared up afterwards
+def write_package(journal, output_package_file, files, compression_cache, timestamp, built, compression="auto"):
+    built.add(output_package_file)
+    input_hash = package_digest(files)
+    if journal.package_done(output_package_file, input_hash):
+        log.info(f"- {output_package_file.name} was already written before the build stopped")
+        return
+    _, output_hash = create_dbpf_package(output_package_file, resources_from_files(files), compression_cache, timestamp, compression=compression, return_digest=True)
+    journal.record_package(output_package_file, input_hash, output_hash)
+
+# Empty the output folder from a previous build, except its packages
+# Those stay until the new ones are built, so packages that haven't changed don't need rewriting
+def clear_previous_output(folder):
+    for path in sorted(folder.rglob("*"), key=lambda p: len(p.parts), reverse=True):
+        if path.is_dir():
+            if not any(path.iterdir()):
+                path.rmdir()
+        elif path.suffix != ".package":
+            path.unlink()
+
+# Remove packages left over from a previous build that this one didn't produce
+def remove_stale_packages(folder, built):
+    for package in folder.rglob("*.package"):
+        if package not in built:
+            log.info(f"- Removing old package {package.name}")
+            package.unlink()
+
+def run_recolour(ui_path, ui_name, replacements_layout, replacements_svg, inkscape_path, colour_values, run_logos, run_patches, run_processing, run_partial=True, optimise_png=False, renderer="inkscape", resume=False, reproducible=False, run_main=True, patch_names=None, incremental=False, trace_memory=False, render_workers=(), compression="auto", minify_layout=False, normalise_svg=False):
+    log.info("# ----- Starting recolour.py script ----- #")
 
     start = time.time()
+    tracer = tracing.start(trace_memory=trace_memory)
+    hold_codec_pool()
+    # The tracer is stopped and the compression processes let go however the build ends - build service
+    # threads run one build after another
+    try:
+        tracing.begin_stage("Setup")
+
+        # Required file paths
+        input_path = ui_path / "Base UI"
+        ui_folder = ui_path / "Creations" / ui_name
+        processing_folder = ui_folder / "Processing"
+        svg_path = processing_folder / "SVG Files"
+        output_path = processing_folder / "Output Files"
+        language_logos = processing_folder / "Language Logos"
+        language_custom_svg = language_logos / "SVG Custom Replacements"
+        language_english_svg = language_logos / "SVG English Replacements"
+        language_png = language_logos / "PNG"
+        logo_packages = ui_folder / "Non English Logo Packages"
+        patches_processing = processing_folder / "Patches"
+        patches_output = ui_folder / "Patches"
+        atlas_cache = ui_path / "Cache" / "Atlas Renders"
+        manifest_cache = ui_path / "Cache" / "base_ui_manifest.json"
+        compression_cache = CompressionCache(ui_path / "Cache" / "Compressed Resources")
+        renderer_conformance = ui_path / "Cache" / "renderer_conformance.json"
+
+        # Files are recoloured, rendered and packaged in memory
+        # The Processing folder is only written when it's kept for debugging
+        keep_processing = not run_processing
+
+        # Finished jobs are journalled so a build that dies can be resumed
+        # A resumed build keeps what the last one already wrote, otherwise only the old packages are kept for comparison
+        # Incremental builds (watch mode) only update the sections they're asked to, reusing the journal of the last build
+        journal = BuildJournal(journal_folder(ui_path, ui_name), resume=resume or incremental)
+        if not (resume or incremental) and ui_folder.exists() and ui_folder.is_dir():
+            clear_previous_output(ui_folder)
+        built_packages = set()
+        missing_files = []
 
-    # Required file paths
-    input_path = ui_path / "Base UI"
-    ui_folder = ui_path / "Creations" / ui_name
-    processing_folder = ui_folder / "Processing"
-    svg_path = processing_folder / "SVG Files"
-    output_path = processing_folder / "Output Files"
-    language_logos = processing_folder / "Language Logos"
-    language_custom_svg = language_logos / "SVG Custom Replacements"
-    language_english_svg = language_logos / "SVG English Replacements"
-    language_png = language_logos / "PNG"
-    logo_packages = ui_folder / "Non English Logo Packages"
-    patches_input = input_path / "Patches"
-    patches_processing = processing_folder / "Patches"
-    patches_output = ui_folder / "Patches"
-
-    # Remove folder if it already exists
-    if ui_folder.exists() and ui_folder.is_dir():
-        shutil.rmtree(ui_folder)
-
-    # Create missing folders
-    for p in [ui_folder, processing_folder, svg_path, output_path, language_logos, language_custom_svg, language_english_svg, language_png, patches_processing]:
-        p.mkdir(parents=True, exist_ok=True)
-
-    # Save colour choices to output file
-    print("- Saving Colour_Selections.txt")
-    save_choices(choices=colour_values, location=ui_folder)
+        # Create missing folders
+        ui_folder.mkdir(parents=True, exist_ok=True)
+
+        # Save colour choices to output file
+        log.info("- Saving Colour_Selections.txt")
+        save_choices(choices=colour_values, location=ui_folder)
+
+        # svg to png renderer for this run - Inkscape unless another one was asked for
+        log.info(f"- Rendering with {renderer}")
+        renderer = get_renderer(renderer, inkscape_path, renderer_conformance, render_workers)
+
+        # Export through the journal, so a resumed build reuses the pngs rendered before it stopped
+        def export(key, svg_text, name):
+            return journal.export(key, svg_text, renderer.name, lambda: renderer.render(svg_text, name))
+
+        # Scan Base UI once - every section below picks its files from this manifest
+        manifest = load_manifest(input_path, cache_file=manifest_cache)
+
+        # Reproducible builds stamp packages with a time taken from the sources instead of the current time,
+        # so the same Base UI and colours always give the same bytes
+        package_timestamp = reproducible_timestamp(manifest.select()) if reproducible else None
+
+        # svgs are recoloured and rendered from normalised copies without Inkscape's editor data, once each copy
+        # has been checked to render the same as its original - only new or changed svgs are normalised again
+        source = Path
+        if normalise_svg:
+            tracing.begin_stage("Normalise svgs")
+            normalised_svgs = open_normalised_svgs(ui_path, manifest)
+            normalised_svgs.prepare(manifest.select(resource_type="svg"), renderer)
+            source = normalised_svgs.source
     
-    # --------------------------------- #
-    # MAIN UI
-    # --------------------------------- #
-
-    if True:
-        print("# ----- Running main UI section ----- #")
-        # Grab all .layo, .xml, .stbl and .svg file paths
-        text_files = list(input_path.rglob("*.xml")) + list(input_path.rglob("*.stbl"))
-        layout_files = [f for f in input_path.rglob("*.layout") if "Logos - All languages" not in f.parts and "Patches" not in f.parts] 
-        svg_files = [f for f in input_path.rglob("*.svg") if "Logos - All languages" not in f.parts and "Patches" not in f.parts]   
-
-        # Grab the Base UI version number
-        print("- Loading base UI verison number")
-        cloudUI_version_path = input_path / "CLOUD UI VERSION.txt"
-        if cloudUI_version_path.is_file():
-            cloudUI_version = cloudUI_version_path.read_text(encoding="utf-8").strip()
-        else:
-            print("Version file not found")
-            cloudUI_version = ""
-
-        # Copy XML/STBL if needed
-        print("- Copying .xml and .stbl files")
-        for f in text_files:
-            dest = output_path / f.name
-            if not dest.exists() or f.stat().st_mtime > dest.stat().st_mtime:
-                shutil.copy(f, dest)   
+        # --------------------------------- #
+        # MAIN UI
+        # --------------------------------- #
+
+        if run_main:
+            log.info("# ----- Running main UI section ----- #")
+            # Grab all .layo, .xml, .stbl and .svg file paths
+            text_files = manifest.select(kind="main", resource_type="text")
+            layout_files = manifest.select(kind="main", resource_type="layout")
+            svg_files = manifest.select(kind="main", resource_type="svg")
+
+            # Grab the Base UI version number
+            log.info("- Loading base UI verison number")
+            cloudUI_version_files = manifest.select(kind="version")
+            if cloudUI_version_files:
+                cloudUI_version = cloudUI_version_files[0].read_text(encoding="utf-8").strip()
+            else:
+                log.warning("Version file not found")
+                cloudUI_version = ""
+
+            # Everything that goes into the package, by file name
+            package_files = {}
+
+            # XML/STBL are never changed, so they are streamed into the package from Base UI
+            log.info("- Adding .xml and .stbl files")
+            tracing.begin_stage("Main UI: add xml/stbl")
+            for f in text_files:
+                package_files[f.name] = f
         
-        # Recolour and copy .layout files
-        print("- Recolouring .layout files")
-        for layout in layout_files:
-            recolour_files(layout, replacements_layout, output_path / layout.name)     
-
-        # Recolour svg and store them in svg folder
-        print("- Recolouring .svg files")
-        for svg in svg_files:
-            recolour_files(svg, replacements_svg, svg_path / svg.name) 
+            # Recolour .layout files
+            log.info("- Recolouring .layout files")
+            tracing.begin_stage("Main UI: recolour layouts")
+            for layout, text in zip(layout_files, journal.recolour_many(layout_files, replacements_layout)):
+                package_files[layout.name] = text.encode("utf-8")
+
+            # Recolour svg and keep them in memory for rendering
+            # Large atlas sheets also get a partial render plan: the ids of the sprites whose colours change
+            log.info("- Recolouring .svg files")
+            tracing.begin_stage("Main UI: recolour svgs")
+            svg_texts = {} # files with the same name overwrite each other
+            partial_plans = {}
+            svg_sources = [source(svg) for svg in svg_files]
+            for svg, svg_source, text in zip(svg_files, svg_sources, journal.recolour_many(svg_sources, replacements_svg)):
+                svg_texts[svg.name] = text
+                if run_partial and renderer.uses_inkscape(svg.name) and is_partial_candidate(svg, manifest.size_of(svg)):
+                    changed_ids = plan_partial_render(svg_source.read_text(encoding="utf-8"), replacements_svg)
+                    if changed_ids is not None:
+                        partial_plans[svg.name] = (svg_source, changed_ids)
+            if keep_processing:
+                save_files(svg_path, {name: text.encode("utf-8") for name, text in svg_texts.items()})
         
-        # Export svg to png
-        print("- Exporting .png files")
-        svg_files = list(svg_path.glob("*.svg"))
-        png_paths = [output_path / svg.with_suffix(".png").name for svg in svg_files]
-
-        with ThreadPoolExecutor() as executor:
-            executor.map(export_png, repeat(inkscape_path), svg_files, png_paths)    
-
-        # Occasionally an export from svg to png can fail
-        # Identify missing .pngs and export them again
-        input_svg_files = [f for f in svg_path.rglob("*.svg") if "Logos - All languages" not in f.parts and "Patches" not in f.parts]   
-        input_svg_files = [f.stem for f in input_svg_files]
-
-        output_png_files = [f for f in output_path.rglob("*.png") if "Language Logos" not in f.parts]   
-        output_png_files = [f.stem for f in output_png_files]
-
-        # Missing png files
-        for filename in input_svg_files:
-            if filename not in output_png_files:
-                print("- Error exporting " + filename + " from .svg to .png. Attempting to re-export.")
-                missing_input = svg_path / (filename + ".svg")
-                missing_output = output_path / (filename + ".png")
-                export_png(inkscape_path, missing_input, missing_output)
-
-        output_png_files = [f for f in output_path.rglob("*.png") if "Language Logos" not in f.parts]   
-        output_png_files = [f.stem for f in output_png_files]
-
-        # Notify user if there are still missing images even after re-exporting
-        missing_files = [f for f in input_svg_files if f not in output_png_files]
-        if len(missing_files)>0:
-            missing_str = "\n".join(missing_files)
-            messagebox.showerror("Error", f"Missing files:\n{missing_str}")
-        else:
-            print("- No missing output files identified")
-
-        # Create .package file
-        print("- Generating UI .package file")
-        resource_data = read_resources(output_path)
-        output_package_file = ui_folder / f"{ui_name.replace(" ", "")}_CloudUI{cloudUI_version}.package"
-
-        try:    
-            create_dbpf_package(output_package_file, resource_data)
-        except Exception as e:    
-            print(f"\n!!! An error occurred during package creation: {e}")
-
-    # --------------------------------- #
-    # LANGUAGE LOGOS
-    # Used in the startup loading screen in non-English games
-    # --------------------------------- #
-
-    if run_logos==True:
-
-        print("# ----- Running language logos section ----- #")
-
-        # Create missing folders
-        for p in [logo_packages]:
-            p.mkdir(parents=True, exist_ok=True)
-
-        # Logos: Non-English Replacements
-        customReplacements_path = input_path / "Loading Screen - Startup/Logos - All languages/Non English Replacements"
-        svg_files_customReplacements = list(customReplacements_path.rglob("*.svg"))
-
-        # Logos: English Replacements - png files
-        englishReplacements_path = input_path / "Loading Screen - Startup/Logos - All languages/English Replacements"
-        englishReplacements = list(englishReplacements_path.rglob("*.png"))
-
-        # Logos: English Replacements - svg template files
-        englishReplacementsTemplates_path = input_path / "Loading Screen - Startup/Logos - All languages"
-        englishReplacementsTemplates = list(englishReplacementsTemplates_path.glob("*.svg"))
-
-        # Recolour english replacement templates
-        print("- Recolouring english replacement language logos")
-        englishReplacements_path_outputs = language_english_svg
-        for svg in englishReplacementsTemplates:
-            recolour_files(svg, replacements_svg, englishReplacements_path_outputs / svg.name) 
-
-        # Export templates to png
-        print("- Exporting to .png")
-        png_output_path = language_png
-        svg_files = list(englishReplacements_path_outputs.glob("*.svg"))
-        png_paths = [englishReplacements_path_outputs / svg.with_suffix(".png").name for svg in svg_files]
-
-        with ThreadPoolExecutor() as executor:
-            executor.map(export_png, repeat(inkscape_path), svg_files, png_paths)  
-
-        # Match english logos to correct png size and copy with new file name
-        print("- Recolouring english language logos")
-        for original_logo in englishReplacements:
-            w, h = get_png_dimensions(original_logo)
-            match_name = f"Logo_{w}x{h}.png"
-            match_path = englishReplacements_path_outputs / match_name
-            if match_path.exists():
-                shutil.copy(match_path, png_output_path / original_logo.name)
-
-        # Recolour all Non English replacements
-        print("- Recoluring custom language logos")
-        customReplacements_path_outputs = language_custom_svg
-        for svg in svg_files_customReplacements:
-            recolour_files(svg, replacements_svg, customReplacements_path_outputs / svg.name) 
-
-        # Export svg to png
-        print("- Exporting custom language logos to .png")
-        png_output_path = language_png
-        svg_files = list(customReplacements_path_outputs.glob("*.svg"))
-        png_paths = [png_output_path / svg.with_suffix(".png").name for svg in svg_files]
-
-        with ThreadPoolExecutor() as executor:
-            executor.map(export_png, repeat(inkscape_path), svg_files, png_paths)  
-
-        # Create .package files
-        print("- Generating langauge logo .package files")
-
-        # Collect all language codes, e.g. de_de
-        pattern = re.compile(r"_([a-z]{2}_[a-z]{2})%%\+IMAG\.png$", re.IGNORECASE)
-        language_codes = set()
-        for file in language_png.glob("*.png"):
-            match = pattern.search(file.name)
-            if match:
-                language_codes.add(match.group(1).lower())
-
-        # Create a package file for each language
-        for lang_code in sorted(language_codes):
-            images = [f for f in language_png.iterdir() if f.is_file() and lang_code in f.name]
-
-            # create temp folder to store images in
-            p = processing_folder / "temp"
-            p.mkdir(parents=True, exist_ok=True)
-
-            # copy files into temp folder
-            for image_file in images:
-                shutil.copy(image_file, p)
-            
-            resource_data = read_resources(p)
-            output_package_file = logo_packages / f"{ui_name.replace(" ", "")}_languageLogos_{lang_code}.package"
+            # Render svg to png
+            log.info("- Exporting .png files")
+            tracing.begin_stage("Main UI: export png")
+            log.info(f"- {len(partial_plans)} atlas sheet(s) planned for partial rendering")
+            svg_names = list(svg_texts)
+            plans = [partial_plans.get(name) for name in svg_names]
+
+            # Every render is queued at once - tool_runner decides how many inkscape processes actually run
+            rendered = dict(zip(svg_names, tool_runner.gather_sync(
+                journal.export(
+                    "main/" + name, svg_texts[name], renderer.name,
+                    lambda name=name, plan=plan: render_png_planned(renderer, svg_texts[name], name, plan, atlas_cache)
+                ) for name, plan in zip(svg_names, plans)
+            )))
+
+            # Occasionally an export from svg to png can fail
+            tracing.begin_stage("Main UI: re-export missing")
+            # Identify missing .pngs and export them again
+            missing_names = [name for name, png_data in rendered.items() if png_data is None]
+            for name in missing_names:
+                log.warning("- Error exporting " + Path(name).stem + " from .svg to .png. Attempting to re-export.")
+            rendered.update(zip(missing_names, tool_runner.gather_sync(
+                export("main/" + name, svg_texts[name], name) for name in missing_names
+            )))
+
+            # Report images that are still missing even after re-exporting
+            missing_files = [Path(name).stem for name, png_data in rendered.items() if png_data is None]
+            if len(missing_files)>0:
+                missing_str = "\n".join(missing_files)
+                log.error(f"- Missing files:\n{missing_str}")
+            else:
+                log.info("- No missing output files identified")
+
+            for name, png_data in rendered.items():
+                if png_data is not None:
+                    package_files[Path(name).with_suffix(".png").name] = png_data
+            if optimise_png:
+                log.info("- Optimising .png files")
+                tracing.begin_stage("Main UI: optimise png")
+                optimise_png_files(package_files)
+            if minify_layout:
+                log.info("- Minifying .layout files")
+                tracing.begin_stage("Main UI: minify layouts")
+                minify_layout_files(package_files)
+            if keep_processing:
+                save_files(output_path, package_files)
+
+            # Create .package file
+            log.info("- Generating UI .package file")
+            tracing.begin_stage("Main UI: package")
+            output_package_file = ui_folder / f"{ui_name.replace(" ", "")}_CloudUI{cloudUI_version}.package"
 
             try:    
-                create_dbpf_package(output_package_file, resource_data)
+                write_package(journal, output_package_file, package_files, compression_cache, package_timestamp, built_packages, compression)
             except Exception as e:    
-                print(f"\n!!! An error occurred during package creation: {e}")
-
-            shutil.rmtree(p) # delete folder when done
-
-    # --------------------------------- #
-    # COMPATIBILITY PATCHES
-    # Optional patches to add/remove elements from cloud UI
-    # --------------------------------- #
-
-    if run_patches==True:
-
-        print("# ----- Running compatibility patches section ----- #")
-
-        # Create missing folders
-        for p in [patches_output]:
-            p.mkdir(parents=True, exist_ok=True)
-
-        # For each patch in the Base UI/Patches folder, copy and recolour everything and generate a .package
-        available_patches = [p for p in patches_input.iterdir() if p.is_dir()]
-        for patch in available_patches:   
-
-            # create matching folders in Processing/Patches/Patch Name AND Creations/UI Name/Patches/Patch Name
-            folder_name = patch.name
-            print("- Creating patch for: " + folder_name)
-            folder_processing = patches_processing / folder_name
-            folder_output = patches_output / folder_name
-            folder_processing.mkdir(parents=True, exist_ok=True)
-            folder_output.mkdir(parents=True, exist_ok=True)
-
-            # Copy readme file to output folder if it exists
-            print("- Copying readme file if it exists")
-            patch_readme = patch / "Read me.txt"
-            if patch_readme.exists():
-                destination_folder = folder_output / "Read me.txt"
-                shutil.copy(patch_readme, destination_folder)
-
-            # Copy other files to processing folder if any exist
-            print("- Copying other files if they exist, e.g. not .svg or .layout")
-            patch_other_files = [
-                f for f in patch.iterdir()    
-                if f.is_file() and f.suffix not in [".svg", ".layout"] and f.name != "Read me.txt"]
+                log.error(f"!!! An error occurred during package creation: {e}", exc_info=True)
+
+        # --------------------------------- #
+        # LANGUAGE LOGOS
+        # Used in the startup loading screen in non-English games
+        # --------------------------------- #
+
+        if run_logos==True:
+
+            log.info("# ----- Running language logos section ----- #")
+
+            # Create missing folders
+            for p in [logo_packages]:
+                p.mkdir(parents=True, exist_ok=True)
+
+            # Logos: Non-English Replacements
+            svg_files_customReplacements = manifest.select(kind="logo_non_english", resource_type="svg")
+
+            # Logos: English Replacements - png files
+            englishReplacements = manifest.select(kind="logo_english", resource_type="png")
+
+            # Logos: English Replacements - svg template files
+            englishReplacementsTemplates = manifest.select(kind="logo_template", resource_type="svg")
+
+            # Recolour english replacement templates
+            log.info("- Recolouring english replacement language logos")
+            tracing.begin_stage("Logos: recolour templates")
+            template_texts = dict(zip(
+                (svg.name for svg in englishReplacementsTemplates), journal.recolour_many([source(svg) for svg in englishReplacementsTemplates], replacements_svg)
+            ))
+
+            # Render templates to png
+            log.info("- Exporting to .png")
+            tracing.begin_stage("Logos: export templates")
+            template_pngs = dict(zip(
+                (Path(name).with_suffix(".png").name for name in template_texts),
+                tool_runner.gather_sync(export("logos/" + name, text, name) for name, text in template_texts.items())
+            ))
+            if keep_processing:
+                save_files(language_english_svg, {name: text.encode("utf-8") for name, text in template_texts.items()})
+                save_files(language_english_svg, {name: data for name, data in template_pngs.items() if data is not None})
+
+            # Every logo png by file name
+            logo_files = {}
+
+            # Match english logos to correct png size and copy with new file name
+            log.info("- Recolouring english language logos")
+            for original_logo in englishReplacements:
+                w, h = get_png_dimensions(original_logo)
+                match_name = f"Logo_{w}x{h}.png"
+                if template_pngs.get(match_name) is not None:
+                    logo_files[original_logo.name] = template_pngs[match_name]
+
+            # Recolour all Non English replacements
+            log.info("- Recoluring custom language logos")
+            tracing.begin_stage("Logos: recolour custom")
+            custom_texts = dict(zip(
+                (svg.name for svg in svg_files_customReplacements), journal.recolour_many([source(svg) for svg in svg_files_customReplacements], replacements_svg)
+            ))
+            if keep_processing:
+                save_files(language_custom_svg, {name: text.encode("utf-8") for name, text in custom_texts.items()})
+
+            # Render svg to png
+            log.info("- Exporting custom language logos to .png")
+            tracing.begin_stage("Logos: export custom")
+            custom_pngs = tool_runner.gather_sync(export("logos/" + name, text, name) for name, text in custom_texts.items())
+            for name, png_data in zip(custom_texts, custom_pngs):
+                if png_data is not None:
+                    logo_files[Path(name).with_suffix(".png").name] = png_data
+            if optimise_png:
+                log.info("- Optimising .png files")
+                tracing.begin_stage("Logos: optimise png")
+                optimise_png_files(logo_files)
+            if keep_processing:
+                save_files(language_png, logo_files)
+
+            # Create .package files
+            log.info("- Generating langauge logo .package files")
+            tracing.begin_stage("Logos: package")
+
+            # Collect all language codes, e.g. de_de
+            pattern = re.compile(r"_([a-z]{2}_[a-z]{2})%%\+IMAG\.png$", re.IGNORECASE)
+            language_codes = set()
+            for name in logo_files:
+                match = pattern.search(name)
+                if match:
+                    language_codes.add(match.group(1).lower())
+
+            # Create a package file for each language
+            for lang_code in sorted(language_codes):
+                images = {name: data for name, data in logo_files.items() if lang_code in name}
+                output_package_file = logo_packages / f"{ui_name.replace(" ", "")}_languageLogos_{lang_code}.package"
+
+                try:    
+                    write_package(journal, output_package_file, images, compression_cache, package_timestamp, built_packages, compression)
+                except Exception as e:    
+                    log.error(f"!!! An error occurred during package creation: {e}", exc_info=True)
+
+        # --------------------------------- #
+        # COMPATIBILITY PATCHES
+        # Optional patches to add/remove elements from cloud UI
+        # --------------------------------- #
+
+        if run_patches==True:
+
+            log.info("# ----- Running compatibility patches section ----- #")
+
+            # Create missing folders
+            for p in [patches_output]:
+                p.mkdir(parents=True, exist_ok=True)
+
+            # For each patch in the Base UI/Patches folder, copy and recolour everything and generate a .package
+            available_patches = [p for p in manifest.patches() if patch_names is None or p in patch_names]
+            for folder_name in available_patches:   
+
+                # create matching folder in Creations/UI Name/Patches/Patch Name
+                log.info("- Creating patch for: " + folder_name)
+                tracing.begin_stage("Patch: " + folder_name)
+                folder_output = patches_output / folder_name
+                folder_output.mkdir(parents=True, exist_ok=True)
+                patch_files = {}
+
+                # Copy readme file to output folder if it exists
+                log.info("- Copying readme file if it exists")
+                for patch_readme in manifest.select(kind="patch_readme", section=folder_name):
+                    destination_folder = folder_output / "Read me.txt"
+                    shutil.copy(patch_readme, destination_folder)
+
+                # Add other files if any exist
+                log.info("- Copying other files if they exist, e.g. not .svg or .layout")
+                patch_other_files = [
+                    f for f in manifest.select(kind="patch", section=folder_name)
+                    if f.suffix not in [".svg", ".layout"]]
             
-            for file in patch_other_files:
-                if file.exists():
-                    destination_folder = folder_processing / file.name
-                    shutil.copy(file, destination_folder)
-
-            # Recolour the layo files
-            print("- Recolouring .layout files")
-            patch_layo_files = [f for f in patch.glob("*.layout")]
-            for layout in patch_layo_files:
-                recolour_files(layout, replacements_layout, folder_processing / layout.name) 
-
-            # Recolour and export the svg files
-            print("- Recolouring and exporting .svg files")
-            patch_svg_files = [f for f in patch.glob("*.svg")]
-            for svg in patch_svg_files:
-                patch_svg_path = folder_processing / svg.name
-                recolour_files(svg, replacements_svg, patch_svg_path) 
-                export_png(inkscape_path, patch_svg_path, patch_svg_path.with_suffix(".png"))
-                patch_svg_path.unlink(missing_ok=True)
-
-            # Grab all the patch files in processing and export package
-            print("- Generate patch .package")
-            resource_data = read_resources(folder_processing)
-            output_package_file = folder_output / f"addon_{ui_name.replace(" ", "")}_{folder_name.replace(" ", "")}.package"
-
-            try:    
-                create_dbpf_package(output_package_file, resource_data)
-            except Exception as e:    
-                print(f"\n!!! An error occurred during package creation: {e}")
-
-    print("# ----- Export(s) completed ----- #")
-    if run_processing==True:
-        shutil.rmtree(processing_folder) # delete folder when done
+                for file in patch_other_files:
+                    patch_files[file.name] = file
+
+                # Recolour the layo files
+                log.info("- Recolouring .layout files")
+                patch_layo_files = manifest.select(kind="patch", resource_type="layout", section=folder_name)
+                for layout, text in zip(patch_layo_files, journal.recolour_many(patch_layo_files, replacements_layout)):
+                    patch_files[layout.name] = text.encode("utf-8")
+
+                # Recolour and export the svg files
+                log.info("- Recolouring and exporting .svg files")
+                patch_svg_files = manifest.select(kind="patch", resource_type="svg", section=folder_name)
+                patch_svg_texts = dict(zip(
+                    (svg.name for svg in patch_svg_files), journal.recolour_many([source(svg) for svg in patch_svg_files], replacements_svg)
+                ))
+                patch_pngs = tool_runner.gather_sync(
+                    export(f"patches/{folder_name}/{name}", text, name) for name, text in patch_svg_texts.items()
+                )
+                for name, png_data in zip(patch_svg_texts, patch_pngs):
+                    if png_data is not None:
+                        patch_files[Path(name).with_suffix(".png").name] = png_data
+                if optimise_png:
+                    optimise_png_files(patch_files)
+                if minify_layout:
+                    minify_layout_files(patch_files)
+                if keep_processing:
+                    save_files(patches_processing / folder_name, patch_files)
+
+                # Package all the patch files
+                log.info("- Generate patch .package")
+                output_package_file = folder_output / f"addon_{ui_name.replace(" ", "")}_{folder_name.replace(" ", "")}.package"
+
+                try:    
+                    write_package(journal, output_package_file, patch_files, compression_cache, package_timestamp, built_packages, compression)
+                except Exception as e:    
+                    log.error(f"!!! An error occurred during package creation: {e}", exc_info=True)
+
+        if not incremental:
+            remove_stale_packages(ui_folder, built_packages)
+        log.info("# ----- Export(s) completed ----- #")
+        if journal.reused:
+            log.info(f"- {journal.reused} job(s) reused from the build journal")
+        journal.finish(keep=incremental)
+
+        # Save per-stage timings next to Colour_Selections.txt
+        tracer.write_reports(ui_folder)
+    finally:
+        release_codec_pool()
+        tracing.stop()
+    for stage in tracer.summary()["stages"]:
+        log.info(f"- {stage['stage']}: {stage['wall_seconds']:.1f} sec ({stage['subprocess_seconds']:.1f} sec in external tools)")
     
-    # Popup window to notify about completion
     elapsed = time.time() - start
-    minutes, seconds = divmod(elapsed, 60)
-
-    if minutes >= 1:
-        elapsed_str = f"{int(minutes)} min {int(seconds)} sec"
-    else:
-        elapsed_str = f"{int(seconds)} sec"
-
-    os.startfile(ui_folder) # open UI folder
-
-    messagebox.showinfo(
-        "Done!",
-        f"A folder containing your custom UI and other helpful files has been opened for you. "
-        f"Copy the relevant .package files from this folder into your Mods folder.\n\n"
-        f"You can find all the custom UIs you've created by navigating to Cloud UI Recolour Tool > Creations.\n\n"
-        f"UI export completed in {elapsed_str}."
+    log.info(f"- UI export completed in {format_elapsed(elapsed)}")
+    return BuildResult(
+        ui_folder=ui_folder,
+        packages=sorted(built_packages),
+        missing_files=missing_files,
+        reused_jobs=journal.reused,
+        seconds=elapsed,
     )
@@ -0,0 +1,95 @@
+import argparse
+import json
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import unquote
+import tool_runner
+from build_log import get_logger
+from utils import inkscape_info, render_png_async
+
+# --------------------------------- #
+# Render worker
+# Lets another machine take a share of a build's svg exports. A build started with
+# the "remote" renderer sends recoloured svgs here and gets pngs back, spread over
+# every worker it was given (see RemoteRenderer in renderers.py). Renders run through
+# tool_runner, so a worker never runs more Inkscape processes than it has cores.
+#
+# Usage:
+#   python render_worker.py --inkscape /usr/bin/inkscape --host 0.0.0.0 --port 8766
+#
+#   GET  /health   {"capacity": renders at once, "inkscape": version}
+#   POST /render   svg in the body (X-Svg-Name header for logs) -> png, or 422 if Inkscape rendered nothing
+# --------------------------------- #
+
+log = get_logger("render_worker")
+
+DEFAULT_PORT = 8766
+MAX_SVG_BYTES = 256 * 1024 * 1024
+
+class RenderWorkerHandler(BaseHTTPRequestHandler):
+    server_version = "CloudUIRenderWorker/1.0"
+
+    def log_message(self, format, *args):
+        pass # every render would log a line - failures are logged below instead
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/health":
+            return self._send(404, "text/plain", b"Not found")
+        health = {"capacity": tool_runner.LIMITS["inkscape"], "inkscape": self.server.inkscape_version}
+        self._send(200, "application/json", json.dumps(health).encode("utf-8"))
+
+    def do_POST(self):
+        if self.path != "/render":
+            return self._send(404, "text/plain", b"Not found")
+        length = int(self.headers.get("Content-Length", 0))
+        if length > MAX_SVG_BYTES:
+            return self._send(413, "text/plain", b"svg too large")
+        name = unquote(self.headers.get("X-Svg-Name", "svg"))
+        try:
+            svg_text = self.rfile.read(length).decode("utf-8")
+        except UnicodeDecodeError:
+            return self._send(400, "text/plain", b"svg must be utf-8")
+        png = tool_runner.run_sync(render_png_async(self.server.inkscape_path, svg_text, name))
+        if png is None:
+            log.warning(f"- Nothing rendered for {name}")
+            return self._send(422, "text/plain", b"Inkscape did not render a png")
+        self._send(200, "image/png", png)
+
+def serve(inkscape_path, host="127.0.0.1", port=DEFAULT_PORT, cache_file=None):
+    server = ThreadingHTTPServer((host, port), RenderWorkerHandler)
+    server.daemon_threads = True
+    server.inkscape_path = inkscape_path
+    server.inkscape_version = inkscape_info(inkscape_path, cache_file)["version"]
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Render svg files for builds running on other machines")
+    parser.add_argument("--inkscape", required=True, help="path to inkscape")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (0.0.0.0 to let other machines in)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--cache", type=Path, default=Path(__file__).resolve().parent / "Cache" / "inkscape_check.json")
+    args = parser.parse_args()
+
+    if not inkscape_info(args.inkscape, args.cache)["pipe"]:
+        print("This Inkscape can't export from memory - Inkscape 1.0 or newer is needed")
+        return 1
+    server = serve(args.inkscape, args.host, args.port, args.cache)
+    print(f"Render worker listening on {args.host}:{server.server_address[1]}, {tool_runner.LIMITS['inkscape']} render(s) at once")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+import asyncio
+import json
+import time
+from pathlib import Path
+from urllib.parse import quote
+import tool_runner
+import tracing
+from build_log import get_logger
+from png_utils import PNG_SIGNATURE
+from utils import EXPORT_RETRIES, render_png_async
+
+# --------------------------------- #
+# SVG renderers
+# A renderer turns svg text into png bytes. Inkscape is the reference renderer.
+# cairosvg renders in-process (no process start per file) when it's installed, and
+# "auto" only uses it for the files the conformance check found to match Inkscape
+# (see benchmarks/renderer_conformance.py), with Inkscape for everything else.
+# "remote" sends every render to render workers on other machines (render_worker.py).
+# --------------------------------- #
+
+log = get_logger("renderers")
+
+RENDERERS = ("inkscape", "cairosvg", "auto", "remote")
+
+REMOTE_ATTEMPTS = 3 # workers a render is tried on before falling back to local Inkscape
+WORKER_RETRY_SECONDS = 30 # how long a worker that failed is left alone before it's tried again
+NETWORK_SECONDS = 10 # added to a remote render's timeout for the transfer
+
+class InkscapeRenderer:
+    name = "inkscape"
+
+    def __init__(self, inkscape_path):
+        self.inkscape_path = inkscape_path
+
+    # Whether name is rendered by Inkscape, i.e. whether partial atlas renders can be used for it
+    def uses_inkscape(self, name):
+        return True
+
+    # Returns None if nothing was rendered
+    async def render(self, svg_text, name="svg"):
+        return await render_png_async(self.inkscape_path, svg_text, name)
+
+class CairoSvgRenderer:
+    name = "cairosvg"
+
+    def __init__(self, inkscape_path=None):
+        try:
+            import cairosvg
+        except ImportError:
+            raise RuntimeError("cairosvg is not installed (pip install cairosvg)") from None
+        self._svg2png = cairosvg.svg2png
+        self.inkscape_path = inkscape_path
+
+    def uses_inkscape(self, name):
+        return False
+
+    async def render(self, svg_text, name="svg"):
+        with tracing.span("cairosvg " + name):
+            try:
+                png = await asyncio.to_thread(self._svg2png, bytestring=svg_text.encode("utf-8"))
+            except Exception as e:
+                log.warning(f"- cairosvg could not render {name}: {e}")
+                return None
+            tracing.count(bytes_in=len(svg_text), bytes_out=len(png))
+        return png if png.startswith(PNG_SIGNATURE) else None
+
+# cairosvg for the files known to match Inkscape, Inkscape for the rest
+# A failed cairosvg render falls back to Inkscape too
+class AutoRenderer:
+    name = "auto"
+
+    def __init__(self, inkscape_path, matching):
+        self.inkscape = InkscapeRenderer(inkscape_path)
+        self.fast = CairoSvgRenderer(inkscape_path)
+        self.inkscape_path = inkscape_path
+        self.matching = set(matching)
+
+    def uses_inkscape(self, name):
+        return name not in self.matching
+
+    async def render(self, svg_text, name="svg"):
+        if not self.uses_inkscape(name):
+            png = await self.fast.render(svg_text, name)
+            if png is not None:
+                return png
+        return await self.inkscape.render(svg_text, name)
+
+# One HTTP/1.0 request on the tool loop - returns (status, body)
+# Raises OSError, ValueError or asyncio.TimeoutError if the worker can't be reached or answers nonsense
+async def _http_request(host, port, method, path, body=b"", headers=None, timeout=None):
+    async def exchange():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            head = f"{method} {path} HTTP/1.0\r\nHost: {host}:{port}\r\nContent-Length: {len(body)}\r\n"
+            head += "".join(f"{key}: {value}\r\n" for key, value in (headers or {}).items())
+            writer.write(head.encode("latin-1") + b"\r\n" + body)
+            await writer.drain()
+            response = await reader.read() # the worker closes the connection after each response
+        finally:
+            writer.close()
+        status_line, _, rest = response.partition(b"\r\n")
+        _, _, data = rest.partition(b"\r\n\r\n")
+        parts = status_line.split(b" ", 2)
+        if len(parts) < 2 or not parts[0].startswith(b"HTTP/"):
+            raise ValueError(f"not an HTTP response from {host}:{port}")
+        return int(parts[1]), data
+    return await asyncio.wait_for(exchange(), timeout)
+
+class RenderWorker:
+    def __init__(self, address):
+        host, _, port = address.rpartition(":")
+        if not host or not port.isdigit():
+            raise ValueError(f"Render worker address should be host:port, got {address}")
+        self.address = address
+        self.host = host
+        self.port = int(port)
+        self.capacity = None # renders it takes at once, asked for the first time it's used
+        self.active = 0
+        self.probing = False # a health check is on its way, made outside RemoteRenderer's lock
+        self.down_until = 0.0
+
+    def is_up(self):
+        return time.monotonic() >= self.down_until
+
+    def mark_down(self, reason):
+        self.capacity = None # asked again when it comes back, it may have restarted with other settings
+        self.down_until = time.monotonic() + WORKER_RETRY_SECONDS
+        log.warning(f"- Render worker {self.address} is unavailable ({reason}), retrying it in {WORKER_RETRY_SECONDS} sec")
+
+    async def probe(self):
+        try:
+            status, data = await _http_request(self.host, self.port, "GET", "/health", timeout=NETWORK_SECONDS)
+            if status != 200:
+                raise ValueError(f"health check returned {status}")
+            self.capacity = max(1, int(json.loads(data)["capacity"]))
+        except (OSError, ValueError, KeyError, TypeError, asyncio.TimeoutError) as e:
+            self.mark_down(e)
+
+    # png bytes, or None if the worker rendered nothing or turned the svg down - that's the same
+    # svg on any worker, so it's the final answer. Other errors, 5xx included, raise ValueError.
+    async def render(self, svg_data, name, timeout):
+        status, data = await _http_request(
+            self.host, self.port, "POST", "/render", svg_data,
+            {"Content-Type": "image/svg+xml", "X-Svg-Name": quote(name)}, timeout
+        )
+        if status in (400, 413, 422):
+            return None
+        if status != 200 or not data.startswith(PNG_SIGNATURE):
+            raise ValueError(f"render returned {status}")
+        return data
+
+# Spreads renders over render workers, each taking as many at once as it has Inkscape slots
+# A render whose worker fails or disappears is tried on another one, and a worker that failed
+# is skipped for a while. When no worker can take it, the render falls back to local Inkscape.
+# An svg a worker turned down or rendered nothing from isn't tried again anywhere.
+class RemoteRenderer:
+    name = "remote"
+
+    def __init__(self, workers, inkscape_path=None):
+        self.workers = [RenderWorker(address) for address in workers]
+        if not self.workers:
+            raise RuntimeError("The remote renderer needs at least one render worker (host:port)")
+        self.inkscape_path = inkscape_path
+        self.local = InkscapeRenderer(inkscape_path) if inkscape_path else None
+        self._changed = None # asyncio.Condition, made on the tool loop
+        self._probes = set() # health checks under way, kept so they aren't garbage collected
+
+    # Atlas sheets are rendered whole by the workers, so partial renders are never used
+    def uses_inkscape(self, name):
+        return False
+
+    # A worker with a free slot, least busy first, waiting for one if they're all busy
+    # Returns None if every worker not in exclude is down
+    async def _acquire(self, exclude):
+        if self._changed is None:
+            self._changed = asyncio.Condition()
+        async with self._changed:
+            while True:
+                # Workers seen for the first time or back after failing are asked how much they take
+                for worker in self.workers:
+                    if worker not in exclude and worker.is_up() and worker.capacity is None and not worker.probing:
+                        worker.probing = True
+                        task = asyncio.create_task(self._probe(worker))
+                        self._probes.add(task)
+                        task.add_done_callback(self._probes.discard)
+                candidates = [w for w in self.workers if w not in exclude and w.is_up() and w.capacity is not None]
+                free = [w for w in candidates if w.active < w.capacity]
+                if free:
+                    worker = min(free, key=lambda w: w.active / w.capacity)
+                    worker.active += 1
+                    return worker
+                if not candidates and not any(w not in exclude and w.probing for w in self.workers):
+                    return None
+                await self._changed.wait()
+
+    # Health checks run outside the lock, so a worker that doesn't answer only holds up
+    # the renders that have no other worker to go to
+    async def _probe(self, worker):
+        try:
+            await worker.probe()
+        finally:
+            worker.probing = False
+            async with self._changed:
+                self._changed.notify_all()
+
+    async def _release(self, worker):
+        async with self._changed:
+            worker.active -= 1
+            self._changed.notify_all()
+
+    async def render(self, svg_text, name="svg"):
+        svg_data = svg_text.encode("utf-8")
+        # The worker may retry a hung export with double the timeout, so allow for every attempt
+        timeout = sum(tool_runner.adaptive_timeout("inkscape", len(svg_data)) * 2 ** n for n in range(EXPORT_RETRIES + 1))
+        tried = set()
+        for _ in range(REMOTE_ATTEMPTS):
+            worker = await self._acquire(tried)
+            if worker is None:
+                break
+            tried.add(worker)
+            try:
+                with tracing.span("remote " + name, "subprocess", worker=worker.address):
+                    png = await worker.render(svg_data, name, timeout + NETWORK_SECONDS)
+                    tracing.count(bytes_in=len(svg_data), bytes_out=len(png or b""))
+            except (OSError, ValueError, asyncio.TimeoutError) as e:
+                worker.mark_down(str(e) or type(e).__name__)
+                continue
+            finally:
+                await self._release(worker)
+            if png is None:
+                log.warning(f"- Render worker {worker.address} could not render {name}")
+            return png
+        if self.local is None:
+            log.warning(f"- No render worker could render {name}")
+            return None
+        log.warning(f"- No render worker could render {name}, rendering it here")
+        return await self.local.render(svg_text, name)
+
+# Names of the svg files that cairosvg renders the same as Inkscape, from a conformance report
+def load_conformance(report_file):
+    try:
+        report = json.loads(Path(report_file).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return set()
+    return set(report.get("matching", []))
+
+# Get a renderer by name - "auto" quietly becomes Inkscape if cairosvg isn't installed
+# or no conformance report has been made yet, render_workers (host:port) are for "remote"
+def get_renderer(name, inkscape_path, conformance_file=None, render_workers=()):
+    if name == "inkscape":
+        return InkscapeRenderer(inkscape_path)
+    if name == "cairosvg":
+        return CairoSvgRenderer(inkscape_path)
+    if name == "auto":
+        matching = load_conformance(conformance_file) if conformance_file is not None else set()
+        try:
+            renderer = AutoRenderer(inkscape_path, matching)
+        except RuntimeError:
+            log.info("- cairosvg is not installed, rendering with Inkscape")
+            return InkscapeRenderer(inkscape_path)
+        log.info(f"- {len(matching)} svg file(s) will be rendered in-process")
+        return renderer
+    if name == "remote":
+        renderer = RemoteRenderer(render_workers or (), inkscape_path)
+        log.info(f"- Rendering on {len(renderer.workers)} render worker(s)")
+        return renderer
+    raise ValueError(f"Unknown renderer: {name} (expected one of {', '.join(RENDERERS)})")
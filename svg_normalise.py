@@ -0,0 +1,190 @@
+import argparse
+import asyncio
+import json
+import sys
+import os
+import re
+import shutil
+import threading
+import zlib
+from pathlib import Path
+import tracing
+from build_log import get_logger
+from png_utils import read_png
+
+# --------------------------------- #
+# Normalised svg sources
+# Base UI svgs are saved by Inkscape with everything the editor needs to reopen them:
+# the namedview (zoom, window size, guides), inkscape:/sodipodi: attributes on every
+# element, comments, and filters and clip paths nothing uses any more. None of it
+# changes what is rendered, but Inkscape parses all of it on every export of every
+# theme. Each Base UI version is normalised once into Cache/Normalised SVG/<version>,
+# and recolouring and exporting read from there instead. A normalised file is only
+# used once a render of it has been found pixel-identical to a render of the original.
+#
+# Builds with normalise_svg=True run the pass for any svgs that need it; to run it ahead of time:
+#   python svg_normalise.py --inkscape /usr/bin/inkscape
+# --------------------------------- #
+
+log = get_logger("svg_normalise")
+
+INDEX_VERSION = 1
+
+COMMENT = re.compile(r"<!--.*?-->", re.DOTALL)
+
+# Elements only the editor reads
+EDITOR_ELEMENTS = ("sodipodi:namedview", "metadata", "inkscape:path-effect", "inkscape:perspective")
+EDITOR_ELEMENT = re.compile(r"\s*<(%s)\b[^>]*?(?:/>|>.*?</\1\s*>)" % "|".join(map(re.escape, EDITOR_ELEMENTS)), re.DOTALL)
+
+# Editor attributes - the export dpi hints are kept, Inkscape reads them when exporting
+EDITOR_ATTRIBUTE = re.compile(r'\s+(?:inkscape|sodipodi):([\w.-]+)="[^"]*"')
+KEPT_ATTRIBUTES = {"export-xdpi", "export-ydpi"}
+
+# Elements that are never drawn themselves, only through a reference to their id
+# (patterns and symbols are left alone, they can contain elements with the same tag)
+UNDRAWN_ELEMENT = re.compile(r'\s*<(filter|clipPath|mask|marker|linearGradient|radialGradient)\b[^>]*?\sid="([^"]*)"[^>]*?(?:/>|>.*?</\1\s*>)', re.DOTALL)
+REFERENCE = re.compile(r'url\(#([^)]+)\)|href="#([^"]+)"')
+
+def _remove_unreferenced(svg_text):
+    if "<style" in svg_text: # css can refer to ids in ways REFERENCE doesn't see
+        return svg_text
+    while True:
+        referenced = {url or href for url, href in REFERENCE.findall(svg_text)}
+        removed = []
+        def drop(match):
+            if match.group(2) in referenced:
+                return match.group(0)
+            removed.append(match.group(2))
+            return ""
+        svg_text = UNDRAWN_ELEMENT.sub(drop, svg_text)
+        if not removed: # removing one element can leave another without references, so repeat until nothing changes
+            return svg_text
+
+# svg text without editor-only content
+def normalise_svg(svg_text):
+    svg_text = COMMENT.sub("", svg_text)
+    svg_text = EDITOR_ELEMENT.sub("", svg_text)
+    svg_text = EDITOR_ATTRIBUTE.sub(lambda m: m.group(0) if m.group(1) in KEPT_ATTRIBUTES else "", svg_text)
+    return _remove_unreferenced(svg_text)
+
+# Whether two pngs have the same size and pixels (however they were encoded)
+def same_pixels(png_a, png_b):
+    if png_a == png_b:
+        return True
+    try:
+        return read_png(png_a) == read_png(png_b)
+    except (ValueError, zlib.error):
+        return False
+
+class NormalisedSvgCache:
+    """
+    Normalised copies of the Base UI svgs for one Base UI version.
+    The index records each source's size and modified time, so a file saved since it was
+    normalised (e.g. in watch mode) is normalised and checked again, and the renderer that
+    checked it, so switching renderer checks everything again with the new one.
+    """
+    _lock = threading.Lock() # builds in one process (the build service) share the cache
+
+    def __init__(self, cache_folder, base_ui, version):
+        self.base_ui = Path(base_ui)
+        self.folder = Path(cache_folder) / (version or "unversioned")
+        self.index_path = self.folder / "index.json"
+        self.entries = {} # path relative to Base UI -> {"size", "mtime_ns", "renderer", "state"}
+        try:
+            index = json.loads(self.index_path.read_text(encoding="utf-8"))
+            if index.get("version") == INDEX_VERSION:
+                self.entries = index["files"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def _rel(self, path):
+        return Path(path).relative_to(self.base_ui).as_posix()
+
+    def _current(self, path):
+        entry = self.entries.get(self._rel(path))
+        st = os.stat(path)
+        return entry if entry and (entry["size"], entry["mtime_ns"]) == (st.st_size, st.st_mtime_ns) else None
+
+    def copy_path(self, path):
+        return self.folder / "files" / self._rel(path)
+
+    # The file to read for a Base UI svg: its normalised copy if that has been checked, otherwise the original
+    def source(self, path):
+        entry = self._current(path)
+        return self.copy_path(path) if entry and entry["state"] == "verified" else Path(path)
+
+    async def _check(self, path, renderer):
+        original = path.read_text(encoding="utf-8")
+        normalised = normalise_svg(original)
+        st = os.stat(path)
+        entry = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "renderer": renderer.name}
+        if normalised == original:
+            return dict(entry, state="unchanged"), None
+        original_png, normalised_png = await asyncio.gather(renderer.render(original, path.name), renderer.render(normalised, path.name))
+        if original_png is None or normalised_png is None:
+            return None, None # try again next build
+        if not same_pixels(original_png, normalised_png):
+            log.warning(f"- {path.name} renders differently once normalised, using the original")
+            return dict(entry, state="differs"), None
+        return dict(entry, state="verified"), normalised
+
+    # Normalise the svgs that aren't in the cache yet (or changed since), checking each one with renderer
+    # Copies of other Base UI versions are removed
+    def prepare(self, paths, renderer):
+        import tool_runner
+        with self._lock:
+            pending = [Path(path) for path in paths if (self._current(path) or {}).get("renderer") != renderer.name]
+            if not pending:
+                return
+            log.info(f"- Normalising {len(pending)} svg file(s) for the source cache")
+            for other in self.folder.parent.glob("*"):
+                if other != self.folder and other.is_dir():
+                    shutil.rmtree(other, ignore_errors=True)
+            with tracing.span("normalise svgs", files=len(pending)):
+                results = tool_runner.gather_sync(self._check(path, renderer) for path in pending)
+            before = after = 0
+            for path, (entry, normalised) in zip(pending, results):
+                if entry is None:
+                    continue
+                if normalised is not None:
+                    copy = self.copy_path(path)
+                    copy.parent.mkdir(parents=True, exist_ok=True)
+                    tmp = copy.with_name(f"{copy.name}.{os.getpid()}.tmp")
+                    tmp.write_text(normalised, encoding="utf-8")
+                    os.replace(tmp, copy)
+                    before += entry["size"]
+                    after += copy.stat().st_size
+                self.entries[self._rel(path)] = entry
+            self.folder.mkdir(parents=True, exist_ok=True)
+            tmp = self.index_path.with_name(f"index.json.{os.getpid()}.tmp")
+            tmp.write_text(json.dumps({"version": INDEX_VERSION, "files": self.entries}), encoding="utf-8")
+            os.replace(tmp, self.index_path)
+            states = [entry["state"] for entry, _ in results if entry is not None]
+            log.info(f"- {states.count('verified')} svg file(s) normalised ({(before - after) / 1024:.0f} KB removed), "
+                     f"{states.count('unchanged')} had nothing to remove, {states.count('differs')} rendered differently")
+
+# The cache for the Base UI version in manifest, kept in ui_path/Cache
+def open_normalised_svgs(ui_path, manifest):
+    version_files = manifest.select(kind="version")
+    version = version_files[0].read_text(encoding="utf-8").strip() if version_files else ""
+    return NormalisedSvgCache(Path(ui_path) / "Cache" / "Normalised SVG", manifest.root, version)
+
+def main():
+    from manifest import load_manifest
+    from renderers import get_renderer
+    parser = argparse.ArgumentParser(description="Normalise the Base UI svgs once, ahead of the first build")
+    parser.add_argument("--ui-path", type=Path, default=Path(__file__).resolve().parent, help="folder containing Base UI")
+    parser.add_argument("--inkscape", help="path to inkscape")
+    parser.add_argument("--renderer", default="inkscape", help="renderer the copies are checked with - use the one your builds use")
+    args = parser.parse_args()
+
+    manifest = load_manifest(args.ui_path / "Base UI", cache_file=args.ui_path / "Cache" / "base_ui_manifest.json")
+    renderer = get_renderer(args.renderer, args.inkscape, args.ui_path / "Cache" / "renderer_conformance.json")
+    cache = open_normalised_svgs(args.ui_path, manifest)
+    cache.prepare(manifest.select(resource_type="svg"), renderer)
+    states = [entry["state"] for entry in cache.entries.values()]
+    print(f"{states.count('verified')} of {len(states)} svg file(s) in {cache.folder} are normalised")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+# Tests for .layout minification and the check that a minified layout still means the same
+#
+# Usage:
+#   python -m unittest discover tests
+
+import sys
+import unittest
+from pathlib import Path
+
+REPO_FOLDER = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_FOLDER))
+
+from layout_minify import minify_layout, minify_layouts, same_structure
+
+LAYOUT = b"""\xef\xbb\xbf<?xml version="1.0" encoding="utf-8"?>
+<!-- made with the layout editor -->
+<LayoutData>
+  <Window id="1" name="Main &lt;window&gt;" >
+    <Property name="Caption">Hello  world</Property>
+    <Property name="Blank"> </Property>
+    <Children>
+      <Window id="2" />
+    </Children>
+  </Window>
+</LayoutData>
+"""
+
+class MinifyLayout(unittest.TestCase):
+    def test_minified_layout(self):
+        self.assertEqual(minify_layout(LAYOUT), (
+            b'\xef\xbb\xbf<?xml version="1.0" encoding="utf-8"?><LayoutData><Window id="1" name="Main &lt;window&gt;" >'
+            b'<Property name="Caption">Hello  world</Property><Property name="Blank"> </Property>'
+            b'<Children><Window id="2"/></Children></Window></LayoutData>\n'
+        ))
+        self.assertTrue(same_structure(LAYOUT, minify_layout(LAYOUT)))
+
+    def test_whitespace_between_element_only_children_does_not_count(self):
+        self.assertTrue(same_structure(b"<a>\n  <b/>\n  <c></c>\n</a>", b"<a><b/><c></c></a>"))
+
+    def test_other_text_must_match_exactly(self):
+        for original, changed in (
+            (b"<a><x> </x></a>", b"<a><x></x></a>"), # whitespace that is all of an element's text
+            (b"<a><x>one two</x></a>", b"<a><x>one  two</x></a>"),
+            (b"<p>hi<b/> <i/></p>", b"<p>hi<b/><i/></p>"), # whitespace among text and elements
+            (b'<a><x v="1"/></a>', b'<a><x v="2"/></a>'),
+            (b"<a><x/><y/></a>", b"<a><y/><x/></a>"),
+            (b"<a><x/></a>", b"<a><x/>"),
+        ):
+            with self.subTest(original=original):
+                self.assertFalse(same_structure(original, changed))
+
+    def test_layout_that_fails_the_check_is_kept(self):
+        mixed = b"<p>hi<b/> <i/></p>"
+        minified, (before, after), unverified = minify_layouts({"mixed.layout": mixed, "main.layout": LAYOUT}, workers=1)
+        self.assertEqual(minified["mixed.layout"], mixed)
+        self.assertEqual(unverified, ["mixed.layout"])
+        self.assertEqual(minified["main.layout"], minify_layout(LAYOUT))
+        self.assertEqual((before, after), (len(mixed) + len(LAYOUT), len(mixed) + len(minify_layout(LAYOUT))))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+# Conformance tests for the DBPF package writer
+# Packages are written and their header and index read back field by field, with
+# read_package_index and straight from the bytes.
+#
+# Usage:
+#   python -m unittest discover tests
+
+import hashlib
+import os
+import struct
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+REPO_FOLDER = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_FOLDER))
+
+from dbpf_writer_lib import (
+    DBPF_INDEX_MAJOR_VERSION, DBPF_INDEX_MINOR_VERSION, DBPF_MAJOR_VERSION, DBPF_MINOR_VERSION, DBPF_SIGNATURE,
+    RESOURCE_ALIGNMENT, create_dbpf_package, read_package_index, read_package_resource
+)
+
+HEADER_SIZE = 96
+TIMESTAMP = 1262304000
+
+def resource(type_id, group_id, instance_id, data):
+    return {"type_id": type_id, "group_id": group_id, "instance_id": instance_id, "data": data}
+
+# Header fields by name, from the layout the game reads
+def read_header(path):
+    with open(path, "rb") as f:
+        header = f.read(HEADER_SIZE)
+    fields = struct.unpack_from("<4s11I", header)
+    return dict(zip((
+        "signature", "major", "minor", "user_major", "user_minor", "unknown", "created", "modified",
+        "index_major", "index_count", "old_index_offset", "index_size"
+    ), fields)) | {
+        "hole_count": struct.unpack_from("<I", header, 48)[0],
+        "index_minor": struct.unpack_from("<I", header, 60)[0],
+        "index_offset": struct.unpack_from("<I", header, 64)[0],
+        "reserved": header[72:],
+    }
+
+class PackageWriterConformance(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+
+    def write(self, resources, name="test.package", **options):
+        path = os.path.join(self.folder.name, name)
+        options = {"timestamp": TIMESTAMP, "compression": "fast", **options}
+        return path, create_dbpf_package(path, resources, **options)
+
+    def check_package(self, path, resources):
+        header = read_header(path)
+        self.assertEqual(header["signature"], DBPF_SIGNATURE)
+        self.assertEqual((header["major"], header["minor"]), (DBPF_MAJOR_VERSION, DBPF_MINOR_VERSION))
+        self.assertEqual((header["index_major"], header["index_minor"]), (DBPF_INDEX_MAJOR_VERSION, DBPF_INDEX_MINOR_VERSION))
+        self.assertEqual((header["created"], header["modified"]), (TIMESTAMP, TIMESTAMP))
+        self.assertEqual((header["old_index_offset"], header["hole_count"]), (0, 0))
+        self.assertEqual(header["reserved"], bytes(24))
+        self.assertEqual(header["index_count"], len(resources))
+        self.assertEqual(header["index_offset"] + header["index_size"], os.path.getsize(path))
+
+        entries = read_package_index(path)
+        self.assertEqual(
+            [(e.type_id, e.group_id, e.instance_id) for e in entries],
+            [(r["type_id"], r["group_id"], r["instance_id"]) for r in resources]
+        )
+        # Resources follow the header in order, each aligned, without overlapping each other or the index
+        expected_offset = HEADER_SIZE
+        for entry, res in zip(entries, resources):
+            self.assertEqual(entry.offset, expected_offset)
+            self.assertEqual(entry.offset % RESOURCE_ALIGNMENT, 0)
+            self.assertEqual(entry.mem_size, len(res["data"]))
+            self.assertEqual(read_package_resource(path, entry), res["data"])
+            expected_offset += -(-entry.disk_size // RESOURCE_ALIGNMENT) * RESOURCE_ALIGNMENT
+        self.assertEqual(header["index_offset"], expected_offset)
+        return entries
+
+    def test_shared_type_and_group(self):
+        # Every entry has the same type, group and instance high, so all three move to the index header
+        resources = [resource(0x2F7D0004, 0, 0x5A5A000000000000 | i, bytes([i]) * (i * 97)) for i in range(1, 40)]
+        path, written = self.write(resources)
+        self.assertTrue(written)
+        self.check_package(path, resources)
+
+    def test_mixed_types_groups_and_instances(self):
+        resources = [
+            resource(0x0333406C, 0, 0x0000000000000001, b"<layout/>" * 50),
+            resource(0x2F7D0004, 0x00000001, 0xFFFFFFFF00000000, b"\x89PNG" + bytes(range(256)) * 3),
+            resource(0x220557DA, 0x12345678, 0x123456789ABCDEF0, "Text with ünïcode".encode("utf-16-le")),
+            resource(0x2F7D0004, 0, 0x0000000100000000, b""),
+        ]
+        path, _ = self.write(resources)
+        self.check_package(path, resources)
+
+    def test_empty_package(self):
+        path, _ = self.write([])
+        self.check_package(path, [])
+
+    def test_pass_through_files(self):
+        source = Path(self.folder.name) / "S3_0333406C_00000000_0000000000000007_layout.layout"
+        source.write_bytes(b"<prop name='x'/>\n" * 400)
+        path, _ = self.write([{"type_id": 0x0333406C, "group_id": 0, "instance_id": 7, "path": str(source)}])
+        self.check_package(path, [resource(0x0333406C, 0, 7, source.read_bytes())])
+
+    def test_same_input_gives_same_bytes(self):
+        resources = [resource(0x0333406C, 0, i, f"<resource {i}/>".encode() * 30) for i in range(10)]
+        first, _ = self.write(resources, "first.package")
+        second, _ = self.write(resources, "second.package")
+        self.assertEqual(Path(first).read_bytes(), Path(second).read_bytes())
+
+    def test_unchanged_package_is_left_alone(self):
+        resources = [resource(0x0333406C, 0, i, f"<resource {i}/>".encode() * 30) for i in range(10)]
+        path, (written, digest) = self.write(resources, return_digest=True)
+        self.assertTrue(written)
+        self.assertEqual(digest, hashlib.sha1(Path(path).read_bytes()).hexdigest())
+        mtime = os.stat(path).st_mtime_ns
+
+        # Only the timestamps differ, so the package on disk (and its old timestamps) stays
+        _, (written, digest) = self.write(resources, timestamp=TIMESTAMP + 60, return_digest=True)
+        self.assertFalse(written)
+        self.assertEqual(os.stat(path).st_mtime_ns, mtime)
+        self.assertEqual(digest, hashlib.sha1(Path(path).read_bytes()).hexdigest())
+
+        _, written = self.write(resources[:-1])
+        self.assertTrue(written)
+        self.check_package(path, resources[:-1])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+# Tests for the in-process Refpack codec
+# Every input is compressed at each level and decompressed again, both directly and through a
+# package read back with read_package_resource. If a real refpack_pipe can be found, its output
+# is also checked against refpack_decompress.
+#
+# Usage:
+#   python -m unittest discover tests
+
+import os
+import random
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+REPO_FOLDER = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_FOLDER))
+
+import dbpf_writer_lib
+import tool_runner
+from dbpf_writer_lib import (
+    REFPACK_LEVELS, REFPACK_MAX_MATCH, REFPACK_WINDOW, _find_compressor, compress_refpack, create_dbpf_package,
+    hold_codec_pool, read_package_index, read_package_resource, refpack_compress, refpack_compress_async,
+    refpack_decompress, release_codec_pool
+)
+
+# Inputs that reach every opcode: literal runs, short and long matches, overlapping copies,
+# matches right at the edge of the window and data that doesn't compress at all
+def sample_inputs():
+    rng = random.Random(45)
+    words = [rng.randbytes(rng.randint(3, 12)) for _ in range(200)]
+    block = rng.randbytes(2000)
+    return {
+        "empty": b"",
+        "one byte": b"x",
+        "three bytes": b"abc",
+        "random": rng.randbytes(50000),
+        "repeated pattern": b"abc" * 50000,
+        "zeros": bytes(REFPACK_WINDOW + 5000),
+        "long runs": b"".join(bytes([rng.randrange(256)]) * rng.randint(1, 3 * REFPACK_MAX_MATCH) for _ in range(100)),
+        "words": b" ".join(rng.choice(words) for _ in range(20000)),
+        "edge of window": block + rng.randbytes(REFPACK_WINDOW - len(block) - 1) + block,
+        "beyond window": block + rng.randbytes(REFPACK_WINDOW + 1) + block,
+        "xml": "".join(f'<prop name="Colour{i % 37}" value="0x{rng.getrandbits(32):08X}"/>\n' for i in range(3000)).encode(),
+    }
+
+class RefpackRoundTrip(unittest.TestCase):
+    def test_round_trip(self):
+        for name, data in sample_inputs().items():
+            for level in REFPACK_LEVELS:
+                with self.subTest(input=name, level=level):
+                    compressed = refpack_compress(data, level)
+                    self.assertEqual(compressed[1], 0xFB)
+                    self.assertEqual(refpack_decompress(compressed), data)
+
+    def test_repetitive_data_compresses(self):
+        inputs = sample_inputs()
+        for name in ("repeated pattern", "zeros", "long runs", "xml"):
+            for level in REFPACK_LEVELS:
+                with self.subTest(input=name, level=level):
+                    self.assertLess(len(refpack_compress(inputs[name], level)), len(inputs[name]) // 2)
+
+    # Lazy matching can lose a few bytes on odd inputs, but not on the text-like resources a UI is made of
+    def test_max_beats_fast_on_text(self):
+        inputs = sample_inputs()
+        for name in ("words", "xml"):
+            with self.subTest(input=name):
+                self.assertLessEqual(len(refpack_compress(inputs[name], "max")), len(refpack_compress(inputs[name], "fast")))
+
+    def test_damaged_streams_are_rejected(self):
+        compressed = refpack_compress(sample_inputs()["words"], "fast")
+        for damaged in (b"", compressed[:4], b"\x10\x00" + compressed[2:], compressed[:len(compressed) // 2]):
+            with self.assertRaises(ValueError):
+                refpack_decompress(damaged)
+
+    def test_package_round_trip(self):
+        inputs = sample_inputs()
+        resources = [
+            {"type_id": 0x0333406C, "group_id": 0, "instance_id": i + 1, "data": data, "name": name}
+            for i, (name, data) in enumerate(inputs.items())
+        ]
+        with tempfile.TemporaryDirectory() as folder:
+            for level in REFPACK_LEVELS:
+                with self.subTest(level=level):
+                    package = os.path.join(folder, f"{level}.package")
+                    create_dbpf_package(package, resources, timestamp=0, skip_unchanged=False, compression=level)
+                    entries = read_package_index(package)
+                    self.assertEqual([entry.instance_id for entry in entries], [res["instance_id"] for res in resources])
+                    for entry, res in zip(entries, resources):
+                        self.assertEqual(read_package_resource(package, entry), res["data"], res["name"])
+                        self.assertEqual(entry.mem_size, len(res["data"]))
+                    compressed = {res["name"]: entry.compressed for entry, res in zip(entries, resources)}
+                    self.assertTrue(compressed["repeated pattern"])
+                    self.assertFalse(compressed["random"]) # stored as it is when compressing doesn't make it smaller
+
+class CodecPool(unittest.TestCase):
+    # Two builds at once share the worker processes, which go when the second one finishes
+    def test_last_build_shuts_the_pool_down(self):
+        data = sample_inputs()["words"]
+        with mock.patch.object(tool_runner, "CPU_COUNT", 2): # so the pool is used on single core machines too
+            hold_codec_pool()
+            hold_codec_pool()
+            self.assertEqual(refpack_decompress(tool_runner.run_sync(refpack_compress_async(data, "fast"))), data)
+            pool = dbpf_writer_lib._codec_pool
+            self.assertIsNotNone(pool)
+            release_codec_pool()
+            self.assertIs(dbpf_writer_lib._codec_pool, pool)
+            release_codec_pool()
+            self.assertIsNone(dbpf_writer_lib._codec_pool)
+            with self.assertRaises(RuntimeError):
+                pool.submit(len, b"")
+
+def _has_refpack_pipe():
+    try:
+        _find_compressor()
+    except FileNotFoundError:
+        return False
+    return True
+
+@unittest.skipUnless(_has_refpack_pipe(), "refpack_pipe was not found")
+class RefpackPipeConformance(unittest.TestCase):
+    def test_refpack_pipe_output_decompresses(self):
+        for name, data in sample_inputs().items():
+            if not data:
+                continue
+            with self.subTest(input=name):
+                self.assertEqual(refpack_decompress(compress_refpack(data)), data)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,171 @@
+# Tests for render workers and the remote renderer
+# Two render_worker.py processes are started on 127.0.0.1 with the benchmarks' stand-in Inkscape,
+# and a RemoteRenderer spreads renders over them. One worker is killed part way through; every
+# render must still come back, correct, from the other one. Stub workers check which errors
+# send a render on to another worker.
+#
+# Usage:
+#   python -m unittest discover tests
+
+import hashlib
+import json
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+REPO_FOLDER = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_FOLDER))
+sys.path.insert(0, str(REPO_FOLDER / "benchmarks"))
+
+import tool_runner
+from png_utils import read_png
+from renderers import RemoteRenderer
+from synthetic_ui import install_fake_tools
+
+INKSCAPE_LATENCY = 0.3 # seconds per render, so renders are still running when a worker is killed
+
+def svg(i):
+    return f'<svg xmlns="http://www.w3.org/2000/svg" width="{8 + i % 5}" height="6"><rect id="r{i}"/></svg>'
+
+# The stand-in Inkscape fills the canvas with a colour taken from the svg's sha1
+def check_png(test, png, svg_text):
+    test.assertIsNotNone(png)
+    width, height, pixels = read_png(png)
+    test.assertEqual((width, height), (8 + int(svg_text.split('id="r')[1].split('"')[0]) % 5, 6))
+    test.assertEqual(pixels[:3], hashlib.sha1(svg_text.encode("utf-8")).digest()[:3])
+
+# A worker that answers every render with the same status, counting the renders it was sent
+class StubWorker(ThreadingHTTPServer):
+    def __init__(self, status):
+        self.status = status
+        self.renders = 0
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def address(self):
+        return f"127.0.0.1:{self.server_address[1]}"
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+class StubHandler(BaseHTTPRequestHandler):
+    def send(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.send(200, json.dumps({"capacity": 1}).encode())
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.renders += 1
+        self.send(self.server.status, b"stub")
+
+    def log_message(self, format, *args):
+        pass
+
+class RemoteRendering(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = tempfile.TemporaryDirectory()
+        cls.inkscape, _ = install_fake_tools(Path(cls.folder.name) / "tools", INKSCAPE_LATENCY)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.folder.cleanup()
+
+    # Start a render worker on a free port and return its process and address
+    def start_worker(self):
+        proc = subprocess.Popen(
+            [sys.executable, "-u", str(REPO_FOLDER / "render_worker.py"), "--inkscape", self.inkscape, "--port", "0",
+             "--cache", str(Path(self.folder.name) / "inkscape_check.json")],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+        )
+        self.addCleanup(proc.stdout.close)
+        self.addCleanup(proc.wait)
+        self.addCleanup(proc.kill)
+        line = proc.stdout.readline()
+        self.assertIn("listening on", line)
+        return proc, line.split("listening on ")[1].split(",")[0]
+
+    def test_renders_survive_a_worker_being_killed(self):
+        (_, first), (second_proc, second) = self.start_worker(), self.start_worker()
+        renderer = RemoteRenderer([first, second]) # no local Inkscape to fall back on
+        svgs = [svg(i) for i in range(12)]
+
+        # Kill the second worker once both have had time to take renders
+        killer = threading.Timer(INKSCAPE_LATENCY * 2, second_proc.kill)
+        killer.start()
+        self.addCleanup(killer.cancel)
+        start = time.perf_counter()
+        pngs = tool_runner.gather_sync(renderer.render(svg_text, f"r{i}") for i, svg_text in enumerate(svgs))
+        elapsed = time.perf_counter() - start
+
+        for png, svg_text in zip(pngs, svgs):
+            check_png(self, png, svg_text)
+        dead = [worker for worker in renderer.workers if worker.address == second][0]
+        self.assertFalse(dead.is_up())
+        self.assertLess(elapsed, 60)
+
+    def test_both_workers_share_the_renders(self):
+        (_, first), (_, second) = self.start_worker(), self.start_worker()
+        renderer = RemoteRenderer([first, second])
+        rendered = {worker.address: 0 for worker in renderer.workers}
+        for worker in renderer.workers:
+            def counted(svg_data, name, timeout, worker=worker, render=worker.render):
+                rendered[worker.address] += 1
+                return render(svg_data, name, timeout)
+            worker.render = counted
+        svgs = [svg(i) for i in range(6)]
+        pngs = tool_runner.gather_sync(renderer.render(svg_text, f"r{i}") for i, svg_text in enumerate(svgs))
+        for png, svg_text in zip(pngs, svgs):
+            check_png(self, png, svg_text)
+        self.assertEqual(sum(rendered.values()), len(svgs))
+        self.assertTrue(all(rendered.values()), rendered)
+
+    def test_no_worker_falls_back_to_local_inkscape(self):
+        proc, address = self.start_worker()
+        proc.kill()
+        proc.wait()
+        svg_text = svg(3)
+        self.assertIsNone(tool_runner.run_sync(RemoteRenderer([address]).render(svg_text, "r3")))
+        check_png(self, tool_runner.run_sync(RemoteRenderer([address], self.inkscape).render(svg_text, "r3")), svg_text)
+
+    # Every worker would turn the same svg down, so neither the other worker nor local Inkscape is asked
+    def test_turned_down_svg_is_not_retried(self):
+        for status in (400, 413, 422):
+            with self.subTest(status=status):
+                workers = [StubWorker(status), StubWorker(status)]
+                for worker in workers:
+                    self.addCleanup(worker.stop)
+                renderer = RemoteRenderer([worker.address for worker in workers], self.inkscape)
+                local_renders = []
+                async def render_locally(svg_text, name):
+                    local_renders.append(name)
+                renderer.local.render = render_locally
+                self.assertIsNone(tool_runner.run_sync(renderer.render(svg(1), "r1")))
+                self.assertEqual(sum(worker.renders for worker in workers), 1)
+                self.assertEqual(local_renders, [])
+                self.assertTrue(all(worker.is_up() for worker in renderer.workers))
+
+    def test_server_errors_are_retried(self):
+        workers = [StubWorker(503), StubWorker(503)]
+        for worker in workers:
+            self.addCleanup(worker.stop)
+        renderer = RemoteRenderer([worker.address for worker in workers], self.inkscape)
+        svg_text = svg(2)
+        check_png(self, tool_runner.run_sync(renderer.render(svg_text, "r2")), svg_text)
+        self.assertEqual([worker.renders for worker in workers], [1, 1])
+        self.assertFalse(any(worker.is_up() for worker in renderer.workers))
+
+if __name__ == "__main__":
+    unittest.main()
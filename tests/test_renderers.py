@@ -0,0 +1,110 @@
+# Tests for the svg renderers and the conformance check the "auto" renderer relies on
+# The pixel comparison from benchmarks/renderer_conformance.py is checked on made-up pngs, and
+# renderer selection with and without a conformance report. The cairosvg tests are skipped
+# when cairosvg isn't installed.
+#
+# Usage:
+#   python -m unittest discover tests
+
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+REPO_FOLDER = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_FOLDER))
+sys.path.insert(0, str(REPO_FOLDER / "benchmarks"))
+
+import tool_runner
+from png_utils import read_png, write_png
+from renderer_conformance import compare_pngs
+from renderers import AutoRenderer, InkscapeRenderer, get_renderer, load_conformance
+from synthetic_ui import install_fake_tools
+
+try:
+    import cairosvg
+except ImportError:
+    cairosvg = None
+
+WIDTH, HEIGHT = 10, 10
+
+def solid_png(rgba, width=WIDTH, height=HEIGHT, changes=()):
+    pixels = bytearray(bytes(rgba) * (width * height))
+    for index, pixel in changes:
+        pixels[index * 4:index * 4 + 4] = bytes(pixel)
+    return write_png(width, height, bytes(pixels))
+
+class CompareRenders(unittest.TestCase):
+    def test_identical_renders_match(self):
+        result = compare_pngs(solid_png((10, 20, 30, 255)), solid_png((10, 20, 30, 255)), tolerance=0, max_differing=0)
+        self.assertEqual(result, {"match": True, "max_difference": 0, "differing_pixels": 0})
+
+    def test_anti_aliasing_within_tolerance_matches(self):
+        reference = solid_png((100, 100, 100, 255))
+        candidate = solid_png((100, 100, 100, 255), changes=[(i, (102, 99, 100, 255)) for i in range(WIDTH * HEIGHT)])
+        result = compare_pngs(reference, candidate, tolerance=2, max_differing=0)
+        self.assertTrue(result["match"])
+        self.assertEqual(result["max_difference"], 2)
+        self.assertFalse(compare_pngs(reference, candidate, tolerance=1, max_differing=0)["match"])
+
+    def test_only_a_fraction_of_pixels_may_differ(self):
+        reference = solid_png((0, 0, 0, 255))
+        one_pixel = solid_png((0, 0, 0, 255), changes=[(5, (255, 0, 0, 255))])
+        result = compare_pngs(reference, one_pixel, tolerance=2, max_differing=0.01)
+        self.assertTrue(result["match"])
+        self.assertEqual(result["differing_pixels"], 1)
+        self.assertFalse(compare_pngs(reference, one_pixel, tolerance=2, max_differing=0.005)["match"])
+
+    def test_different_sizes_or_failed_renders_never_match(self):
+        self.assertFalse(compare_pngs(solid_png((0, 0, 0, 255)), solid_png((0, 0, 0, 255), width=WIDTH + 1), 255, 1)["match"])
+        self.assertFalse(compare_pngs(solid_png((0, 0, 0, 255)), None, 255, 1)["match"])
+
+class RendererSelection(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        self.report = Path(self.folder.name) / "renderer_conformance.json"
+
+    def test_conformance_report(self):
+        self.assertEqual(load_conformance(self.report), set()) # not made yet
+        self.report.write_text(json.dumps({"renderer": "cairosvg", "matching": ["a.svg", "b.svg"]}))
+        self.assertEqual(load_conformance(self.report), {"a.svg", "b.svg"})
+        self.report.write_text("{cut short")
+        self.assertEqual(load_conformance(self.report), set())
+
+    def test_unknown_renderer(self):
+        with self.assertRaises(ValueError):
+            get_renderer("svg2png", "inkscape")
+
+    def test_inkscape_renders_everything(self):
+        inkscape, _ = install_fake_tools(Path(self.folder.name) / "tools")
+        renderer = get_renderer("inkscape", inkscape)
+        self.assertIsInstance(renderer, InkscapeRenderer)
+        self.assertTrue(renderer.uses_inkscape("anything.svg"))
+        png = tool_runner.run_sync(renderer.render('<svg width="7" height="3"/>', "small.svg"))
+        self.assertEqual(read_png(png)[:2], (7, 3))
+
+    @unittest.skipIf(cairosvg is not None, "cairosvg is installed")
+    def test_auto_without_cairosvg_is_inkscape(self):
+        self.report.write_text(json.dumps({"matching": ["a.svg"]}))
+        self.assertIsInstance(get_renderer("auto", "inkscape", self.report), InkscapeRenderer)
+
+    @unittest.skipIf(cairosvg is None, "cairosvg is not installed")
+    def test_auto_only_skips_inkscape_for_matching_files(self):
+        self.report.write_text(json.dumps({"matching": ["a.svg"]}))
+        renderer = get_renderer("auto", "inkscape", self.report)
+        self.assertIsInstance(renderer, AutoRenderer)
+        self.assertFalse(renderer.uses_inkscape("a.svg"))
+        self.assertTrue(renderer.uses_inkscape("b.svg"))
+
+@unittest.skipIf(cairosvg is None, "cairosvg is not installed")
+class CairoSvgConformance(unittest.TestCase):
+    # A flat shape with no anti-aliased edges has to come out the same from both renderers
+    def test_solid_fill_matches_the_expected_pixels(self):
+        svg_text = '<svg xmlns="http://www.w3.org/2000/svg" width="10" height="10"><rect width="10" height="10" fill="#0a141e"/></svg>'
+        png = tool_runner.run_sync(get_renderer("cairosvg", None).render(svg_text, "solid.svg"))
+        self.assertTrue(compare_pngs(solid_png((10, 20, 30, 255)), png, tolerance=0, max_differing=0)["match"])
+
+if __name__ == "__main__":
+    unittest.main()
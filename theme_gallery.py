@@ -0,0 +1,144 @@
+import base64
+import math
+import queue
+import time
+import tkinter as tk
+from tkinter import ttk
+from build import render_previews
+from build_log import get_logger
+from colours import PRESETS, sweep_themes
+
+# --------------------------------- #
+# Theme gallery
+# Previews a whole sweep of themes at once instead of one "Show Preview" at a time:
+# the main accent turned round the colour wheel (columns) at a few lightnesses (rows),
+# on top of a preset. Each theme is worked out by colours.sweep_themes the same way
+# picking that accent in the main window would. Every preview is queued at once and
+# tool_runner runs as many Inkscape processes as there are cores; each one shows up in
+# the grid as soon as it's rendered. Clicking a preview loads its colours into the window.
+# --------------------------------- #
+
+log = get_logger("theme_gallery")
+
+CELL_SIZE = 180
+DEFAULT_HUES = 8
+DEFAULT_LIGHTNESS_STEPS = 3
+DECODE_BUDGET = 0.025 # seconds per tick spent showing finished previews
+POLL_MS = 50
+
+class ThemeGallery:
+    # on_pick(preset, accent, colour_values) is called on the Tk thread when a preview is clicked
+    def __init__(self, parent, inkscape_path, preview_svg, accent, preset, on_pick):
+        self.inkscape_path = inkscape_path
+        self.preview_svg = preview_svg
+        self.accent = accent
+        self.on_pick = on_pick
+        self.futures = []
+        self.results = queue.Queue()
+        self.generation = 0 # results of an earlier sweep are ignored
+        self.finished = 0
+
+        self.window = tk.Toplevel(parent)
+        self.window.title(f"Theme gallery - {accent}")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self.blank = tk.PhotoImage(master=self.window, width=CELL_SIZE, height=CELL_SIZE) # keeps the cells a fixed size in pixels
+
+        controls = ttk.Frame(self.window)
+        controls.grid(row=0, column=0, sticky="w", padx=10, pady=10)
+        self.preset = tk.StringVar(value=preset)
+        self.hues = tk.IntVar(value=DEFAULT_HUES)
+        self.lightness_steps = tk.IntVar(value=DEFAULT_LIGHTNESS_STEPS)
+        ttk.Label(controls, text="Colour Preset:").grid(row=0, column=0, padx=(0, 5))
+        ttk.Combobox(controls, textvariable=self.preset, values=PRESETS, state="readonly", width=10).grid(row=0, column=1, padx=5)
+        ttk.Label(controls, text="Hues:").grid(row=0, column=2, padx=(10, 5))
+        ttk.Spinbox(controls, from_=1, to=24, textvariable=self.hues, width=4).grid(row=0, column=3, padx=5)
+        ttk.Label(controls, text="Lightness steps:").grid(row=0, column=4, padx=(10, 5))
+        ttk.Spinbox(controls, from_=1, to=5, textvariable=self.lightness_steps, width=4).grid(row=0, column=5, padx=5)
+        ttk.Button(controls, text="Render", command=self.render).grid(row=0, column=6, padx=(10, 0))
+        self.status = ttk.Label(controls, text="")
+        self.status.grid(row=0, column=7, padx=10)
+
+        self.grid_frame = ttk.Frame(self.window)
+        self.grid_frame.grid(row=1, column=0, padx=10, pady=(0, 10))
+
+        self.after_id = self.window.after(POLL_MS, self._poll)
+        self.render()
+
+    def close(self):
+        self._cancel()
+        self.window.after_cancel(self.after_id)
+        self.window.destroy()
+
+    def _cancel(self):
+        for future in self.futures:
+            future.cancel()
+        self.futures = []
+
+    # Work out the sweep and queue every preview, replacing the last sweep
+    def render(self):
+        try:
+            hues, lightness_steps = max(1, self.hues.get()), max(1, self.lightness_steps.get())
+        except tk.TclError: # not a number
+            return
+        preset = self.preset.get()
+        self._cancel()
+        self.generation += 1
+        self.finished = 0
+        for child in self.grid_frame.winfo_children():
+            child.destroy()
+
+        rows = sweep_themes(preset, self.accent, hues, lightness_steps)
+        themes = [theme for row in rows for theme in row]
+        self.cells = []
+        for i, (accent, colour_values) in enumerate(themes):
+            cell = ttk.Frame(self.grid_frame)
+            cell.grid(row=i // hues, column=i % hues, padx=3, pady=3)
+            image_label = tk.Label(cell, image=self.blank, compound="center", text="Rendering…", background="lightgray", cursor="hand2")
+            image_label.grid(row=0, column=0)
+            caption = tk.Label(cell, text=accent, background=accent)
+            caption.grid(row=1, column=0, sticky="ew")
+            for widget in (image_label, caption):
+                widget.bind("<Button-1>", lambda e, accent=accent, colour_values=colour_values: self.on_pick(preset, accent, colour_values))
+            self.cells.append(image_label)
+
+        generation = self.generation
+        self.futures = render_previews([colour_values for _, colour_values in themes], preset, self.inkscape_path, self.preview_svg)
+        for i, future in enumerate(self.futures):
+            future.add_done_callback(lambda future, i=i: self.results.put((generation, i, future)))
+        self._update_status()
+
+    def _update_status(self):
+        self.status.configure(text=f"{self.finished} of {len(self.cells)} preview(s) rendered")
+
+    # Show the previews that have finished, for at most DECODE_BUDGET, then check again after POLL_MS
+    def _poll(self):
+        deadline = time.perf_counter() + DECODE_BUDGET
+        while time.perf_counter() < deadline:
+            try:
+                generation, i, future = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self.generation or future.cancelled():
+                continue
+            self.finished += 1
+            self._update_status()
+            label = self.cells[i]
+            try:
+                png_data = future.result()
+                if png_data is None:
+                    raise RuntimeError("Inkscape did not return a preview image")
+                image = tk.PhotoImage(master=self.window, data=base64.b64encode(png_data))
+                factor = math.ceil(max(image.width(), image.height()) / CELL_SIZE)
+                if factor > 1:
+                    image = image.subsample(factor)
+            except Exception as e:
+                log.warning(f"- Gallery preview failed: {e}")
+                label.configure(text="Preview failed")
+                continue
+            label.configure(image=image, text="")
+            label.image = image
+        self.after_id = self.window.after(POLL_MS, self._poll)
+
+# Open the gallery for a base accent
+def open_theme_gallery(parent, inkscape_path, preview_svg, accent, preset, on_pick):
+    return ThemeGallery(parent, inkscape_path, preview_svg, accent, preset, on_pick)
@@ -0,0 +1,158 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import os
+import subprocess
+import sys
+import threading
+from collections import namedtuple
+import tracing
+from build_log import get_logger
+
+# --------------------------------- #
+# External tool orchestration
+# Every inkscape and refpack process is started from one asyncio event loop on a
+# background thread. Each tool has its own concurrency limit and timeout, and
+# stdin/stdout are streamed by the loop, so hundreds of jobs can be in flight
+# without a thread per job.
+# --------------------------------- #
+
+log = get_logger("tool_runner")
+
+CPU_COUNT = os.cpu_count() or 4
+
+# Processes of each tool allowed to run at the same time
+LIMITS = {
+    "inkscape": CPU_COUNT,
+    "refpack": CPU_COUNT,
+}
+
+# Seconds before a process is killed
+TIMEOUTS = {
+    "inkscape": 600,
+    "refpack": 120,
+}
+
+# Watchdog timeouts for single jobs, which grow with the size of the input:
+# (base seconds, extra seconds per MB), never more than the tool's timeout above
+ADAPTIVE_TIMEOUTS = {
+    "inkscape": (60, 30),
+}
+
+ToolResult = namedtuple("ToolResult", ["returncode", "stdout", "stderr"])
+
+_loop = None
+_loop_lock = threading.Lock()
+_semaphores = {} # tool -> asyncio.Semaphore, only touched on the loop thread
+
+# Start the event loop thread the first time it's needed
+def _get_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="tool-runner", daemon=True).start()
+            _loop = loop
+        return _loop
+
+def _semaphore(tool):
+    if tool not in _semaphores:
+        _semaphores[tool] = asyncio.Semaphore(LIMITS.get(tool, CPU_COUNT))
+    return _semaphores[tool]
+
+# Console tools would otherwise flash a window on Windows
+def _popen_options():
+    if sys.platform != "win32":
+        return {}
+    startupinfo = subprocess.STARTUPINFO()
+    startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    return {"startupinfo": startupinfo, "creationflags": subprocess.CREATE_NO_WINDOW}
+
+# Timeout for one job of a tool with input_size bytes of input
+def adaptive_timeout(tool, input_size):
+    limit = TIMEOUTS.get(tool)
+    if tool not in ADAPTIVE_TIMEOUTS:
+        return limit
+    base, per_mb = ADAPTIVE_TIMEOUTS[tool]
+    timeout = base + per_mb * input_size / 1e6
+    return min(timeout, limit) if limit is not None else timeout
+
+# Run one external tool and return its exit code and output
+# tool picks the concurrency limit and default timeout, name is what shows up in the build trace
+# Raises subprocess.TimeoutExpired if the process had to be killed
+async def run_tool(tool, args, input=None, timeout=None, name=None):
+    timeout = timeout if timeout is not None else TIMEOUTS.get(tool)
+    args = [str(a) for a in args]
+    async with _semaphore(tool):
+        with tracing.span(name or tool, "subprocess"):
+            proc = await asyncio.create_subprocess_exec(
+                *args,
+                stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                **_popen_options()
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(proc.communicate(input), timeout)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                log.warning(f"- {name or tool} was stopped after {timeout} sec")
+                raise subprocess.TimeoutExpired(args, timeout)
+            except asyncio.CancelledError: # nobody wants the output any more
+                proc.kill()
+                raise
+            tracing.count(bytes_in=len(input) if input else 0, bytes_out=len(stdout))
+    return ToolResult(proc.returncode, stdout, stderr)
+
+# Start a coroutine on the tool loop and return a concurrent.futures.Future of its result
+# The caller's context (build log, tracing) is carried over to the coroutine
+# Cancelling the future cancels the coroutine, killing any process it's waiting on
+def submit(coro):
+    loop = _get_loop()
+    context = contextvars.copy_context()
+    done = concurrent.futures.Future()
+
+    def finished(task):
+        if done.cancelled():
+            return
+        try:
+            if task.cancelled():
+                done.cancel()
+            elif task.exception() is not None:
+                done.set_exception(task.exception())
+            else:
+                done.set_result(task.result())
+        except concurrent.futures.InvalidStateError: # cancelled in the meantime
+            pass
+
+    def start():
+        if done.cancelled():
+            coro.close()
+            return
+        task = loop.create_task(coro, context=context)
+        task.add_done_callback(finished)
+        done.add_done_callback(lambda future: future.cancelled() and loop.call_soon_threadsafe(task.cancel))
+
+    loop.call_soon_threadsafe(start)
+    return done
+
+# Run a coroutine on the tool loop and wait for its result
+def run_sync(coro):
+    return submit(coro).result()
+
+# If one of them fails the rest are cancelled (killing their processes) before the error is raised,
+# so nothing is left running or holding a slot after the caller has moved on
+async def _gather(coros):
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+# Run several coroutines concurrently on the tool loop and return their results in order
+def gather_sync(coros):
+    return run_sync(_gather(list(coros)))
@@ -0,0 +1,225 @@
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# --------------------------------- #
+# Build tracing
+# Spans around each stage and per-file job of run_recolour, exported as a
+# JSON summary and a Chrome trace (open in chrome://tracing or ui.perfetto.dev)
+# --------------------------------- #
+
+REPORT_NAME = "Build_Report.json"
+CHROME_TRACE_NAME = "Build_Trace.json"
+
+# The Tracer for the build running in this thread or asyncio task, if any - several builds can be traced at once
+_active = contextvars.ContextVar("active_tracer", default=None)
+_memory_tracers = 0 # builds using tracemalloc, which is process-wide, so it's only stopped once the last one finishes
+_memory_lock = threading.Lock()
+_open_spans = contextvars.ContextVar("open_spans", default=()) # spans open in this thread or asyncio task, innermost last
+
+# Peak resident memory of this process in bytes, or None if it can't be read
+def peak_rss():
+    if sys.platform == "win32":
+        try:
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [
+                    ("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t),
+                ]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+                return counters.PeakWorkingSetSize
+        except Exception:
+            return None
+        return None
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024 # Linux reports KB
+
+# Trace viewer row for a span - asyncio tasks get their own row so overlapping jobs don't stack on the loop thread's
+# asyncio is only looked up if something already imported it, so tracing stays cheap to import
+def _lane(thread_id):
+    asyncio = sys.modules.get("asyncio")
+    try:
+        task = asyncio.current_task() if asyncio is not None else None
+    except RuntimeError:
+        task = None
+    return thread_id if task is None else hash((thread_id, id(task))) & 0x7FFFFFFF
+
+class Span:
+    def __init__(self, name, category, stage, args):
+        self.name = name
+        self.category = category
+        self.stage = stage
+        self.args = dict(args)
+        self.thread_id = threading.get_ident()
+        self.lane = _lane(self.thread_id)
+        self.start = time.perf_counter()
+        self.end = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    @property
+    def duration(self):
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+class Tracer:
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.origin = time.perf_counter()
+        self.spans = []
+        self.stages = []
+        self.stage_name = None
+        self._stage_span = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, category="job", **args):
+        s = Span(name, category, self.stage_name, args)
+        token = _open_spans.set(_open_spans.get() + (s,))
+        try:
+            yield s
+        finally:
+            s.end = time.perf_counter()
+            _open_spans.reset(token)
+            with self._lock:
+                self.spans.append(s)
+
+    # Add byte counts to the innermost span open on this thread or asyncio task
+    def count(self, bytes_in=0, bytes_out=0):
+        stack = _open_spans.get()
+        if stack:
+            stack[-1].bytes_in += bytes_in
+            stack[-1].bytes_out += bytes_out
+
+    # Stages run one after another on the build thread, so starting one ends the last
+    def begin_stage(self, name):
+        self.end_stage()
+        self.stage_name = name
+        self._stage_span = Span(name, "stage", name, {})
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+
+    def end_stage(self):
+        s = self._stage_span
+        if s is None:
+            return
+        s.end = time.perf_counter()
+        s.args["peak_rss"] = peak_rss()
+        if self.trace_memory:
+            s.args["peak_tracemalloc"] = tracemalloc.get_traced_memory()[1]
+        with self._lock:
+            self.spans.append(s)
+            self.stages.append(s)
+        self._stage_span = None
+        self.stage_name = None
+
+    # Per-stage totals: wall time, time spent in external tools, bytes moved and memory
+    def summary(self):
+        stages = []
+        for stage in self.stages:
+            children = [s for s in self.spans if s.stage == stage.name and s is not stage]
+            stages.append({
+                "stage": stage.name,
+                "wall_seconds": round(stage.duration, 4),
+                "subprocess_seconds": round(sum(s.duration for s in children if s.category == "subprocess"), 4),
+                "jobs": sum(1 for s in children if s.category == "job"),
+                "bytes_in": sum(s.bytes_in for s in children),
+                "bytes_out": sum(s.bytes_out for s in children),
+                "peak_rss": stage.args.get("peak_rss"),
+                "peak_tracemalloc": stage.args.get("peak_tracemalloc"),
+                "threads": len({s.thread_id for s in children}) or 1,
+            })
+        return {
+            "total_seconds": round(time.perf_counter() - self.origin, 4),
+            "stages": stages,
+        }
+
+    def chrome_trace(self):
+        pid = os.getpid()
+        events = []
+        for s in self.spans:
+            args = dict(s.args)
+            if s.bytes_in or s.bytes_out:
+                args.update(bytes_in=s.bytes_in, bytes_out=s.bytes_out)
+            events.append({
+                "name": s.name,
+                "cat": s.category,
+                "ph": "X",
+                "ts": round((s.start - self.origin) * 1e6, 1),
+                "dur": round(s.duration * 1e6, 1),
+                "pid": pid,
+                "tid": s.lane,
+                "args": {k: str(v) if not isinstance(v, (int, float, type(None))) else v for k, v in args.items()},
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    # Save the summary and Chrome trace into the given folder
+    def write_reports(self, folder):
+        self.end_stage()
+        with open(folder / REPORT_NAME, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+        with open(folder / CHROME_TRACE_NAME, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
+
+# --------------------------------- #
+# Module level helpers - these do nothing when no build is being traced
+# --------------------------------- #
+
+# Trace the build running in the current thread
+def start(trace_memory=False):
+    global _memory_tracers
+    tracer = Tracer(trace_memory=trace_memory)
+    _active.set(tracer)
+    if trace_memory:
+        with _memory_lock:
+            _memory_tracers += 1
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+    return tracer
+
+def stop():
+    global _memory_tracers
+    tracer = _active.get()
+    _active.set(None)
+    if tracer is not None:
+        tracer.end_stage()
+        if tracer.trace_memory:
+            with _memory_lock:
+                _memory_tracers -= 1
+                if _memory_tracers == 0 and tracemalloc.is_tracing():
+                    tracemalloc.stop()
+    return tracer
+
+def span(name, category="job", **args):
+    tracer = _active.get()
+    if tracer is None:
+        return nullcontext()
+    return tracer.span(name, category, **args)
+
+def count(bytes_in=0, bytes_out=0):
+    tracer = _active.get()
+    if tracer is not None:
+        tracer.count(bytes_in, bytes_out)
+
+def begin_stage(name):
+    tracer = _active.get()
+    if tracer is not None:
+        tracer.begin_stage(name)
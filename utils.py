@@ -1,189 +1,72 @@
-import colorsys
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
 from struct import unpack
-import tkinter as tk
-from tkinter import colorchooser, messagebox
+import shutil
 import subprocess
 import re
+import tracing
+from build_log import get_logger
+from png_utils import PNG_SIGNATURE
 
-# --------------------------------- #
-# Colour functions
-# --------------------------------- #
+# tool_runner (and asyncio with it) is imported where it's used, so the window can open without it
+
+log = get_logger("utils")
 
-# Convert HEX code to RGB
-def hex_to_rgb_string(hex_color):
-    hex_color = hex_color.lstrip("#")
-    r, g, b = int(hex_color[0:2], 16), int(hex_color[2:4], 16), int(hex_color[4:6], 16)
-    return f"rgb({r},{g},{b})"
-
-# For the chosen main accent colour, generate 1 lighter shade and two darker shades
-def generate_shades(input_hex):
-    # convert input HEX to RGB then HLS
-    hex_color = input_hex.lstrip("#")
-    r, g, b = int(hex_color[0:2], 16)/255.0, int(hex_color[2:4], 16)/255.0, int(hex_color[4:6], 16)/255.0
-    h, l_orig, s = colorsys.rgb_to_hls(r, g, b)
-
-    l_light = min(l_orig + 0.1, 1)
-    l_dark = max(0, l_orig - 0.1)
-    l_darkest = max(0, l_orig - 0.2)
-
-    # convert back to RGB and then HEX
-    r_light, g_light, b_light = colorsys.hls_to_rgb(h, l_light, s)
-    r_dark, g_dark, b_dark = colorsys.hls_to_rgb(h, l_dark, s)
-    r_darkest, g_darkest, b_darkest = colorsys.hls_to_rgb(h, l_darkest, s)
-
-    r_light = int(r_light * 255)
-    g_light = int(g_light * 255)
-    b_light = int(b_light * 255)
-
-    r_dark = int(r_dark * 255)
-    g_dark = int(g_dark * 255)
-    b_dark = int(b_dark * 255)
-
-    r_darkest = int(r_darkest * 255)
-    g_darkest = int(g_darkest * 255)
-    b_darkest = int(b_darkest * 255)
-
-    hex_light = f"#{r_light:02x}{g_light:02x}{b_light:02x}"
-    hex_dark = f"#{r_dark:02x}{g_dark:02x}{b_dark:02x}"
-    hex_darker = f"#{r_darkest:02x}{g_darkest:02x}{b_darkest:02x}"
-
-    shades = [hex_light, input_hex, hex_dark, hex_darker]
-    return shades
-
-# Lighten a hex colour by 50% - used for HUD Accent Light
-def lighten_hex_50(hex_code):
-    # Convert hex to RGB
-    hex_code = hex_code.lstrip('#')
-    
-    r = int(hex_code[0:2], 16) / 255.0
-    g = int(hex_code[2:4], 16) / 255.0
-    b = int(hex_code[4:6], 16) / 255.0
-
-    # Convert RGB to HLS
-    h, l, s = colorsys.rgb_to_hls(r, g, b)
-
-    # Lighten by 50%
-    l = l + (1.0 - l) * 0.5
-    l = min(l, 1.0)
-
-    # Convert back to RGB
-    r, g, b = colorsys.hls_to_rgb(h, l, s)
-
-    # Convert to hex
-    return '#{:02X}{:02X}{:02X}'.format(int(r * 255), int(g * 255), int(b * 255)).lower()
-
-# Invert colour - used for fonts
-def invert_hex(hex_color):
-    hex_color = hex_color.lstrip('#')
-
-    # Convert to RGB
-    r = int(hex_color[0:2], 16)
-    g = int(hex_color[2:4], 16)
-    b = int(hex_color[4:6], 16)
-
-    # Invert each channel
-    inverted_r = 255 - r
-    inverted_g = 255 - g
-    inverted_b = 255 - b
-
-    # Convert back to hex
-    return '#{:02x}{:02x}{:02x}'.format(inverted_r, inverted_g, inverted_b)
+# How many times a hung export is retried, each time with double the timeout
+EXPORT_RETRIES = 1
 
 # --------------------------------- #
-# GUI functions
+# Inkscape
 # --------------------------------- #
 
-# Create a colour picker 
-def color_chooser(entry, color_preview):
-    def pick_color():
-        current = entry.get()
-        try:
-            rgb, hex_color = colorchooser.askcolor(current)
-            if hex_color:
-                entry.delete(0, tk.END)
-                entry.insert(0, hex_color)
-                color_preview.config(bg=hex_color)
-        except Exception:
-            pass
-    return pick_color
-
-# Check if a path contains a working version of inkscape.exe
-def is_valid_inkscape(path):
+# Ask inkscape for its version and work out which command line features it has
+# Piping svg in and png out, --shell and --actions all arrived in Inkscape 1.0
+def probe_inkscape(path):
+    import tool_runner
+    info = {"valid": False, "version": "", "pipe": False, "shell": False, "actions": False}
     try:
-        result = subprocess.run(
-            [path, "--version"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            timeout=5
-        )
-        return result.returncode == 0 and "Inkscape" in result.stdout
+        result = tool_runner.run_sync(tool_runner.run_tool("inkscape", [path, "--version"], timeout=5))
     except Exception:
-        return False
-
-# Enforce hex structure
-def validate_hex_input(value):
-    if value == "":
-        return True
-    if not value.startswith("#"):
-        value = "#" + value
-    return bool(re.fullmatch(r"#([0-9a-fA-F]{0,6})", value))
-
-# Ensure there is always a # in front of hex
-def enforce_hash_prefix(event, preview=None):
-    widget = event.widget
-    val = widget.get()
-    if val and not val.startswith("#"):
-        widget.delete(0, tk.END)
-        widget.insert(0, "#" + val)
-    if preview:
-        # Manually update preview color after modifying the entry text
-        val = widget.get()
-        if re.fullmatch(r"#([0-9a-fA-F]{6})", val):
-            preview.config(bg=val)
-
-# Ensure opacity can only be between 0 and 1
-def validate_opacity(value):
-    if value == "":
-        return True  # Allow empty so user can delete
+        return info
+    output = result.stdout.decode("utf-8", errors="replace")
+    if result.returncode != 0 or "Inkscape" not in output:
+        return info
+    match = re.search(r"Inkscape (\d+)\.(\d+)", output)
+    major = int(match.group(1)) if match else 0
+    info.update(valid=True, version=match.group(0).split()[1] if match else "", pipe=major >= 1, shell=major >= 1, actions=major >= 1)
+    return info
+
+# Check inkscape once per executable: the result is kept in cache_file with the exe's size and
+# modified time, and inkscape is only run again if either changes (e.g. after an update)
+# Only a working inkscape is remembered - a failed check (e.g. a slow first start that timed out) is tried again next time
+def inkscape_info(path, cache_file=None):
     try:
-        val = float(value)
-        return 0.0 <= val <= 1.0
-    except ValueError:
-        return False
-    
-# Check that hex and opacity inputs are valid when attempting to use them
-def validate_all_inputs(input_ui_name, input_entries):
-    invalid_fields = []
-
-    # Validate hex fields (except Opacity)
-    for label, entry in input_entries.items():
-        val = entry.get().strip()
-        if label == "Opacity":
-            if val == "":
-                invalid_fields.append(f"{label} (must be a number between 0 and 1)")
-        else:
-            if val == "":
-                invalid_fields.append(f"{label} (cannot be blank)")
-            elif not re.fullmatch(r"#([0-9a-fA-F]{6})", val):
-                invalid_fields.append(f"{label} (invalid hex code)")
-
-    # Validate UI Name
-    ui_name = input_ui_name.get().strip()
-    invalid_chars = r'<>:"/\\|?*'
-
-    if any(char in ui_name for char in invalid_chars):
-        invalid_fields.append(f'UI Name (contains invalid characters: {invalid_chars})')
-
-    # Show error message if there are any invalid fields
-    if invalid_fields:
-        messagebox.showerror(
-            "Invalid Input",
-            "Please fix the following field(s):\n\n" + "\n".join(invalid_fields)
-        )
-        return False
+        stat = os.stat(path)
+    except (OSError, ValueError):
+        return probe_inkscape(path)
+    key = os.path.normcase(os.path.abspath(path))
+    cache = {}
+    if cache_file is not None and Path(cache_file).is_file():
+        try:
+            cache = json.loads(Path(cache_file).read_text(encoding="utf-8"))
+        except ValueError:
+            cache = {}
+    cached = cache.get(key)
+    if cached is not None and cached.get("info", {}).get("valid") and cached.get("size") == stat.st_size and cached.get("mtime_ns") == stat.st_mtime_ns:
+        return cached["info"]
+
+    info = probe_inkscape(path)
+    if cache_file is not None and info["valid"]:
+        cache[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "info": info}
+        Path(cache_file).parent.mkdir(parents=True, exist_ok=True)
+        Path(cache_file).write_text(json.dumps(cache, indent=2), encoding="utf-8")
+    return info
 
-    return True
+# Check if a path contains a working version of inkscape.exe
+def is_valid_inkscape(path, cache_file=None):
+    return inkscape_info(path, cache_file)["valid"]
 
 # --------------------------------- #
 # Recolouring tools
@@ -201,29 +84,80 @@ def get_png_dimensions(file_path):
         height = unpack(">I", f.read(4))[0]
     return width, height
 
+# Compiled patterns for a replacement table, cached so each process compiles a table only once
+@lru_cache(maxsize=16)
+def _compile_table(items):
+    return [(re.compile(old, re.IGNORECASE), new) for old, new in items]
+
+def compile_replacements(colour_replacements):
+    return _compile_table(tuple(colour_replacements.items()))
+
+# Recolour SVG or LAYOUT text in memory and return it
+# newline="" keeps the source file's line endings as they are
+def recolour_text(file_input_path, colour_replacements):
+    with tracing.span("recolour " + file_input_path.name):
+        # Read in file to recolour
+        with open(file_input_path, "r", encoding="utf-8", newline="") as file:
+            file_contents = file.read()
+        bytes_in = len(file_contents)
+
+        # Replace HEX and/or RGB codes with desired colours
+        for pattern, new in compile_replacements(colour_replacements):
+            file_contents = pattern.sub(new, file_contents)        
+
+        tracing.count(bytes_in=bytes_in, bytes_out=len(file_contents))
+        return file_contents
+
 # Recolour SVG or LAYOUT files
 def recolour_files(file_input_path, colour_replacements, file_output_path):
-    # Read in file to recolour
-    with open(file_input_path, "r", encoding="utf-8") as file:
-        file_contents = file.read()
-
-    # Replace HEX and/or RGB codes with desired colours
-    regex_files = [(re.compile(old, re.IGNORECASE), new) for old, new in colour_replacements.items()]
-    for pattern, new in regex_files:
-        file_contents = pattern.sub(new, file_contents)        
+    file_contents = recolour_text(file_input_path, colour_replacements)
 
     # Save recoloured file  
-    with open(file_output_path, "w", encoding="utf-8") as file:
+    with open(file_output_path, "w", encoding="utf-8", newline="") as file:
         file.write(file_contents)
 
-# Export PNG from SVG
-def export_png(inkscape_path, input_path, output_path):    
-    subprocess.run([
-                inkscape_path,
-                str(input_path),
-                "--export-type=png",
-                f"--export-filename={output_path}"
-            ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+# Render SVG text to PNG bytes without touching the disk
+# The svg is piped to inkscape on stdin and the png is read back from stdout
+# A watchdog stops exports that run longer than a timeout based on the svg's size and tries again
+# Returns None if inkscape didn't produce a png
+async def render_png_async(inkscape_path, svg_text, name="svg"):
+    import tool_runner
+    svg_data = svg_text.encode("utf-8")
+    timeout = tool_runner.adaptive_timeout("inkscape", len(svg_data))
+    for attempt in range(EXPORT_RETRIES + 1):
+        try:
+            result = await tool_runner.run_tool("inkscape", [
+                        inkscape_path,
+                        "--pipe",
+                        "--export-type=png",
+                        "--export-filename=-"
+                    ], input=svg_data, timeout=timeout, name="inkscape " + name)
+            break
+        except subprocess.TimeoutExpired:
+            if attempt < EXPORT_RETRIES:
+                log.warning(f"- Export of {name} hung, trying again")
+            timeout *= 2
+        except OSError as e: # Inkscape couldn't be started, e.g. it's gone or there are too many open files
+            log.warning(f"- Could not start Inkscape to export {name}: {e}")
+            return None
+    else:
+        return None
+    if not result.stdout.startswith(PNG_SIGNATURE):
+        return None
+    return result.stdout
+
+def render_png(inkscape_path, svg_text, name="svg"):
+    import tool_runner
+    return tool_runner.run_sync(render_png_async(inkscape_path, svg_text, name))
+
+# Write in-memory files ({file name: bytes or source path}) to a folder, e.g. to keep processing files for debugging
+def save_files(folder, files):
+    folder.mkdir(parents=True, exist_ok=True)
+    for name, data in files.items():
+        if isinstance(data, bytes):
+            (folder / name).write_bytes(data)
+        else:
+            shutil.copy(data, folder / name)
 
 # Save input choices to file
 def save_choices(choices, location):
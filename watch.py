@@ -0,0 +1,195 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from build_log import get_logger
+from manifest import RESOURCE_TYPES, classify
+
+# --------------------------------- #
+# Watch mode
+# Watches Base UI for saved files and rebuilds only the packages they belong to.
+# Saves that come in bursts (e.g. "save all" in Inkscape) are collected until the
+# folder has been quiet for a moment, then one incremental build runs. Unchanged
+# files are reused from the build journal, so a rebuild only recolours and exports
+# what was touched. Linux uses inotify, everything else polls file modified times.
+# --------------------------------- #
+
+log = get_logger("watch")
+
+DEBOUNCE_SECONDS = 0.5 # quiet time after the last change before rebuilding
+POLL_INTERVAL = 1.0 # seconds between scans for the polling watcher
+
+# inotify event masks from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+INOTIFY_EVENT = struct.Struct("iIII") # wd, mask, cookie, name length
+
+class InotifyWatcher:
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.folders = {} # watch descriptor -> folder
+        self._add_tree(self.root)
+
+    def _add_tree(self, folder):
+        for dirpath, _, _ in os.walk(folder):
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(dirpath), self.MASK)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {dirpath}")
+            self.folders[wd] = Path(dirpath)
+
+    # Paths changed since the last call, waiting up to timeout seconds for the first one
+    def wait(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        changed = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            pos = 0
+            while pos < len(data):
+                wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, pos)
+                name = data[pos + INOTIFY_EVENT.size:pos + INOTIFY_EVENT.size + length].rstrip(b"\0")
+                pos += INOTIFY_EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    changed.add(self.root) # events were lost, treat everything as changed
+                    continue
+                folder = self.folders.get(wd)
+                if folder is None or not name:
+                    continue
+                path = folder / os.fsdecode(name)
+                if mask & IN_ISDIR:
+                    # A new folder (e.g. a new patch) - watch it and count everything already inside as changed
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        self._add_tree(path)
+                        changed.update(p for p in path.rglob("*") if p.is_file())
+                    continue
+                changed.add(path)
+
+    def close(self):
+        os.close(self.fd)
+
+class PollingWatcher:
+    def __init__(self, root, interval=POLL_INTERVAL):
+        self.root = Path(root)
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    # (modified time, size) of every file under root
+    def _scan(self):
+        files = {}
+        stack = [self.root]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as it:
+                    for entry in it:
+                        if entry.is_dir():
+                            stack.append(entry.path)
+                        elif entry.is_file():
+                            stat = entry.stat()
+                            files[Path(entry.path)] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                pass # folder removed while scanning, the next scan catches up
+        return files
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        snapshot = self._scan()
+        changed = {p for p in snapshot.keys() | self.snapshot.keys() if snapshot.get(p) != self.snapshot.get(p)}
+        self.snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+# inotify on Linux, polling anywhere else or if inotify can't be used (e.g. out of watches)
+def open_watcher(root, poll_interval=POLL_INTERVAL):
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root)
+        except (OSError, AttributeError) as e:
+            log.warning(f"- inotify unavailable ({e}), polling for changes instead")
+    return PollingWatcher(root, poll_interval)
+
+# Which packages a set of changed paths affects: (main UI, language logos, set of patch names)
+def affected_sections(root, paths):
+    root = Path(root)
+    run_main = run_logos = False
+    patches = set()
+    for path in paths:
+        try:
+            parts = Path(path).relative_to(root).parts
+        except ValueError:
+            continue
+        if not parts: # lost track of events - rebuild everything
+            return True, True, None
+        section, kind = classify(parts)
+        if kind not in ("version", "patch_readme") and Path(path).suffix.lower() not in RESOURCE_TYPES:
+            continue # editor backups, temp files etc.
+        if kind in ("main", "version"):
+            run_main = True
+        elif kind.startswith("logo"):
+            run_logos = True
+        elif kind in ("patch", "patch_readme"):
+            patches.add(section)
+    return run_main, run_logos, patches
+
+def _run_rebuild(rebuild, run_main, run_logos, patches):
+    started = time.perf_counter()
+    try:
+        rebuild(run_main, run_logos, patches)
+    except Exception:
+        log.error("Rebuild failed", exc_info=True)
+    log.info(f"Rebuilt in {time.perf_counter() - started:.1f} sec")
+
+# Watch root until stop is set, calling rebuild(run_main, run_logos, patches) after each burst of changes
+# patches is a set of patch folder names, or None for all of them
+# With build_first everything is built once before watching starts, so later rebuilds have a journal to reuse
+def watch_base_ui(root, rebuild, stop, debounce=DEBOUNCE_SECONDS, poll_interval=POLL_INTERVAL, build_first=False):
+    watcher = open_watcher(root, poll_interval)
+    log.info(f"Watching {root} for changes ({type(watcher).__name__})")
+    if build_first:
+        _run_rebuild(rebuild, True, True, None)
+    pending = set()
+    try:
+        while not stop.is_set():
+            changed = watcher.wait(debounce if pending else POLL_INTERVAL)
+            if changed:
+                pending |= changed
+                continue
+            if not pending:
+                continue
+            run_main, run_logos, patches = affected_sections(root, pending)
+            pending = set()
+            if run_main or run_logos or patches != set():
+                _run_rebuild(rebuild, run_main, run_logos, patches)
+    finally:
+        watcher.close()
+
+# Run watch_base_ui on a background thread - returns the event that stops it and the thread,
+# which finishes any rebuild under way before it exits
+def start_watching(root, rebuild, debounce=DEBOUNCE_SECONDS, poll_interval=POLL_INTERVAL, build_first=False):
+    stop = threading.Event()
+    thread = threading.Thread(
+        target=watch_base_ui, args=(root, rebuild, stop, debounce, poll_interval, build_first), name="base-ui-watch", daemon=True
+    )
+    thread.start()
+    return stop, thread